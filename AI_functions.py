@@ -19,11 +19,11 @@ def load_openai_key():
 
 @retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(6))
 # Generate AI title with redundancy prevention
-def provide_AI_title(prompt):
+def provide_AI_title(prompt, event_name=None):
     client = OpenAI(api_key=api_key2)
-    used_titles = load_used_titles()  # Load previous titles
+    used_titles = load_used_titles(event_name)  # Load previous titles
 
-    additional_prompt = config.EVENT_NAME
+    additional_prompt = config.event_paths(event_name)["event name"]
 
     for _ in range(3):  # Allow up to 3 retries if title is too similar
         response = client.chat.completions.create(
@@ -39,17 +39,17 @@ def provide_AI_title(prompt):
         new_title = response.choices[0].message.content.strip()
 
         if not is_too_similar(new_title, used_titles):
-            save_used_title(new_title)  # Save only if it's unique
+            save_used_title(new_title, event_name)  # Save only if it's unique
             return new_title
 
     print("Warning: Could not generate a completely unique title after 3 attempts.")
     return new_title  # Return last generated title even if similar
 
-def provide_AI_comptitle(prompt):
+def provide_AI_comptitle(prompt, event_name=None):
     client = OpenAI(api_key=api_key2)
-    used_titles = load_used_titles()  # Load previous titles
+    used_titles = load_used_titles(event_name)  # Load previous titles
 
-    additional_prompt = config.EVENT_NAME
+    additional_prompt = config.event_paths(event_name)["event name"]
     last_title = None
 
     for _ in range(3):  # Allow up to 3 retries if title is too similar
@@ -67,12 +67,12 @@ def provide_AI_comptitle(prompt):
         last_title = new_title
 
         if not is_too_similar(new_title, used_titles):
-            save_used_title(new_title)  # Save only if it's unique
+            save_used_title(new_title, event_name)  # Save only if it's unique
             return new_title
 
     # Fallback if all attempts are too similar
     print("Warning: All generated titles were too similar. Using last generated title.")
-    save_used_title(last_title)  # Still save to avoid repeat use
+    save_used_title(last_title, event_name)  # Still save to avoid repeat use
     return last_title
 
 def provide_AI_desc(title):
@@ -145,12 +145,13 @@ def provide_comp_thumbnail(title):
         print(f"Error generating image: {e}")
         return None
 
-def provide_image(title):
+def provide_image(title, event_name=None):
     client = OpenAI(api_key=api_key2)
+    paths = config.event_paths(event_name)
 
-    with open(config.EVENT_TITLE, 'r') as file:
+    with open(paths["event title"], 'r') as file:
         event_title=file.read()
-    with open(config.VENUE_DESC, 'r') as file:
+    with open(paths["venue desc"], 'r') as file:
         venue_desc=file.read()
     
         
@@ -167,7 +168,7 @@ def provide_image(title):
     title = re.sub(r'[^a-zA-Z0-9._-]', '', title)
 
     image_filename = f"{title}.png"
-    image_path = os.path.join(config.THUMBNAILS_FOLDER, image_filename)
+    image_path = os.path.join(paths["thumbnails folder"], image_filename)
 
     max_retries = 5
     for attempt in range(1, max_retries + 1):
@@ -245,15 +246,16 @@ def provide_AI_image(title):
 
 
 # Load previous titles from file if it exists
-def load_used_titles():
-    if os.path.exists(config.TITLE_HISTORY_FILE):
-        with open(config.TITLE_HISTORY_FILE, "r", encoding="utf-8") as f:
+def load_used_titles(event_name=None):
+    history = config.event_paths(event_name)["title history"]
+    if os.path.exists(history):
+        with open(history, "r", encoding="utf-8") as f:
             return [line.strip() for line in f.readlines()]
     return []
 
 # Save new title to history
-def save_used_title(title):
-    with open(config.TITLE_HISTORY_FILE, "a", encoding="utf-8") as f:
+def save_used_title(title, event_name=None):
+    with open(config.event_paths(event_name)["title history"], "a", encoding="utf-8") as f:
         f.write(title + "\n")
 
 # Check similarity between two titles
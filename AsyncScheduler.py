@@ -0,0 +1,198 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Upper bound on one sleep, so wall-clock changes (DST, sleep/resume, NTP) are noticed promptly
+MAX_SLEEP_SECONDS = 60
+# Worker processes for CPU-bound Python work (clip analysis); None = one per core
+CPU_WORKERS: Optional[int] = None
+
+Rule = Callable[[datetime], datetime]
+
+
+# ---- next-run rules: each returns the first run time strictly after `now` (local time) ----
+
+def _at(now: datetime, hhmm: str) -> datetime:
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+def daily_at(hhmm: str) -> Rule:
+    def rule(now: datetime) -> datetime:
+        run = _at(now, hhmm)
+        return run if run > now else run + timedelta(days=1)
+    return rule
+
+def weekly_at(day: str, hhmm: str) -> Rule:
+    weekday = WEEKDAYS.index(day.lower())
+
+    def rule(now: datetime) -> datetime:
+        run = _at(now, hhmm) + timedelta(days=(weekday - now.weekday()) % 7)
+        return run if run > now else run + timedelta(days=7)
+    return rule
+
+def minutes_before(rule: Rule, minutes: float) -> Rule:
+    """`rule`'s run times moved `minutes` earlier (e.g. prep work ahead of a slot)."""
+    lead = timedelta(minutes=minutes)
+
+    def shifted(now: datetime) -> datetime:
+        return rule(now + lead) - lead
+    return shifted
+
+def every_minutes(minutes: float) -> Rule:
+    def rule(now: datetime) -> datetime:
+        return now + timedelta(minutes=minutes)
+    return rule
+
+def on_trigger() -> Rule:
+    """Never due on its own; the job only runs when triggered."""
+    def rule(now: datetime) -> datetime:
+        return datetime.max
+    return rule
+
+
+class Job:
+    """A named callable, the rule for its next run and the group it is serialized with."""
+
+    def __init__(self, name: str, func: Callable, rule: Rule, group: Optional[str] = None, args: tuple = ()):
+        self.name = name
+        self.func = func
+        self.rule = rule
+        self.group = group
+        self.args = args
+        self.due: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+class _WatchHandler(FileSystemEventHandler):
+    def __init__(self, scheduler: "AsyncScheduler", job_name: str, matches: Callable, settle_seconds: float):
+        self.scheduler = scheduler
+        self.job_name = job_name
+        self.matches = matches
+        self.settle_seconds = settle_seconds
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        path = getattr(event, "dest_path", None) or event.src_path
+        if self.matches(event.event_type, os.fsdecode(path)):
+            self.scheduler.trigger_threadsafe(self.job_name, self.settle_seconds)
+
+
+class AsyncScheduler:
+    """
+    Deadline-driven job runner on one asyncio loop.
+
+    The loop sleeps until the earliest due job (or a trigger), starts every due job as its own
+    task and computes its next run. Blocking jobs run on worker threads; jobs sharing a group run
+    one at a time in the order they came due, so only jobs in different groups (e.g. a render and
+    an upload slot) run side by side. A job that is still running when it comes due again is
+    skipped, like run_in_background.
+    """
+
+    def __init__(self, cpu_workers: Optional[int] = CPU_WORKERS):
+        self.jobs: Dict[str, Job] = {}
+        self.process_pool = ProcessPoolExecutor(max_workers=cpu_workers)
+        self._groups: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._observers: List[Observer] = []
+
+    def add(self, name: str, func: Callable, rule: Rule, group: Optional[str] = None, args: tuple = ()) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Duplicate job name: {name}")
+        job = Job(name, func, rule, group, args)
+        self.jobs[name] = job
+        return job
+
+    def trigger(self, name: str, delay: float = 0.0) -> None:
+        """Bring a job's next run forward to `delay` seconds from now (never pushes it back)."""
+        job = self.jobs.get(name)
+        if job is None:
+            return
+        soon = datetime.now() + timedelta(seconds=delay)
+        if job.due is None or soon < job.due:
+            job.due = soon
+        if self._wake is not None:
+            self._wake.set()
+
+    def trigger_threadsafe(self, name: str, delay: float = 0.0) -> bool:
+        """trigger() from any thread. False if the scheduler loop isn't running."""
+        if self._loop is None or self._loop.is_closed():
+            return False
+        self._loop.call_soon_threadsafe(self.trigger, name, delay)
+        return True
+
+    def watch(self, folder, job_name: str, matches: Callable[[str, str], bool], settle_seconds: float = 0.0) -> None:
+        """
+        Trigger `job_name` within `settle_seconds` of a file event under `folder` for which
+        matches(event_type, path) is true. The watch starts when run() does.
+        """
+        observer = Observer()
+        observer.schedule(_WatchHandler(self, job_name, matches, settle_seconds), str(folder), recursive=True)
+        self._observers.append(observer)
+
+    async def _run_job(self, job: Job) -> None:
+        lock = self._groups.setdefault(job.group, asyncio.Lock()) if job.group else None
+        try:
+            if lock is None:
+                await asyncio.to_thread(job.func, *job.args)
+            else:
+                async with lock:
+                    await asyncio.to_thread(job.func, *job.args)
+        except Exception:
+            logger.exception("Job '%s' failed.", job.name)
+
+    def _start_due(self, now: datetime) -> None:
+        for job in self.jobs.values():
+            if job.due is None or job.due > now:
+                continue
+            if job.running:
+                logger.info("Job '%s' is still running; skipping this run.", job.name)
+            else:
+                job.task = asyncio.create_task(self._run_job(job), name=job.name)
+            job.due = job.rule(now)
+            logger.debug("Job '%s' next runs at %s", job.name, job.due)
+
+    async def run(self) -> None:
+        """Run jobs until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        now = datetime.now()
+        for job in self.jobs.values():
+            if job.due is None:
+                job.due = job.rule(now)
+        for observer in self._observers:
+            try:
+                observer.start()
+            except OSError as e:
+                logger.warning("File watch unavailable (%s); relying on the timed schedule.", e)
+        try:
+            while True:
+                now = datetime.now()
+                self._start_due(now)
+                next_due = min((job.due for job in self.jobs.values()), default=None)
+                delay = MAX_SLEEP_SECONDS if next_due is None else (next_due - now).total_seconds()
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(max(delay, 0.0), MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for observer in self._observers:
+                if observer.is_alive():
+                    observer.stop()
+                    observer.join(timeout=5)
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
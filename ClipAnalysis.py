@@ -0,0 +1,245 @@
+import os
+import logging
+import subprocess
+from typing import List, Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import (
+    KEY_FILE, KEY_USED, KEY_SIZE, KEY_MTIME, KEY_DURATION, KEY_PROBE,
+    KEY_TRIM, KEY_TRIM_START, KEY_TRIM_END,
+)
+from ProcessComboTextFile import parse_jsonl, update_jsonl_rows, prep_lock
+from MediaProbe import get_probe, get_duration, _file_signature
+from FfmpegRunner import FFPROBE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis or thresholds change so stored trims are recomputed
+ANALYSIS_VERSION = 2
+
+# Frames are sampled at this rate and shrunk to this width before differencing
+ANALYSIS_FPS = 10
+ANALYSIS_WIDTH = 96
+# Mono audio sample rate for loudness
+ANALYSIS_SAMPLE_RATE = 8000
+
+# A second is active when its motion reaches this fraction of the clip's 90th percentile
+MOTION_RELATIVE = 0.25
+MOTION_FLOOR = 0.5  # mean absolute 8-bit pixel difference between sampled frames
+# A second is loud when it is this many dB above the clip's noise floor (its 10th percentile), so
+# steady game music never counts. Loud seconds only extend motion spans (hits, crowd, commentary
+# running past the action); audio alone decides only when there is no video to measure.
+AUDIO_ABOVE_FLOOR_DB = 10.0
+AUDIO_FLOOR_DB = -50.0
+# Audio decode time allowed per second of clip, on top of FFPROBE_TIMEOUT
+AUDIO_DECODE_TIMEOUT_PER_SECOND = 0.25
+
+# Seconds of context kept around the active span
+TRIM_PAD_SECONDS = 1.0
+# Don't trim unless at least this much is cut, and never below this length
+MIN_TRIM_SECONDS = 1.5
+MIN_KEPT_SECONDS = 5.0
+# Rows analyzed per background pass
+ANALYSIS_BATCH_SIZE = 20
+
+
+def motion_per_second(path: str) -> Optional[np.ndarray]:
+    """
+    Mean frame-to-frame difference per second of the game area (top half of the vertical clip),
+    from low-resolution grayscale frames sampled at ANALYSIS_FPS.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 60.0
+        step = max(1, int(round(fps / ANALYSIS_FPS)))
+        frames: List[np.ndarray] = []
+        times: List[float] = []
+        index = 0
+        while cap.grab():
+            if index % step == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                h, w = frame.shape[:2]
+                game = frame[: h // 2]
+                small = cv2.resize(game, (ANALYSIS_WIDTH, max(1, int(ANALYSIS_WIDTH * (h // 2) / w))),
+                                   interpolation=cv2.INTER_AREA)
+                frames.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+                times.append(index / fps)
+            index += 1
+    finally:
+        cap.release()
+
+    if len(frames) < 2:
+        return None
+    stack = np.stack(frames).astype(np.int16)
+    diffs = np.abs(np.diff(stack, axis=0)).mean(axis=(1, 2))
+    seconds = np.asarray(times[1:], dtype=np.float64).astype(np.int64)
+    counts = np.bincount(seconds)
+    totals = np.bincount(seconds, weights=diffs)
+    return np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+
+def loudness_per_second(path: str, duration: float = 0.0) -> Optional[np.ndarray]:
+    """RMS loudness (dBFS) per second of the clip's audio, or None if it has no audio."""
+    cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-i", path,
+        "-vn", "-ac", "1", "-ar", str(ANALYSIS_SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True,
+                                timeout=FFPROBE_TIMEOUT + AUDIO_DECODE_TIMEOUT_PER_SECOND * duration)
+    except Exception as e:
+        logger.info("Could not decode audio from %s: %s", path, e)
+        return None
+    samples = np.frombuffer(result.stdout, dtype=np.int16)
+    n = len(samples) // ANALYSIS_SAMPLE_RATE
+    if n == 0:
+        return None
+    blocks = samples[: n * ANALYSIS_SAMPLE_RATE].astype(np.float32).reshape(n, ANALYSIS_SAMPLE_RATE) / 32768.0
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    return 20.0 * np.log10(rms + 1e-9)
+
+def find_trim(
+    motion: Optional[np.ndarray],
+    loudness: Optional[np.ndarray],
+    duration: float,
+) -> Optional[Tuple[float, float]]:
+    """
+    (start, end) seconds spanning the clip's active seconds plus padding,
+    or None when nothing worth cutting was found.
+    """
+    n = max(len(motion) if motion is not None else 0, len(loudness) if loudness is not None else 0)
+    if n == 0:
+        return None
+    loud = np.zeros(n, dtype=bool)
+    if loudness is not None and len(loudness):
+        threshold = max(AUDIO_FLOOR_DB, float(np.percentile(loudness, 10)) + AUDIO_ABOVE_FLOOR_DB)
+        loud[: len(loudness)] = loudness >= threshold
+
+    if motion is not None and len(motion):
+        active = np.zeros(n, dtype=bool)
+        threshold = max(MOTION_FLOOR, MOTION_RELATIVE * float(np.percentile(motion, 90)))
+        active[: len(motion)] = motion >= threshold
+        # Grow each motion span through the loud seconds next to it
+        for i in range(1, n):
+            active[i] |= active[i - 1] and loud[i]
+        for i in range(n - 2, -1, -1):
+            active[i] |= active[i + 1] and loud[i]
+    else:
+        active = loud
+
+    idx = np.flatnonzero(active)
+    if idx.size == 0:
+        return None
+    start = max(0.0, float(idx[0]) - TRIM_PAD_SECONDS)
+    end = min(duration, float(idx[-1]) + 1.0 + TRIM_PAD_SECONDS)
+    if end - start < MIN_KEPT_SECONDS:
+        return None
+    if start + (duration - end) < MIN_TRIM_SECONDS:
+        return None
+    return round(start, 2), round(end, 2)
+
+def analyze_clip(path: str, duration: float) -> Dict[str, Any]:
+    """Analyze one clip and return its trim record (start/end None when it shouldn't be trimmed)."""
+    sig = _file_signature(path)
+    trim = find_trim(motion_per_second(path), loudness_per_second(path, duration), duration)
+    if trim:
+        logger.info("Trim %s: %.2f-%.2fs of %.2fs", os.path.basename(path), trim[0], trim[1], duration)
+    return {
+        KEY_TRIM_START: trim[0] if trim else None,
+        KEY_TRIM_END:   trim[1] if trim else None,
+        KEY_SIZE:       sig[0] if sig else None,
+        KEY_MTIME:      sig[1] if sig else None,
+        "version":      ANALYSIS_VERSION,
+    }
+
+def _trim_is_fresh(row: Dict[str, Any]) -> bool:
+    entry = row.get(KEY_TRIM)
+    sig = _file_signature(row.get(KEY_FILE) or "")
+    return bool(entry) and sig is not None and entry.get("version") == ANALYSIS_VERSION \
+        and entry.get(KEY_SIZE) == sig[0] and entry.get(KEY_MTIME) == sig[1]
+
+def get_trim(row: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """The row's (start, end) trim if it was analyzed from the file as it is now."""
+    if not _trim_is_fresh(row):
+        return None
+    entry = row[KEY_TRIM]
+    if entry.get(KEY_TRIM_START) is None or entry.get(KEY_TRIM_END) is None:
+        return None
+    return entry[KEY_TRIM_START], entry[KEY_TRIM_END]
+
+def trimmed_duration(row: Dict[str, Any]) -> Optional[float]:
+    """Duration after trimming (the full duration when the row has no trim)."""
+    trim = get_trim(row)
+    if trim:
+        return trim[1] - trim[0]
+    return get_duration(row)
+
+def _pending_duration(row: Dict[str, Any]) -> Optional[float]:
+    """Duration to analyze the row's clip over, or None if it has a fresh trim or can't be analyzed."""
+    path = row.get(KEY_FILE)
+    if not path or not os.path.exists(path) or _trim_is_fresh(row):
+        return None
+    probe = get_probe(row)
+    if not probe or not probe.get(KEY_DURATION):
+        return None
+    return probe[KEY_DURATION]
+
+def _analyze_safely(path: str, duration: float) -> Optional[Dict[str, Any]]:
+    # Module-level so a process pool can run it
+    try:
+        return analyze_clip(path, duration)
+    except Exception as e:
+        logger.warning("Clip analysis failed for %s: %s", path, e)
+        return None
+
+def analyze_clips(
+    videodata_path,
+    posted_vids_path=None,
+    limit: Optional[int] = ANALYSIS_BATCH_SIZE,
+    unused_only: bool = False,
+    executor=None,
+) -> int:
+    """
+    Store trim points for unposted rows (or, with unused_only, rows not yet in a compilation)
+    that don't have fresh ones yet.
+    With an `executor` (e.g. a ProcessPoolExecutor) the clips are analyzed in parallel there;
+    probing and the row update stay in the caller.
+    Only the trim/probe fields are merged back, so this can run beside the uploader;
+    concurrent prep passes over the same file wait for each other.
+    Returns the number of rows updated.
+    """
+    with prep_lock(videodata_path):
+        return _analyze_clips_locked(videodata_path, posted_vids_path, limit, unused_only, executor)
+
+def _analyze_clips_locked(videodata_path, posted_vids_path, limit, unused_only, executor) -> int:
+    posted = set()
+    if posted_vids_path and os.path.exists(posted_vids_path):
+        with open(posted_vids_path, "r", encoding="utf-8") as f:
+            posted = {line.rstrip("\n") for line in f}
+
+    todo: List[Tuple[Dict[str, Any], float]] = []
+    for row in parse_jsonl(str(videodata_path)):
+        if limit is not None and len(todo) >= limit:
+            break
+        if row.get(KEY_FILE) in posted or (unused_only and row.get(KEY_USED)):
+            continue
+        duration = _pending_duration(row)
+        if duration is not None:
+            todo.append((row, duration))
+
+    mapper = executor.map if executor is not None else map
+    trims = mapper(_analyze_safely, [row[KEY_FILE] for row, _ in todo], [d for _, d in todo])
+    patches: Dict[str, Dict[str, Any]] = {}
+    for (row, _), trim in zip(todo, trims):
+        if trim is not None:
+            patches[row[KEY_FILE]] = {KEY_TRIM: trim, KEY_PROBE: row.get(KEY_PROBE)}
+
+    updated = update_jsonl_rows(str(videodata_path), patches)
+    if updated:
+        logger.info("Clip analysis: %d row(s) updated", updated)
+    return updated
@@ -0,0 +1,225 @@
+import os
+import re
+import json
+import time
+import argparse
+import datetime
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import config
+from FfmpegRunner import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Named x264 encoding profiles.
+#   preset/crf: libx264 settings
+#   threads:    ffmpeg threads per encode (0 = split the cores evenly across jobs)
+#   jobs:       how many encodes run at once (e.g. parallel segment renders)
+ENCODING_PROFILES: Dict[str, Dict[str, Any]] = {
+    "quality":  {"preset": "slow",      "crf": 18, "threads": 0, "jobs": 1},
+    "balanced": {"preset": "fast",      "crf": 18, "threads": 0, "jobs": 2},
+    "fast":     {"preset": "veryfast",  "crf": 20, "threads": 0, "jobs": 3},
+    "draft":    {"preset": "ultrafast", "crf": 23, "threads": 0, "jobs": 4},
+}
+# Matches the settings the compilation commands used before profiles existed
+DEFAULT_PROFILE = "balanced"
+
+# Benchmark defaults: a full compilation (~305s of clips) must encode within this many seconds
+ENCODE_TIME_BUDGET_SECONDS = 900
+BENCHMARK_COMPILATION_SECONDS = 305
+BENCHMARK_SAMPLE_SECONDS = 20
+
+_SSIM_RE = re.compile(r"All:([0-9.]+)\s*\(([0-9.]+|inf)\)")
+
+
+def load_selected_profile() -> Optional[Dict[str, Any]]:
+    """Return the stored benchmark selection (see benchmark_profiles), or None."""
+    path = config.ENCODING_PROFILE_FILE
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("Could not read encoding profile selection %s: %s", path, e)
+        return None
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Resolve an encoding profile. Explicit name wins; otherwise the benchmark's stored
+    selection; otherwise DEFAULT_PROFILE. Always returns a copy with a "name" field.
+    """
+    if name is None:
+        selected = load_selected_profile()
+        if selected and selected.get("profile") in ENCODING_PROFILES:
+            name = selected["profile"]
+    if name not in ENCODING_PROFILES:
+        if name is not None:
+            logger.warning("Unknown encoding profile '%s'; using %s.", name, DEFAULT_PROFILE)
+        name = DEFAULT_PROFILE
+    profile = dict(ENCODING_PROFILES[name])
+    profile["name"] = name
+    return profile
+
+def threads_per_job(profile: Dict[str, Any]) -> int:
+    """ffmpeg -threads value for one encode under this profile."""
+    if profile.get("threads"):
+        return int(profile["threads"])
+    return max(1, (os.cpu_count() or 1) // max(1, int(profile.get("jobs", 1))))
+
+def x264_args(profile: Dict[str, Any]) -> List[str]:
+    """ffmpeg video encoder args for a profile."""
+    return ["-c:v", "libx264", "-preset", str(profile["preset"]), "-crf", str(profile["crf"])]
+
+def _encode_sample(sample: str, out_path: str, profile: Dict[str, Any], seconds: float) -> None:
+    # Lazy import: VideoCompilation pulls in the AI/OpenAI stack
+    from VideoCompilation import LANDSCAPE_FILTER
+    cmd = [
+        "ffmpeg", "-y", "-t", str(seconds), "-i", sample,
+        "-filter_complex", LANDSCAPE_FILTER,
+        "-map", "[out]", "-an",
+        *x264_args(profile),
+        "-threads", str(threads_per_job(profile)),
+        out_path,
+    ]
+    run_ffmpeg(cmd, duration=seconds, label=os.path.basename(out_path))
+
+def _measure_ssim_db(sample: str, encoded: str, seconds: float) -> Optional[float]:
+    """SSIM (in dB) of an encoded sample against the filtered source."""
+    from VideoCompilation import LANDSCAPE_FILTER
+    reference = LANDSCAPE_FILTER.replace("[0:v]", "[1:v]").replace("[out]", "[ref]")
+    cmd = [
+        "ffmpeg", "-i", encoded, "-t", str(seconds), "-i", sample,
+        "-filter_complex", f"{reference};[0:v][ref]ssim",
+        "-f", "null", "-",
+    ]
+    try:
+        result = run_ffmpeg(cmd, duration=seconds, label=f"ssim {os.path.basename(encoded)}")
+    except subprocess.CalledProcessError as e:
+        logger.warning("SSIM measurement failed: %s", e.stderr)
+        return None
+    match = None
+    for match in _SSIM_RE.finditer(result.stderr):
+        pass
+    if not match:
+        return None
+    return 99.0 if match.group(2) == "inf" else float(match.group(2))
+
+def benchmark_profiles(
+    sample_clip: str,
+    *,
+    budget_seconds: float = ENCODE_TIME_BUDGET_SECONDS,
+    compilation_seconds: float = BENCHMARK_COMPILATION_SECONDS,
+    sample_seconds: float = BENCHMARK_SAMPLE_SECONDS,
+    candidates: Optional[List[str]] = None,
+    save: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Encode the first `sample_seconds` of a clip with every candidate profile, running `jobs`
+    encodes concurrently just like a real render, and measure throughput and SSIM.
+
+    The projected time for a `compilation_seconds` compilation must fit `budget_seconds`;
+    among the profiles that fit, the one with the best quality (SSIM dB) wins, ties going to
+    the faster profile. If none fit, the fastest profile is chosen.
+    The selection is written to config.ENCODING_PROFILE_FILE for the scheduler.
+    """
+    if not os.path.isfile(sample_clip):
+        logger.error("Benchmark sample not found: %s", sample_clip)
+        return None
+
+    names = candidates or list(ENCODING_PROFILES)
+    out_dir = os.path.join(str(config.STATE_FOLDER), "benchmark")
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    for name in names:
+        profile = get_profile(name)
+        jobs = max(1, int(profile.get("jobs", 1)))
+        outputs = [os.path.join(out_dir, f"{name}_{i}.mp4") for i in range(jobs)]
+        try:
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                for fut in [pool.submit(_encode_sample, sample_clip, out, profile, sample_seconds) for out in outputs]:
+                    fut.result()
+            elapsed = time.monotonic() - start
+        except subprocess.CalledProcessError as e:
+            logger.warning("Benchmark encode failed for %s: %s", name, e.stderr)
+            continue
+
+        # Media seconds produced per wall-clock second with `jobs` encodes in flight
+        throughput = (jobs * sample_seconds) / elapsed if elapsed > 0 else 0.0
+        projected = compilation_seconds / throughput if throughput else float("inf")
+        ssim_db = _measure_ssim_db(sample_clip, outputs[0], sample_seconds)
+        size = os.path.getsize(outputs[0]) if os.path.exists(outputs[0]) else None
+
+        results.append({
+            "profile": name,
+            "elapsed seconds": round(elapsed, 2),
+            "throughput": round(throughput, 3),
+            "projected seconds": round(projected, 1),
+            "ssim db": ssim_db,
+            "bytes": size,
+            "fits budget": projected <= budget_seconds,
+        })
+        logger.info(
+            "Benchmark %s: elapsed=%.1fs throughput=%.2fx projected=%.0fs ssim=%sdB",
+            name, elapsed, throughput, projected, ssim_db,
+        )
+        for out in outputs:
+            try:
+                os.remove(out)
+            except OSError:
+                pass
+
+    if not results:
+        logger.error("No profile could be benchmarked.")
+        return None
+
+    fitting = [r for r in results if r["fits budget"]]
+    if fitting:
+        # Best quality; within 0.1 dB prefer the faster profile
+        best = max(fitting, key=lambda r: (round((r["ssim db"] or 0) * 10), r["throughput"]))
+    else:
+        best = max(results, key=lambda r: r["throughput"])
+        logger.warning("No profile fits the %.0fs budget; using the fastest (%s).", budget_seconds, best["profile"])
+
+    selection = {
+        "profile": best["profile"],
+        "settings": ENCODING_PROFILES[best["profile"]],
+        "benchmarked at": datetime.datetime.now().replace(microsecond=0).isoformat(),
+        "sample": str(sample_clip).replace("\\", "/"),
+        "budget seconds": budget_seconds,
+        "results": results,
+    }
+
+    if save:
+        path = str(config.ENCODING_PROFILE_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(selection, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        logger.info("Selected encoding profile '%s' saved to %s", best["profile"], path)
+
+    return selection
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark encoding profiles on a sample clip.")
+    parser.add_argument("sample", help="Vertical replay clip to encode")
+    parser.add_argument("--budget", type=float, default=ENCODE_TIME_BUDGET_SECONDS,
+                        help="Max seconds to encode a full compilation")
+    parser.add_argument("--profiles", default="", help="Comma-separated profile names (default: all)")
+    cli_args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    chosen = benchmark_profiles(
+        cli_args.sample,
+        budget_seconds=cli_args.budget,
+        candidates=[p for p in cli_args.profiles.split(",") if p] or None,
+    )
+    if chosen:
+        print(f"Selected profile: {chosen['profile']}")
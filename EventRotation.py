@@ -0,0 +1,121 @@
+import os
+import json
+import math
+import time
+import logging
+import threading
+from typing import List, Dict, Any
+
+import config
+from config import KEY_FILE, KEY_USED
+from ProcessComboTextFile import parse_jsonl
+
+logger = logging.getLogger(__name__)
+
+# Per-event multipliers on the backlog weight (folder name -> weight; unlisted events get 1.0;
+# 0 = only tried when no other event has anything to post)
+EVENT_WEIGHTS: Dict[str, float] = {}
+# Each day the oldest pending clip has waited adds this much to the event's weight (x1.05/day)...
+AGE_WEIGHT_PER_DAY = 0.05
+# ...up to this many days
+AGE_CAP_DAYS = 30
+
+ROTATION_STATE_FILE = config.STATE_FOLDER / "event_rotation.json"
+
+_LOCK = threading.RLock()
+
+
+def _load() -> Dict[str, Any]:
+    path = str(ROTATION_STATE_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Could not read rotation state %s: %s", path, e)
+    return {}
+
+def _save(state: Dict[str, Any]) -> None:
+    path = str(ROTATION_STATE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def _posted(path) -> set:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f}
+    except OSError:
+        return set()
+
+def event_backlog(event_name: str, kind: str) -> Dict[str, float]:
+    """
+    {"pending": count, "age days": oldest pending clip's age} for one event.
+    Shorts count unposted clips; comps count queued compilations plus clips not yet in one.
+    """
+    paths = config.event_paths(event_name)
+    posted = _posted(paths["posted vids"])
+    mtimes = []
+    for row in parse_jsonl(str(paths["video data"])):
+        path = row.get(KEY_FILE)
+        if not path or path in posted or (kind == "comps" and row.get(KEY_USED)):
+            continue
+        try:
+            mtimes.append(os.path.getmtime(path))
+        except OSError:
+            continue
+    pending = len(mtimes)
+    if kind == "comps":
+        pending += sum(1 for row in parse_jsonl(str(paths["comp data"]))
+                       if row.get(KEY_FILE) and row[KEY_FILE] not in posted and os.path.exists(row[KEY_FILE]))
+    age_days = (time.time() - min(mtimes)) / 86400 if mtimes else 0.0
+    return {"pending": pending, "age days": max(0.0, age_days)}
+
+def event_weight(event_name: str, backlog: Dict[str, float]) -> float:
+    """Share of slots an event earns: configured weight x sqrt(backlog) x age bonus (0 = nothing to post)."""
+    if backlog["pending"] <= 0:
+        return 0.0
+    age_bonus = 1 + AGE_WEIGHT_PER_DAY * min(backlog["age days"], AGE_CAP_DAYS)
+    return EVENT_WEIGHTS.get(event_name, 1.0) * math.sqrt(backlog["pending"]) * age_bonus
+
+def _weights(events: List[str], kind: str) -> Dict[str, float]:
+    weights = {}
+    for event_name in events:
+        try:
+            weights[event_name] = event_weight(event_name, event_backlog(event_name, kind))
+        except Exception:
+            logger.exception("Could not size the backlog of %s; treating it as weight 1.", event_name)
+            weights[event_name] = 1.0
+    return weights
+
+def rotation_order(events: List[str], kind: str) -> List[str]:
+    """
+    Order in which a `kind` ("shorts" or "comps") slot should try `events`: the event that would
+    win the next round of weighted deficit round-robin first, then the runners-up as fallbacks,
+    then events with nothing to post.
+    """
+    with _LOCK:
+        credits = _load().get(kind, {}).get("credits", {})
+    weights = _weights(events, kind)
+    return sorted(events, key=lambda e: (weights[e] <= 0, -(credits.get(e, 0.0) + weights[e]), e))
+
+def charge(events: List[str], kind: str, served: str) -> None:
+    """
+    Settle one round after `served` got a `kind` slot: every event with a backlog earns its weight
+    in credit and the served event pays the round's total. Big backlogs earn faster, so they drain
+    faster, but every event with something to post keeps earning until it is served. Events with
+    nothing pending drop their credit rather than banking it.
+    """
+    weights = _weights(events, kind)
+    total = sum(weights.values())
+    with _LOCK:
+        state = _load()
+        credits = state.get(kind, {}).get("credits", {})
+        credits = {e: credits.get(e, 0.0) + weights[e] for e in events if weights[e] > 0}
+        credits[served] = credits.get(served, 0.0) - total
+        state[kind] = {"credits": credits, "last served": served, "weights": weights}
+        _save(state)
+    logger.info("Rotation (%s): served %s; weights %s", kind,
+                served, {e: round(w, 2) for e, w in weights.items()})
@@ -0,0 +1,384 @@
+import re
+import copy
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from googleapiclient.discovery import build_from_document
+
+from YoutubeDiscovery import api_http
+
+logger = logging.getLogger(__name__)
+
+# Default behaviour of the stand-in; every knob can be changed on a running server via server.settings
+FAKE_SETTINGS: Dict[str, Any] = {
+    "latency_ms":       0,      # added to every request
+    "error_rate":       0.0,    # fraction of requests answered with error_status instead
+    "error_status":     503,
+    "quota_units":      10000,  # units before calls are refused with 403 quotaExceeded
+    "session_ttl":      None,   # seconds before a resumable session answers 404
+    "expire_sessions":  0,      # this many sessions answer 404 right after their first chunk
+    "bandwidth_bps":    0,      # server-side cap on upload bytes/sec (0 = unlimited)
+    "processing":       "succeeded",  # processingStatus reported by videos.list: succeeded | processing | failed
+}
+
+QUOTA_COSTS = {"videos.insert": 1600, "videos.list": 1, "thumbnails.set": 50}
+
+_MEDIA_UPLOAD = {
+    "accept": ["video/*", "application/octet-stream"],
+    "maxSize": "256GB",
+    "protocols": {
+        "simple": {"multipart": True, "path": "/upload/youtube/v3/videos"},
+        "resumable": {"multipart": True, "path": "/resumable/upload/youtube/v3/videos"},
+    },
+}
+
+# The subset of the YouTube v3 discovery document the uploader uses; rootUrl is filled in per server
+DISCOVERY_DOCUMENT: Dict[str, Any] = {
+    "kind": "discovery#restDescription",
+    "discoveryVersion": "v1",
+    "id": "youtube:v3",
+    "name": "youtube",
+    "version": "v3",
+    "protocol": "rest",
+    "rootUrl": "",
+    "servicePath": "youtube/v3/",
+    "batchPath": "batch/youtube/v3",
+    "parameters": {
+        "alt": {"type": "string", "location": "query", "default": "json"},
+        "key": {"type": "string", "location": "query"},
+    },
+    "schemas": {
+        "Video": {"id": "Video", "type": "object"},
+        "VideoListResponse": {"id": "VideoListResponse", "type": "object"},
+        "ThumbnailSetResponse": {"id": "ThumbnailSetResponse", "type": "object"},
+    },
+    "resources": {
+        "videos": {
+            "methods": {
+                "insert": {
+                    "id": "youtube.videos.insert",
+                    "path": "videos",
+                    "httpMethod": "POST",
+                    "parameters": {"part": {"type": "string", "required": True, "location": "query"}},
+                    "parameterOrder": ["part"],
+                    "request": {"$ref": "Video"},
+                    "response": {"$ref": "Video"},
+                    "supportsMediaUpload": True,
+                    "mediaUpload": _MEDIA_UPLOAD,
+                },
+                "list": {
+                    "id": "youtube.videos.list",
+                    "path": "videos",
+                    "httpMethod": "GET",
+                    "parameters": {
+                        "part": {"type": "string", "required": True, "location": "query"},
+                        "id": {"type": "string", "location": "query"},
+                        "maxResults": {"type": "integer", "location": "query"},
+                    },
+                    "parameterOrder": ["part"],
+                    "response": {"$ref": "VideoListResponse"},
+                },
+            },
+        },
+        "thumbnails": {
+            "methods": {
+                "set": {
+                    "id": "youtube.thumbnails.set",
+                    "path": "thumbnails/set",
+                    "httpMethod": "POST",
+                    "parameters": {"videoId": {"type": "string", "required": True, "location": "query"}},
+                    "parameterOrder": ["videoId"],
+                    "response": {"$ref": "ThumbnailSetResponse"},
+                    "supportsMediaUpload": True,
+                    "mediaUpload": {
+                        "accept": ["image/jpeg", "image/png", "application/octet-stream"],
+                        "maxSize": "2MB",
+                        "protocols": {"simple": {"multipart": True, "path": "/upload/youtube/v3/thumbnails/set"}},
+                    },
+                },
+            },
+        },
+    },
+}
+
+_CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+def _error_body(status: int, reason: str, message: str) -> Dict[str, Any]:
+    return {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+
+class FakeYoutubeServer(ThreadingHTTPServer):
+    """In-memory YouTube stand-in: sessions, videos and thumbnails live only as long as the server."""
+
+    daemon_threads = True
+
+    def __init__(self, address, settings: Optional[Dict[str, Any]] = None):
+        super().__init__(address, _Handler)
+        self.settings = dict(FAKE_SETTINGS, **(settings or {}))
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.videos: Dict[str, Dict[str, Any]] = {}
+        self.thumbnails: Dict[str, int] = {}
+        self.quota_used = 0
+        self.stats = {"requests": 0, "injected_errors": 0, "quota_refusals": 0,
+                      "expired_sessions": 0, "chunks": 0, "bytes": 0, "status_queries": 0}
+        self._ids = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def discovery_document(self) -> Dict[str, Any]:
+        doc = copy.deepcopy(DISCOVERY_DOCUMENT)
+        doc["rootUrl"] = self.base_url
+        return doc
+
+    def next_id(self, prefix: str) -> str:
+        with self.lock:
+            self._ids += 1
+            return f"{prefix}{self._ids:08d}"
+
+    def charge(self, operation: str) -> bool:
+        """Spend quota for one call; False (and nothing spent) if the day's units are used up."""
+        cost = QUOTA_COSTS[operation]
+        with self.lock:
+            if self.quota_used + cost > self.settings["quota_units"]:
+                self.stats["quota_refusals"] += 1
+                return False
+            self.quota_used += cost
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeYoutubeServer
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s " + fmt, self.address_string(), *args)
+
+    # ---- plumbing ----
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        settings = self.server.settings
+        if not settings["bandwidth_bps"] or length == 0:
+            return self.rfile.read(length) if length else b""
+        chunks, remaining, started = [], length, time.monotonic()
+        while remaining:
+            block = self.rfile.read(min(remaining, 64 * 1024))
+            if not block:
+                break
+            chunks.append(block)
+            remaining -= len(block)
+            ahead = (length - remaining) / settings["bandwidth_bps"] - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+        return b"".join(chunks)
+
+    def _send(self, status: int, payload: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, reason: str, message: str):
+        self._send(status, _error_body(status, reason, message))
+
+    def _route(self) -> Tuple[str, Dict[str, str]]:
+        parsed = urlparse(self.path)
+        return parsed.path, {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+    def _inject(self) -> bool:
+        """Apply latency and random failures; True if an error response was sent."""
+        settings = self.server.settings
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+        if settings["latency_ms"]:
+            time.sleep(settings["latency_ms"] / 1000.0)
+        if settings["error_rate"] and random.random() < settings["error_rate"]:
+            with self.server.lock:
+                self.server.stats["injected_errors"] += 1
+            self._send_error(settings["error_status"], "backendError", "Injected failure")
+            return True
+        return False
+
+    # ---- verbs ----
+    def do_GET(self):
+        path, query = self._route()
+        if path == "/discovery/v1/apis/youtube/v3/rest":
+            return self._send(200, self.server.discovery_document())
+        if path == "/_stats":
+            return self._send(200, dict(self.server.stats, quota_used=self.server.quota_used,
+                                        videos=len(self.server.videos)))
+        if self._inject():
+            return
+        if path == "/youtube/v3/videos":
+            return self._videos_list(query)
+        self._send_error(404, "notFound", f"No route for GET {path}")
+
+    def do_POST(self):
+        path, query = self._route()
+        body = self._body()
+        if self._inject():
+            return
+        if path == "/upload/youtube/v3/videos" and query.get("uploadType") == "resumable":
+            return self._start_session(query, body)
+        if path == "/upload/youtube/v3/thumbnails/set":
+            return self._thumbnails_set(query, body)
+        self._send_error(404, "notFound", f"No route for POST {path}")
+
+    def do_PUT(self):
+        path, query = self._route()
+        body = self._body()
+        if self._inject():
+            return
+        if path == "/upload/youtube/v3/videos" and "upload_id" in query:
+            return self._session_put(query["upload_id"], body)
+        self._send_error(404, "notFound", f"No route for PUT {path}")
+
+    # ---- API ----
+    def _start_session(self, query, body: bytes):
+        if not self.server.charge("videos.insert"):
+            return self._send_error(403, "quotaExceeded", "The request cannot be completed because you have exceeded your quota.")
+        try:
+            metadata = json.loads(body.decode("utf-8")) if body else {}
+        except ValueError:
+            return self._send_error(400, "parseError", "Bad metadata")
+        size = self.headers.get("X-Upload-Content-Length")
+        upload_id = self.server.next_id("session")
+        with self.server.lock:
+            self.server.sessions[upload_id] = {
+                "metadata": metadata, "size": int(size) if size else None,
+                "received": 0, "created": time.monotonic(),
+            }
+        location = f"{self.server.base_url}upload/youtube/v3/videos?uploadType=resumable&upload_id={upload_id}"
+        self._send(200, None, {"Location": location})
+
+    def _session_put(self, upload_id: str, body: bytes):
+        server = self.server
+        with server.lock:
+            session = server.sessions.get(upload_id)
+        ttl = server.settings["session_ttl"]
+        if session is None or (ttl is not None and time.monotonic() - session["created"] > ttl):
+            with server.lock:
+                server.stats["expired_sessions"] += 1
+                server.sessions.pop(upload_id, None)
+            return self._send_error(404, "notFound", "Upload session not found or expired")
+
+        match = _CONTENT_RANGE.match(self.headers.get("Content-Range", ""))
+        if not match:
+            return self._send_error(400, "badContentRange", "Missing or invalid Content-Range")
+        first, last, total = match.groups()
+        if total != "*":
+            session["size"] = int(total)
+
+        expire = False
+        if first is None:
+            with server.lock:
+                server.stats["status_queries"] += 1
+        elif int(first) == session["received"]:
+            # Only bytes that continue the upload are kept; anything else is a client retry of old data
+            with server.lock:
+                session["received"] += min(len(body), int(last) - int(first) + 1)
+                server.stats["chunks"] += 1
+                server.stats["bytes"] += len(body)
+                expire = server.settings["expire_sessions"] > 0
+                if expire:
+                    server.settings["expire_sessions"] -= 1
+                    server.stats["expired_sessions"] += 1
+                    server.sessions.pop(upload_id, None)
+            if expire:
+                return self._send_error(404, "notFound", "Upload session expired")
+
+        if session["size"] is not None and session["received"] >= session["size"]:
+            return self._finish(upload_id, session)
+        headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+        self._send(308, None, headers)
+
+    def _finish(self, upload_id: str, session: Dict[str, Any]):
+        server = self.server
+        with server.lock:
+            video = session.get("video")
+            if video is None:
+                video_id = f"fake{upload_id[-8:]}"
+                metadata = session["metadata"]
+                video = {
+                    "kind": "youtube#video", "id": video_id,
+                    "snippet": metadata.get("snippet", {}),
+                    "status": dict(metadata.get("status", {}), uploadStatus="uploaded"),
+                    "size": session["received"],
+                }
+                session["video"] = video
+                server.videos[video_id] = video
+        self._send(200, video)
+
+    def _videos_list(self, query):
+        if not self.server.charge("videos.list"):
+            return self._send_error(403, "quotaExceeded", "Quota exceeded")
+        processing = self.server.settings["processing"]
+        upload_status = {"succeeded": "processed", "failed": "failed"}.get(processing, "uploaded")
+        items = []
+        for video_id in (query.get("id") or "").split(","):
+            video = self.server.videos.get(video_id)
+            if video:
+                item = dict(video, status=dict(video["status"], uploadStatus=upload_status),
+                            processingDetails={"processingStatus": processing})
+                if processing == "failed":
+                    item["status"]["failureReason"] = "conversion"
+                items.append(item)
+        self._send(200, {"kind": "youtube#videoListResponse", "items": items})
+
+    def _thumbnails_set(self, query, body: bytes):
+        video_id = query.get("videoId")
+        if video_id not in self.server.videos:
+            return self._send_error(404, "videoNotFound", f"Video {video_id} not found")
+        if not self.server.charge("thumbnails.set"):
+            return self._send_error(403, "quotaExceeded", "Quota exceeded")
+        with self.server.lock:
+            self.server.thumbnails[video_id] = len(body)
+        self._send(200, {"kind": "youtube#thumbnailSetResponse",
+                         "items": [{"default": {"url": f"{self.server.base_url}thumb/{video_id}.jpg"}}]})
+
+
+def start_fake_youtube(port: int = 0, host: str = "127.0.0.1", **settings) -> FakeYoutubeServer:
+    """Start the stand-in on a background thread (port 0 picks a free port). Stop it with .shutdown()."""
+    server = FakeYoutubeServer((host, port), settings)
+    threading.Thread(target=server.serve_forever, name="fake-youtube", daemon=True).start()
+    logger.info("Fake YouTube API listening on %s", server.base_url)
+    return server
+
+def fake_youtube_client(server: FakeYoutubeServer):
+    """A googleapiclient YouTube resource whose calls (uploads included) go to `server`."""
+    return build_from_document(server.discovery_document(), http=api_http())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local YouTube Data API stand-in.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota", type=int, default=FAKE_SETTINGS["quota_units"])
+    cli_args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    fake = start_fake_youtube(cli_args.port, latency_ms=cli_args.latency_ms,
+                              error_rate=cli_args.error_rate, quota_units=cli_args.quota)
+    print(f"Discovery document: {fake.base_url}discovery/v1/apis/youtube/v3/rest")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.shutdown()
@@ -0,0 +1,188 @@
+import time
+import logging
+import itertools
+import threading
+import subprocess
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Kill an encode that hasn't advanced for this many seconds
+DEFAULT_STALL_TIMEOUT = 180
+# Only this many trailing stderr lines are kept (ffmpeg can print megabytes on long encodes)
+STDERR_TAIL_LINES = 60
+# How often progress is written to the log
+PROGRESS_LOG_INTERVAL = 15
+# Timeout for short ffprobe calls
+FFPROBE_TIMEOUT = 60
+
+# Latest progress per running job (by job id; labels can repeat), for anything that wants to
+# report on active encodes
+_ACTIVE: Dict[int, Dict[str, Any]] = {}
+_ACTIVE_LOCK = threading.Lock()
+_JOB_IDS = itertools.count(1)
+
+
+class FfmpegError(subprocess.CalledProcessError):
+    """ffmpeg exited non-zero. `stderr` holds the bounded stderr tail."""
+
+
+class FfmpegStalled(FfmpegError):
+    """ffmpeg was killed because it stopped making progress (or hit its overall timeout)."""
+
+
+def active_jobs() -> Dict[int, Dict[str, Any]]:
+    """Snapshot of progress for every ffmpeg job currently running, by job id (see the "label" field)."""
+    with _ACTIVE_LOCK:
+        return {k: dict(v) for k, v in _ACTIVE.items()}
+
+def _with_progress_flags(cmd: List[str]) -> List[str]:
+    # Machine-readable progress on stdout; no interactive stdin, no carriage-return stats on stderr
+    return [cmd[0], "-nostdin", "-progress", "pipe:1", "-nostats", *cmd[1:]]
+
+def _parse_out_time(fields: Dict[str, str]) -> Optional[float]:
+    for key in ("out_time_us", "out_time_ms"):  # both are microseconds in ffmpeg's progress output
+        value = fields.get(key)
+        if value and value.lstrip("-").isdigit():
+            return max(0.0, int(value) / 1_000_000)
+    return None
+
+def run_ffmpeg(
+    cmd: List[str],
+    *,
+    duration: Optional[float] = None,
+    stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT,
+    timeout: Optional[float] = None,
+    label: Optional[str] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> subprocess.CompletedProcess:
+    """
+    Run an ffmpeg command, streaming `-progress pipe:1` instead of blocking on capture_output.
+
+    Progress (fps, speed, out time and percent of `duration` when given) is logged every
+    PROGRESS_LOG_INTERVAL seconds, exposed through active_jobs(), and passed to on_progress.
+    The process is killed if its output time doesn't advance for `stall_timeout` seconds or the
+    whole run exceeds `timeout`. Only the last STDERR_TAIL_LINES lines of stderr are kept.
+
+    Raises FfmpegError (a CalledProcessError) on a non-zero exit and FfmpegStalled on a kill,
+    so callers can keep catching subprocess.CalledProcessError and reading e.stderr.
+    """
+    label = label or " ".join(str(c) for c in cmd[-1:])
+    job_id = next(_JOB_IDS)
+    full_cmd = _with_progress_flags([str(c) for c in cmd])
+    stderr_tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+
+    state: Dict[str, Any] = {
+        "label": label,
+        "started": time.time(),
+        "last_advance": time.monotonic(),
+        "out_time": 0.0,
+        "fps": None,
+        "speed": None,
+        "percent": None,
+    }
+    state_lock = threading.Lock()
+
+    proc = subprocess.Popen(
+        full_cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+
+    def _read_progress():
+        fields: Dict[str, str] = {}
+        for line in proc.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                continue
+            fields[key] = value
+            if key != "progress":
+                continue
+            out_time = _parse_out_time(fields)
+            with state_lock:
+                if out_time is not None and out_time > state["out_time"]:
+                    state["out_time"] = out_time
+                    state["last_advance"] = time.monotonic()
+                state["fps"] = fields.get("fps")
+                state["speed"] = fields.get("speed")
+                if duration:
+                    state["percent"] = min(100.0, round(100.0 * state["out_time"] / duration, 1))
+                snapshot = {k: state[k] for k in ("label", "out_time", "fps", "speed", "percent")}
+            with _ACTIVE_LOCK:
+                _ACTIVE[job_id] = snapshot
+            if on_progress:
+                try:
+                    on_progress(snapshot)
+                except Exception:
+                    logger.debug("on_progress callback failed", exc_info=True)
+            fields = {}
+
+    def _read_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line.rstrip("\n"))
+
+    readers = [
+        threading.Thread(target=_read_progress, daemon=True),
+        threading.Thread(target=_read_stderr, daemon=True),
+    ]
+    for t in readers:
+        t.start()
+
+    killed_reason = None
+    last_log = time.monotonic()
+    start = time.monotonic()
+    try:
+        while True:
+            try:
+                proc.wait(timeout=1)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            now = time.monotonic()
+            with state_lock:
+                since_advance = now - state["last_advance"]
+                snapshot = dict(state)
+
+            if stall_timeout and since_advance > stall_timeout:
+                killed_reason = f"no progress for {since_advance:.0f}s"
+            elif timeout and now - start > timeout:
+                killed_reason = f"exceeded timeout of {timeout:.0f}s"
+            if killed_reason:
+                logger.error("Killing ffmpeg (%s): %s", label, killed_reason)
+                proc.kill()
+                proc.wait()
+                break
+
+            if now - last_log >= PROGRESS_LOG_INTERVAL:
+                last_log = now
+                logger.info(
+                    "ffmpeg %s: time=%.1fs%s fps=%s speed=%s",
+                    label, snapshot["out_time"],
+                    f" ({snapshot['percent']}%)" if snapshot["percent"] is not None else "",
+                    snapshot["fps"], snapshot["speed"],
+                )
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        for t in readers:
+            t.join(timeout=5)
+        with _ACTIVE_LOCK:
+            _ACTIVE.pop(job_id, None)
+
+    stderr_text = "\n".join(stderr_tail)
+    elapsed = time.monotonic() - start
+    if killed_reason:
+        raise FfmpegStalled(proc.returncode if proc.returncode is not None else -1, full_cmd,
+                            output=None, stderr=f"[{killed_reason}]\n{stderr_text}")
+    if proc.returncode != 0:
+        raise FfmpegError(proc.returncode, full_cmd, output=None, stderr=stderr_text)
+
+    logger.info("ffmpeg %s finished in %.1fs", label, elapsed)
+    return subprocess.CompletedProcess(full_cmd, proc.returncode, stdout="", stderr=stderr_text)
@@ -0,0 +1,183 @@
+import os
+import re
+import hashlib
+import logging
+import textwrap
+from io import BytesIO
+from typing import List, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# YouTube custom thumbnails: 1280x720 (16:9), at most 2 MB
+THUMBNAIL_SIZE = (1280, 720)
+THUMBNAIL_MAX_BYTES = 2 * 1024 * 1024
+
+# Frame sampling
+THUMB_MAX_CLIPS = 8
+THUMB_SAMPLES_PER_CLIP = 5
+THUMB_SCORE_WIDTH = 480     # frames are scored at this width
+THUMB_MIN_BRIGHTNESS = 25   # skip near-black frames (mean 8-bit luma)
+
+# Title overlay
+TITLE_FONTS = ["arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf"]
+TITLE_MAX_LINES = 3
+TITLE_FONT_SIZES = (96, 84, 72, 64, 56, 48)
+TITLE_BAND_COLOR = (92, 58, 33, 200)  # same brown as the compilation pad, mostly opaque
+
+
+def _game_area(frame: np.ndarray) -> np.ndarray:
+    """Top half of the vertical clip (game), cropped to 16:9 around its centre."""
+    h, w = frame.shape[:2]
+    game = frame[: h // 2]
+    gh = game.shape[0]
+    target_h = min(gh, int(w * 9 / 16))
+    top = (gh - target_h) // 2
+    return game[top:top + target_h]
+
+def sharpness(frame: np.ndarray) -> float:
+    """Variance of the Laplacian of a downscaled grayscale frame (higher = sharper), 0 for dark frames."""
+    h, w = frame.shape[:2]
+    scale = THUMB_SCORE_WIDTH / float(w)
+    small = cv2.resize(frame, (THUMB_SCORE_WIDTH, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    if gray.mean() < THUMB_MIN_BRIGHTNESS:
+        return 0.0
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def _sample_frames(clip_path: str, trim: Optional[Tuple[float, float]] = None) -> List[np.ndarray]:
+    """Seek to evenly spaced points inside the clip (or its trim) and return the game areas."""
+    cap = cv2.VideoCapture(clip_path)
+    if not cap.isOpened():
+        return []
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 60.0
+        total = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        start, end = trim if trim else (0.0, total / fps if total else 0.0)
+        if end <= start:
+            return []
+        frames = []
+        for i in range(THUMB_SAMPLES_PER_CLIP):
+            t = start + (end - start) * (i + 1) / (THUMB_SAMPLES_PER_CLIP + 1)
+            cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000.0)
+            ok, frame = cap.read()
+            if ok and frame is not None:
+                frames.append(_game_area(frame))
+        return frames
+    finally:
+        cap.release()
+
+def pick_best_frame(
+    clip_paths: List[str],
+    trims: Optional[Dict[str, Tuple[float, float]]] = None,
+) -> Optional[np.ndarray]:
+    """Sharpest sampled frame across the first THUMB_MAX_CLIPS clips."""
+    best, best_score = None, 0.0
+    for clip in clip_paths[:THUMB_MAX_CLIPS]:
+        for frame in _sample_frames(clip, (trims or {}).get(clip)):
+            score = sharpness(frame)
+            if score > best_score:
+                best, best_score = frame, score
+    return best
+
+def _load_font(size: int):
+    for name in TITLE_FONTS:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+def _fit_title(draw: ImageDraw.ImageDraw, title: str, max_width: int):
+    """Largest font size whose wrapped title fits in TITLE_MAX_LINES lines."""
+    for size in TITLE_FONT_SIZES:
+        font = _load_font(size)
+        avg_char = max(1, draw.textlength("abcdefghijklmnopqrstuvwxyz", font=font) / 26)
+        lines = textwrap.wrap(title, width=max(8, int(max_width / avg_char)))
+        if len(lines) <= TITLE_MAX_LINES and all(draw.textlength(l, font=font) <= max_width for l in lines):
+            return font, lines
+    font = _load_font(TITLE_FONT_SIZES[-1])
+    return font, textwrap.wrap(title, width=40)[:TITLE_MAX_LINES]
+
+def compose_thumbnail(frame: np.ndarray, title: str) -> Image.Image:
+    """Resize the frame to THUMBNAIL_SIZE and draw the title on a band along the bottom."""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    image = Image.fromarray(rgb).resize(THUMBNAIL_SIZE, Image.LANCZOS).convert("RGBA")
+    if not title:
+        return image.convert("RGB")
+
+    overlay = Image.new("RGBA", image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    margin = 40
+    font, lines = _fit_title(draw, title, THUMBNAIL_SIZE[0] - 2 * margin)
+    line_h = int(font.size * 1.15)
+    band_h = line_h * len(lines) + margin
+    draw.rectangle([0, THUMBNAIL_SIZE[1] - band_h, THUMBNAIL_SIZE[0], THUMBNAIL_SIZE[1]], fill=TITLE_BAND_COLOR)
+
+    y = THUMBNAIL_SIZE[1] - band_h + margin // 2
+    for line in lines:
+        x = (THUMBNAIL_SIZE[0] - draw.textlength(line, font=font)) / 2
+        draw.text((x, y), line, font=font, fill=(255, 255, 255, 255), stroke_width=4, stroke_fill=(0, 0, 0, 255))
+        y += line_h
+    return Image.alpha_composite(image, overlay).convert("RGB")
+
+def _encode_jpeg(image: Image.Image) -> bytes:
+    """JPEG bytes under THUMBNAIL_MAX_BYTES, lowering quality as needed."""
+    data = b""
+    for quality in (92, 85, 75, 65, 50):
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        data = buffer.getvalue()
+        if len(data) <= THUMBNAIL_MAX_BYTES:
+            break
+    return data
+
+def thumbnail_path_for(video_path, thumbnails_folder=None) -> str:
+    """<thumbnails folder>/<video name>.jpg: one thumbnail per output video, whatever its title."""
+    stem = os.path.splitext(os.path.basename(str(video_path)))[0]
+    return os.path.join(str(thumbnails_folder or config.THUMBNAILS_FOLDER), f"{stem}.jpg")
+
+def _thumbnail_filename(title: str, clip_paths: List[str]) -> str:
+    # Title for readability, plus a hash of the clips so equal (or empty) titles never collide
+    name = re.sub(r"[^a-zA-Z0-9._-]", "", (title or "").replace(" ", "_")) or "compilation"
+    digest = hashlib.sha1("|".join(clip_paths).encode("utf-8")).hexdigest()[:10]
+    return f"{name}_{digest}.jpg"
+
+def generate_local_thumbnail(
+    clip_paths: List[str],
+    title: str,
+    trims: Optional[Dict[str, Tuple[float, float]]] = None,
+    output_path=None,
+) -> Optional[str]:
+    """
+    Build a compilation thumbnail from the sharpest frame of its clips with the title composited in.
+    Written to `output_path` (see thumbnail_path_for) or THUMBNAILS_FOLDER as a 1280x720 JPEG
+    under 2 MB. Returns the path, or None.
+    """
+    try:
+        frame = pick_best_frame(clip_paths, trims)
+        if frame is None:
+            logger.info("No usable frame found for a local thumbnail.")
+            return None
+        data = _encode_jpeg(compose_thumbnail(frame, title))
+    except Exception as e:
+        logger.warning("Local thumbnail generation failed: %s", e)
+        return None
+
+    if len(data) > THUMBNAIL_MAX_BYTES:
+        logger.warning("Local thumbnail is still %d bytes; not using it.", len(data))
+        return None
+
+    output_path = str(output_path or os.path.join(str(config.THUMBNAILS_FOLDER), _thumbnail_filename(title, clip_paths)))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp = output_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, output_path)
+    logger.info("Local thumbnail saved: %s", output_path)
+    return output_path
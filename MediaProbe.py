@@ -0,0 +1,203 @@
+import os
+import json
+import logging
+import subprocess
+from typing import List, Dict, Any, Optional
+
+from config import (
+    KEY_FILE, KEY_PROBE, KEY_DURATION, KEY_WIDTH, KEY_HEIGHT, KEY_CODEC,
+    KEY_FPS, KEY_HAS_AUDIO, KEY_SIZE, KEY_MTIME, KEY_PIX_FMT, KEY_PROFILE,
+    KEY_AUDIO_CODEC, KEY_SAMPLE_RATE, KEY_CHANNELS, KEY_EXTRADATA, KEY_PROBE_VERSION,
+    KEY_PROBE_FAILED,
+)
+from Mp4Atoms import mp4_duration
+from FfmpegRunner import FFPROBE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Bump when probe_file records new fields so cached probes are refreshed
+PROBE_VERSION = 3
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """Return (size, mtime) for a file, or None if it can't be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, round(st.st_mtime, 3)
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Convert an ffprobe rate like '60000/1001' to a float."""
+    if not rate:
+        return None
+    try:
+        num, _, den = rate.partition("/")
+        den_f = float(den) if den else 1.0
+        if den_f == 0:
+            return None
+        return round(float(num) / den_f, 3)
+    except ValueError:
+        return None
+
+def probe_file(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Probe a media file with a single ffprobe call.
+    Returns a dict with duration, resolution, codec, fps, audio presence, size and mtime,
+    or None if the file is missing or can't be probed.
+    """
+    sig = _file_signature(path)
+    if sig is None:
+        return None
+
+    cmd = [
+        "ffprobe", "-v", "error", "-show_data_hash", "CRC32",
+        "-show_entries",
+        "format=duration:stream=codec_type,codec_name,profile,pix_fmt,width,height,"
+        "avg_frame_rate,r_frame_rate,sample_rate,channels,extradata_hash",
+        "-of", "json", path,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=FFPROBE_TIMEOUT)
+        info = json.loads(result.stdout or "{}")
+    except Exception as e:
+        logger.info("Could not probe %s: %s", path, e)
+        return None
+
+    streams = info.get("streams") or []
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    has_audio = audio is not None
+
+    try:
+        duration = float((info.get("format") or {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = mp4_duration(path)
+
+    if video is None or not duration:
+        logger.info("Probe found no usable video stream in %s", path)
+        return None
+
+    fps = _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate"))
+
+    return {
+        KEY_DURATION:  duration,
+        KEY_WIDTH:     video.get("width"),
+        KEY_HEIGHT:    video.get("height"),
+        KEY_CODEC:     video.get("codec_name"),
+        KEY_FPS:       fps,
+        KEY_HAS_AUDIO: has_audio,
+        KEY_PIX_FMT:   video.get("pix_fmt"),
+        KEY_PROFILE:   video.get("profile"),
+        KEY_EXTRADATA: video.get("extradata_hash"),
+        KEY_AUDIO_CODEC: audio.get("codec_name") if audio else None,
+        KEY_SAMPLE_RATE: int(audio["sample_rate"]) if audio and str(audio.get("sample_rate", "")).isdigit() else None,
+        KEY_CHANNELS:    audio.get("channels") if audio else None,
+        KEY_SIZE:      sig[0],
+        KEY_MTIME:     sig[1],
+        KEY_PROBE_VERSION: PROBE_VERSION,
+    }
+
+def probe_is_fresh(probe: Optional[Dict[str, Any]], path: Optional[str]) -> bool:
+    """True if a cached probe still matches the file's current size and mtime (and probe version)."""
+    if not probe or not path or probe.get(KEY_PROBE_VERSION) != PROBE_VERSION:
+        return False
+    sig = _file_signature(path)
+    if sig is None:
+        return False
+    return probe.get(KEY_SIZE) == sig[0] and probe.get(KEY_MTIME) == sig[1]
+
+def get_probe(row: Dict[str, Any], refresh: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached probe for a videodata row.
+    If it's missing or stale (size/mtime changed) and refresh is True, re-probe and store it on the row.
+    A failed probe is remembered (KEY_PROBE_FAILED) and not retried until the file's size or mtime changes.
+    """
+    path = row.get(KEY_FILE)
+    cached = row.get(KEY_PROBE)
+    if probe_is_fresh(cached, path):
+        return cached
+    if not refresh or not path or _probe_failed(row):
+        return None
+
+    probe = probe_file(path)
+    if probe is None:
+        row.pop(KEY_PROBE, None)
+        sig = _file_signature(path)
+        if sig is not None:
+            row[KEY_PROBE_FAILED] = {KEY_SIZE: sig[0], KEY_MTIME: sig[1], KEY_PROBE_VERSION: PROBE_VERSION}
+    else:
+        row[KEY_PROBE] = probe
+        row.pop(KEY_PROBE_FAILED, None)
+    return probe
+
+def _probe_failed(row: Dict[str, Any]) -> bool:
+    """True if the row's file already failed to probe at its current size and mtime."""
+    return probe_is_fresh(row.get(KEY_PROBE_FAILED), row.get(KEY_FILE))
+
+def get_duration(row: Dict[str, Any], refresh: bool = True) -> Optional[float]:
+    """
+    Duration in seconds from the row's probe. If the probe is missing or stale, MP4
+    files are read natively from their mvhd/mdhd boxes; ffprobe is only the last resort.
+    """
+    path = row.get(KEY_FILE)
+    cached = row.get(KEY_PROBE)
+    if probe_is_fresh(cached, path):
+        return cached.get(KEY_DURATION)
+    if path and path.lower().endswith((".mp4", ".mov", ".m4v")):
+        duration = mp4_duration(path)
+        if duration:
+            return duration
+    probe = get_probe(row, refresh=refresh)
+    return probe.get(KEY_DURATION) if probe else None
+
+def probe_rows(rows: List[Dict[str, Any]]) -> int:
+    """
+    Ensure every row with a file path carries a fresh probe (or a fresh record that probing failed).
+    Returns the number of rows whose probe was (re)written.
+    """
+    updated = 0
+    for row in rows:
+        if not isinstance(row, dict) or not row.get(KEY_FILE):
+            continue
+        before = (row.get(KEY_PROBE), row.get(KEY_PROBE_FAILED))
+        if probe_is_fresh(before[0], row[KEY_FILE]):
+            continue
+        get_probe(row)
+        if (row.get(KEY_PROBE), row.get(KEY_PROBE_FAILED)) != before:
+            updated += 1
+    return updated
+
+def probe_paths(paths: List[str], cache_path: Optional[str] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Probe files that aren't in videodata (e.g. set recordings), reusing a JSON cache
+    {file name: probe} next to them. Only missing or stale entries are re-probed.
+    """
+    cache: Dict[str, Dict[str, Any]] = {}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.info("Ignoring unreadable probe cache %s: %s", cache_path, e)
+
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    changed = False
+    for path in paths:
+        name = os.path.basename(path)
+        probe = cache.get(name)
+        if not probe_is_fresh(probe, path):
+            probe = probe_file(path)
+            changed = True
+            if probe is None:
+                cache.pop(name, None)
+            else:
+                cache[name] = probe
+        results[path] = probe
+
+    if cache_path and changed:
+        tmp = cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, cache_path)
+    return results
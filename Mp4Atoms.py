@@ -0,0 +1,146 @@
+import os
+import mmap
+import struct
+import logging
+from typing import Dict, Any, Optional, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Containers we descend into while looking for mvhd/mdhd/hdlr/mehd
+_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"mvex"}
+
+
+def _iter_boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int, int]]:
+    """
+    Yield (type, box_start, payload_start, box_end) for each box in buf[start:end].
+    Stops at the first malformed header; a box running past `end` is clipped and
+    reported with box_end > end so callers can flag truncation.
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos  # box extends to end of file
+        if size < header:
+            return
+        yield box_type, pos, pos + header, pos + size
+        pos += size
+
+def _read_time_header(buf, payload: int) -> Tuple[int, int]:
+    """Parse (timescale, duration) from an mvhd/mdhd payload (version 0 or 1)."""
+    version = buf[payload]
+    if version == 1:
+        # flags(3) creation(8) modification(8) timescale(4) duration(8)
+        timescale, duration = struct.unpack_from(">IQ", buf, payload + 4 + 16)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        # flags(3) creation(4) modification(4) timescale(4) duration(4)
+        timescale, duration = struct.unpack_from(">II", buf, payload + 4 + 8)
+        unknown = 0xFFFFFFFF
+    if duration == unknown:
+        duration = 0
+    return timescale, duration
+
+def _walk_moov(buf, start: int, end: int, info: Dict[str, Any], track: Optional[Dict[str, Any]] = None) -> None:
+    for box_type, _, payload, box_end in _iter_boxes(buf, start, end):
+        box_end = min(box_end, end)
+        if box_type == b"mvhd":
+            info["timescale"], info["duration_units"] = _read_time_header(buf, payload)
+        elif box_type == b"mehd":
+            # Fragmented MP4: total fragment duration in movie timescale units
+            version = buf[payload]
+            fmt = ">Q" if version == 1 else ">I"
+            info["fragment_duration_units"] = struct.unpack_from(fmt, buf, payload + 4)[0]
+            info["fragmented"] = True
+        elif box_type == b"mvex":
+            info["fragmented"] = True
+            _walk_moov(buf, payload, box_end, info, track)
+        elif box_type == b"trak":
+            new_track: Dict[str, Any] = {}
+            _walk_moov(buf, payload, box_end, info, new_track)
+            info["tracks"].append(new_track)
+        elif box_type == b"mdhd" and track is not None:
+            track["timescale"], track["duration_units"] = _read_time_header(buf, payload)
+        elif box_type == b"hdlr" and track is not None:
+            # version/flags(4) pre_defined(4) handler_type(4)
+            track["handler"] = bytes(buf[payload + 8:payload + 12]).decode("latin-1")
+        elif box_type in _CONTAINER_BOXES:
+            _walk_moov(buf, payload, box_end, info, track)
+
+def read_mp4_info(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Inspect an MP4/MOV file's box structure without decoding or spawning a process.
+
+    Returns a dict with:
+      duration (seconds or None), timescale, tracks (handler/timescale/duration per trak),
+      moov_offset, mdat_offset, faststart (moov before mdat), fragmented, truncated
+    or None if the file can't be read or has no top-level boxes.
+    """
+    try:
+        size = os.path.getsize(path)
+        if size < 8:
+            return None
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            info: Dict[str, Any] = {
+                "timescale": None,
+                "duration_units": 0,
+                "tracks": [],
+                "moov_offset": None,
+                "mdat_offset": None,
+                "fragmented": False,
+                "truncated": False,
+            }
+            seen_any = False
+            for box_type, box_start, payload, box_end in _iter_boxes(buf, 0, size):
+                seen_any = True
+                if box_end > size:
+                    info["truncated"] = True
+                if box_type == b"moov" and info["moov_offset"] is None:
+                    info["moov_offset"] = box_start
+                    _walk_moov(buf, payload, min(box_end, size), info)
+                elif box_type == b"mdat" and info["mdat_offset"] is None:
+                    info["mdat_offset"] = box_start
+    except (OSError, ValueError, struct.error) as e:
+        logger.info("Could not read MP4 boxes from %s: %s", path, e)
+        return None
+
+    if not seen_any:
+        return None
+
+    timescale = info["timescale"]
+    units = info["duration_units"] or info.get("fragment_duration_units", 0)
+    info["duration"] = (units / timescale) if timescale and units else None
+    for track in info["tracks"]:
+        ts = track.get("timescale")
+        track["duration"] = (track.get("duration_units", 0) / ts) if ts else None
+
+    moov, mdat = info["moov_offset"], info["mdat_offset"]
+    info["faststart"] = moov is not None and (mdat is None or moov < mdat)
+    return info
+
+def _info_duration(info: Dict[str, Any]) -> Optional[float]:
+    if info["duration"]:
+        return info["duration"]
+    track_durations = [t["duration"] for t in info["tracks"] if t.get("duration")]
+    return max(track_durations) if track_durations else None
+
+def mp4_duration(path: str) -> Optional[float]:
+    """Duration in seconds from mvhd (falling back to the longest mdhd track), or None."""
+    info = read_mp4_info(path)
+    return _info_duration(info) if info else None
+
+def needs_remux(path: str) -> bool:
+    """
+    True if a faststart remux would change anything: moov is missing, sits after mdat,
+    the file is fragmented, or no duration is recorded.
+    """
+    info = read_mp4_info(path)
+    if not info or info["truncated"] or info["moov_offset"] is None:
+        return True
+    return (not info["faststart"]) or info["fragmented"] or not _info_duration(info)
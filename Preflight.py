@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import (
+    KEY_FILE, KEY_PROBE, KEY_DURATION, KEY_SIZE, KEY_MTIME,
+    KEY_PREFLIGHT, KEY_PREFLIGHT_OK, KEY_PREFLIGHT_REASON, KEY_SHA256,
+)
+from ProcessComboTextFile import parse_jsonl, update_jsonl_rows
+from MediaProbe import get_probe, _file_signature
+from Mp4Atoms import read_mp4_info
+
+logger = logging.getLogger(__name__)
+
+# A file must keep the same size/mtime across two checks this many seconds apart
+PREFLIGHT_STABLE_SECONDS = 5
+# Shorter wait when a row is checked inline right before its upload
+PREFLIGHT_INLINE_WAIT = 2
+# Also store a SHA-256 of each validated file (reads the whole file once)
+PREFLIGHT_HASH = False
+PREFLIGHT_HASH_CHUNK = 4 * 1024 * 1024
+# Rows checked per background pass
+PREFLIGHT_BATCH_SIZE = 50
+
+_MP4_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(PREFLIGHT_HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _content_problem(row: Dict[str, Any]) -> Optional[str]:
+    """Reason the row's file can't be uploaded as-is, or None if it looks complete."""
+    path = row[KEY_FILE]
+    if os.path.getsize(path) == 0:
+        return "empty file"
+    if path.lower().endswith(_MP4_EXTENSIONS):
+        info = read_mp4_info(path)
+        if info is None:
+            return "unreadable MP4 container"
+        if info["truncated"]:
+            return "truncated MP4 (a box runs past end of file)"
+        if info["moov_offset"] is None:
+            return "no moov box (recording not finalized)"
+    probe = get_probe(row)
+    if not probe:
+        return "ffprobe found no usable video stream"
+    if not probe.get(KEY_DURATION) or probe[KEY_DURATION] <= 0:
+        return "zero duration"
+    return None
+
+def _record(sig: Tuple[int, float], ok: bool, reason: Optional[str], path: str) -> Dict[str, Any]:
+    entry = {KEY_PREFLIGHT_OK: ok, KEY_PREFLIGHT_REASON: reason, KEY_SIZE: sig[0], KEY_MTIME: sig[1]}
+    if ok and PREFLIGHT_HASH:
+        entry[KEY_SHA256] = _sha256(path)
+    return entry
+
+def preflight_status(row: Dict[str, Any]) -> Optional[bool]:
+    """True/False from a stored check that still matches the file, or None if it needs (re)checking."""
+    entry = row.get(KEY_PREFLIGHT)
+    sig = _file_signature(row.get(KEY_FILE) or "")
+    if not entry or sig is None:
+        return None
+    if entry.get(KEY_SIZE) != sig[0] or entry.get(KEY_MTIME) != sig[1]:
+        return None
+    return bool(entry.get(KEY_PREFLIGHT_OK))
+
+def preflight_rows(rows: List[Dict[str, Any]], wait: float = PREFLIGHT_STABLE_SECONDS) -> List[Dict[str, Any]]:
+    """
+    Validate rows in place (stores KEY_PREFLIGHT on each) and return the rows that changed.
+    Every file is stat'ed, then stat'ed again after one shared `wait`; a file that is still
+    being written is left without a verdict (and not returned) so a later pass checks it again.
+    """
+    first: Dict[int, Tuple[int, float]] = {}
+    for i, row in enumerate(rows):
+        sig = _file_signature(row.get(KEY_FILE) or "")
+        if sig is not None:
+            first[i] = sig
+    if first and wait > 0:
+        time.sleep(wait)
+
+    changed = []
+    for i, sig in first.items():
+        row = rows[i]
+        path = row[KEY_FILE]
+        second = _file_signature(path)
+        if second is None:
+            continue
+        if second != sig:
+            # No verdict is stored: the file may have just finished, and its final signature
+            # must be checked on the next pass rather than failed for good
+            logger.info("Preflight deferred for %s: file still changing", path)
+            row.pop(KEY_PREFLIGHT, None)
+            continue
+        try:
+            reason = _content_problem(row)
+        except OSError as e:
+            reason = f"unreadable: {e}"
+        row[KEY_PREFLIGHT] = _record(second, reason is None, reason, path)
+        if not row[KEY_PREFLIGHT][KEY_PREFLIGHT_OK]:
+            logger.warning("Preflight failed for %s: %s", path, row[KEY_PREFLIGHT][KEY_PREFLIGHT_REASON])
+        changed.append(row)
+    return changed
+
+def ensure_preflight(row: Dict[str, Any], wait: float = PREFLIGHT_INLINE_WAIT) -> bool:
+    """Stored verdict for a row, checking it now if it has none (used right before an upload)."""
+    status = preflight_status(row)
+    if status is None:
+        preflight_rows([row], wait=wait)
+        status = preflight_status(row)
+    return bool(status)
+
+def preflight_backlog(data_path, posted_vids_path=None, limit: Optional[int] = PREFLIGHT_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Check unposted rows whose verdict is missing or stale and merge the results (and any
+    refreshed probes) into the data file. Returns (passed, failed).
+    """
+    posted = set()
+    if posted_vids_path and os.path.exists(posted_vids_path):
+        with open(posted_vids_path, "r", encoding="utf-8") as f:
+            posted = {line.rstrip("\n") for line in f}
+
+    todo = []
+    for row in parse_jsonl(str(data_path)):
+        path = row.get(KEY_FILE)
+        if not path or path in posted or not os.path.exists(path) or preflight_status(row) is not None:
+            continue
+        todo.append(row)
+        if limit is not None and len(todo) >= limit:
+            break
+    if not todo:
+        return 0, 0
+
+    checked = preflight_rows(todo)
+    patches = {row[KEY_FILE]: {KEY_PREFLIGHT: row[KEY_PREFLIGHT], KEY_PROBE: row.get(KEY_PROBE)} for row in checked}
+    update_jsonl_rows(str(data_path), patches)
+
+    failed = sum(1 for row in checked if not row[KEY_PREFLIGHT][KEY_PREFLIGHT_OK])
+    logger.info("Preflight %s: %d passed, %d failed", os.path.basename(str(data_path)), len(checked) - failed, failed)
+    return len(checked) - failed, failed
@@ -3,12 +3,14 @@ import os
 import json
 import datetime
 import logging
+import threading
 from typing import List, Dict, Any, Optional
 
 import config
 from config import KEY_TIMESTAMP, KEY_FILE, KEY_TITLE, KEY_PROMPT, KEY_DESC, KEY_TRIGGER, KEY_SOURCE, KEY_PHASE, KEY_ACTIVE, KEY_EVENT, KEY_COMBO, KEY_PLAYERS, KEY_PLAYER_IN, KEY_START_PER, KEY_CUR_PER, KEY_END_PER, KEY_MOVES, KEY_MOVE_ID, KEY_DID_KILL, KEY_SETTINGS, KEY_STAGE_ID, KEY_PORT, KEY_CHAR_ID, KEY_TAG, KEY_ID, KEY_FIXED
 from resources import stage_dict, character_dict, move_dict, character_movenames_dict
 from AI_functions import provide_AI_title, provide_AI_desc
+from MediaProbe import probe_rows
 
 logger = logging.getLogger(__name__)
 
@@ -39,15 +41,43 @@ def parse_jsonl(path: str) -> List[Dict[str, Any]]:
 def append_jsonl(path: str, rows: List[Dict[str, Any]]) -> None:
     """Append one JSON object per line to a .jsonl file, creating the file if needed."""
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
+    # Under the file's lock so an append can't land between another writer's read and replace
+    with jsonl_lock(path), open(path, "a", encoding="utf-8") as f:
         for r in rows:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
+# One lock per data file so background workers and slot handlers don't interleave rewrites
+_FILE_LOCKS: Dict[str, threading.RLock] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+def jsonl_lock(path) -> threading.RLock:
+    """Process-wide lock for read-modify-write cycles on a .jsonl file."""
+    key = os.path.abspath(str(path))
+    with _FILE_LOCKS_GUARD:
+        return _FILE_LOCKS.setdefault(key, threading.RLock())
+
+# One lock per data file for the long prep passes (analysis, proxy encodes) over its rows
+_PREP_LOCKS: Dict[str, threading.RLock] = {}
+
+def prep_lock(path) -> threading.RLock:
+    """
+    Process-wide lock held for a whole prep pass over a .jsonl file, so two jobs never analyze
+    or encode the same clip into the same temp file at once. Unlike jsonl_lock it is held while
+    ffmpeg runs, so never take it around a quick row update.
+    """
+    key = os.path.abspath(str(path))
+    with _FILE_LOCKS_GUARD:
+        return _PREP_LOCKS.setdefault(key, threading.RLock())
+
 def write_jsonl_atomic(path: str, rows: List[Dict[str, Any]]) -> None:
     """Rewrite an entire .jsonl file atomically."""
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
     tmp = f"{path}.tmp"
     
+    with jsonl_lock(path):
+        _write_jsonl_locked(path, tmp, rows)
+
+def _write_jsonl_locked(path: str, tmp: str, rows: List[Dict[str, Any]]) -> None:
     try:
         with open(tmp, "w", encoding="utf-8") as f:
             
@@ -61,6 +91,31 @@ def write_jsonl_atomic(path: str, rows: List[Dict[str, Any]]) -> None:
     except Exception as e:
         logging.exception(f"Error writing to {path}: {e}")
 
+def update_jsonl_rows(path: str, patches: Dict[str, Dict[str, Any]], key: str = KEY_FILE) -> int:
+    """
+    Re-read a .jsonl file under its lock and merge `patches` (row[key] -> fields) into the
+    matching rows, so a long-running worker only writes the fields it owns.
+    A patch value of None removes that field. Returns the number of rows changed.
+    """
+    if not patches:
+        return 0
+    with jsonl_lock(path):
+        rows = parse_jsonl(path)
+        changed = 0
+        for row in rows:
+            patch = patches.get(row.get(key))
+            if not patch:
+                continue
+            for field, value in patch.items():
+                if value is None:
+                    row.pop(field, None)
+                else:
+                    row[field] = value
+            changed += 1
+        if changed:
+            write_jsonl_atomic(path, rows)
+    return changed
+
 
 def _parse_dt_loose(ts_str: str) -> Optional[datetime.datetime]:
     """
@@ -295,11 +350,12 @@ def write_title_prompt(combo: Dict[str, Any]) -> str:
         logger.warning("Failed to build title prompt: %s", e)
         return "Hype Melee combo!"
 
-def write_video_titles(combodata_file_path: str, videodata_file_path: str) -> None:
+def write_video_titles(combodata_file_path: str, videodata_file_path: str, event_name: Optional[str] = None) -> None:
     """
     Generate AI titles for each combo not yet represented in videodata (.jsonl).
     Initializes descriptions as None and stores the raw Prompt used.
     Normalizes timestamp to TS_FMT for storage in videodata.
+    `event_name` picks the event the titles are written for (default: the active one).
     """
     # Combos are already JSONL via your new parse_combos
     combos = parse_jsonl(combodata_file_path)
@@ -323,7 +379,7 @@ def write_video_titles(combodata_file_path: str, videodata_file_path: str) -> No
         ts_norm = ts_dt.strftime(TS_FMT) if ts_dt else ts_raw
 
         prompt = write_title_prompt(c)
-        title_resp = provide_AI_title(prompt)
+        title_resp = provide_AI_title(prompt, event_name)
         # guard against accidental wrapping quotes / whitespace
         title = (title_resp or "").strip('"')
 
@@ -354,21 +410,21 @@ def write_video_titles(combodata_file_path: str, videodata_file_path: str) -> No
 def write_video_descriptions(videodata_file_path: str) -> None:
     """
     Fill in descriptions where KEY_DESC is None (or missing) for a JSONL videodata file.
-    Rewrites the JSONL file atomically after updates.
+    The AI calls run unlocked; only KEY_DESC is merged back (by timestamp, since rows may not be paired yet).
     """
     video_rows = parse_jsonl(videodata_file_path)
     if not video_rows:
         logger.info("No videodata found: %s", videodata_file_path)
         return
 
-    updated = 0
+    descriptions: Dict[str, Dict[str, Any]] = {}
 
     for v in video_rows:
         if not isinstance(v, dict):
             continue
 
         # Treat missing KEY_DESC or explicit None as needing a description
-        if v.get(KEY_DESC) is None:
+        if v.get(KEY_DESC) is None and v.get(KEY_TIMESTAMP):
             title = (v.get(KEY_TITLE) or "").strip().strip('"')
             if not title:
                 # If there's no title, skip generating to avoid junk prompts
@@ -378,15 +434,14 @@ def write_video_descriptions(videodata_file_path: str) -> None:
             desc_model = (provide_AI_desc(title) or "").strip().strip('"')
             prompt = v.get(KEY_PROMPT, "") or ""
 
-            v[KEY_DESC] = (
+            descriptions[v[KEY_TIMESTAMP]] = {KEY_DESC: (
                 "Check out flippi.gg to learn more about this project!"
                 "\n\n" + prompt +
                 ("\n\n" + desc_model if desc_model else "")
-            )
-            updated += 1
+            )}
 
+    updated = update_jsonl_rows(videodata_file_path, descriptions, key=KEY_TIMESTAMP)
     if updated:
-        write_jsonl_atomic(videodata_file_path, video_rows)
         logger.info(
             "Descriptions added: descriptions_filled=%d file=%s",
             updated, videodata_file_path
@@ -445,9 +500,14 @@ def find_closest_video_file(timestamp: str, video_folder_path: str, used_files:
 def pair_videodata_with_videofiles(videodata_file_path: str, video_folder_path: str) -> None:
     """
     Match entries in videodata.jsonl with actual video files in a folder.
-    Updates KEY_FILE for entries that don’t yet have a file path.
-    Rewrites the JSONL file atomically after updates.
+    Updates KEY_FILE for entries that don’t yet have a file path, and probes each paired
+    file once so later stages can read duration/resolution/etc. from the row.
+    Rewrites the JSONL file atomically after updates, holding its lock from read to write.
     """
+    with jsonl_lock(videodata_file_path):
+        _pair_locked(videodata_file_path, video_folder_path)
+
+def _pair_locked(videodata_file_path: str, video_folder_path: str) -> None:
     video_rows = parse_jsonl(videodata_file_path)
     if not video_rows:
         logger.info("No videodata found: %s", videodata_file_path)
@@ -471,11 +531,14 @@ def pair_videodata_with_videofiles(videodata_file_path: str, video_folder_path:
         else:
             unmatched += 1
 
-    if paired > 0:
+    # Probe new pairings (and any rows whose file changed size/mtime since the last probe)
+    probed = probe_rows(video_rows)
+
+    if paired > 0 or probed > 0:
         write_jsonl_atomic(videodata_file_path, video_rows)
         logger.info(
-            "Paired video files written: files_paired=%d unmatched=%d file=%s",
-            paired, unmatched, videodata_file_path
+            "Paired video files written: files_paired=%d probed=%d unmatched=%d file=%s",
+            paired, probed, unmatched, videodata_file_path
         )
     else:
         logger.info("No updates to file paths. files_paired=%d unmatched=%d", paired, unmatched)
\ No newline at end of file
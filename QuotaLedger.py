@@ -0,0 +1,131 @@
+import os
+import json
+import logging
+import datetime
+import threading
+from typing import Dict, Any, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API quota: units per project per day, reset at midnight Pacific time
+DAILY_QUOTA_UNITS = 10000
+# Units per call (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS: Dict[str, int] = {
+    "videos.insert":   1600,
+    "thumbnails.set":  50,
+    "search.list":     100,
+    "videos.list":     1,
+}
+# Units held back for small calls (thumbnails, status checks) when admitting uploads
+QUOTA_SAFETY_MARGIN = 100
+
+QUOTA_LEDGER_FILE = config.STATE_FOLDER / "quota_ledger.json"
+QUOTA_TIMEZONE = "America/Los_Angeles"
+
+_LOCK = threading.RLock()
+_warned_tz = False
+
+
+def _pacific_now() -> datetime.datetime:
+    """Current time in Pacific time (falls back to a fixed UTC-8 if tz data is unavailable)."""
+    global _warned_tz
+    try:
+        from zoneinfo import ZoneInfo
+        return datetime.datetime.now(ZoneInfo(QUOTA_TIMEZONE))
+    except Exception:
+        if not _warned_tz:
+            logger.warning("Time zone data for %s unavailable (pip install tzdata); using UTC-8.", QUOTA_TIMEZONE)
+            _warned_tz = True
+        return datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=-8)))
+
+def quota_day() -> str:
+    """The quota day (Pacific date) as YYYY-MM-DD."""
+    return _pacific_now().date().isoformat()
+
+def seconds_until_reset() -> float:
+    """Seconds until the next Pacific midnight."""
+    now = _pacific_now()
+    tomorrow = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(0.0, (tomorrow - now).total_seconds())
+
+def _empty(day: str) -> Dict[str, Any]:
+    return {"day": day, "used": 0, "operations": {}, "exhausted": False}
+
+def _load() -> Dict[str, Any]:
+    """Today's ledger; a ledger from an earlier quota day is replaced by an empty one."""
+    day = quota_day()
+    path = str(QUOTA_LEDGER_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                ledger = json.load(f)
+            if ledger.get("day") == day:
+                return ledger
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Could not read quota ledger %s: %s", path, e)
+    return _empty(day)
+
+def _save(ledger: Dict[str, Any]) -> None:
+    path = str(QUOTA_LEDGER_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def cost_of(operation: str, count: int = 1) -> int:
+    return QUOTA_COSTS[operation] * count
+
+def units_used() -> int:
+    with _LOCK:
+        return int(_load()["used"])
+
+def units_remaining() -> int:
+    """Units left today (0 once the API has reported quotaExceeded)."""
+    with _LOCK:
+        ledger = _load()
+        if ledger.get("exhausted"):
+            return 0
+        return max(0, DAILY_QUOTA_UNITS - int(ledger["used"]))
+
+def can_afford(operation: str, count: int = 1, margin: Optional[int] = None) -> bool:
+    """
+    True if today's remaining units cover `count` calls of `operation`.
+    Uploads keep QUOTA_SAFETY_MARGIN in reserve so their thumbnail/status calls still fit.
+    """
+    if margin is None:
+        margin = QUOTA_SAFETY_MARGIN if operation == "videos.insert" else 0
+    return units_remaining() >= cost_of(operation, count) + margin
+
+def record(operation: str, count: int = 1) -> int:
+    """Charge `count` calls of `operation` to today's ledger. Returns units remaining."""
+    with _LOCK:
+        ledger = _load()
+        ledger["used"] = int(ledger["used"]) + cost_of(operation, count)
+        ops = ledger.setdefault("operations", {})
+        ops[operation] = ops.get(operation, 0) + count
+        _save(ledger)
+        remaining = 0 if ledger.get("exhausted") else max(0, DAILY_QUOTA_UNITS - ledger["used"])
+    logger.debug("Quota: %s x%d recorded, %d units left today", operation, count, remaining)
+    return remaining
+
+def mark_exhausted() -> None:
+    """The API said quotaExceeded: nothing more is admitted until the Pacific day rolls over."""
+    with _LOCK:
+        ledger = _load()
+        ledger["exhausted"] = True
+        _save(ledger)
+    logger.warning("Quota exhausted for %s; resets in %.1f hours.", quota_day(), seconds_until_reset() / 3600)
+
+def admit(operation: str, count: int = 1, what: str = "") -> bool:
+    """can_afford with a log line explaining a deferral."""
+    if can_afford(operation, count):
+        return True
+    logger.info(
+        "Deferring %s: %s x%d needs %d units, %d left today (resets in %.1f h).",
+        what or operation, operation, count, cost_of(operation, count), units_remaining(),
+        seconds_until_reset() / 3600,
+    )
+    return False
@@ -0,0 +1,212 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+from googleapiclient.errors import HttpError
+
+import config
+from config import KEY_ID, KEY_THUMBNAIL, KEY_THUMBNAIL_SET
+from ProcessComboTextFile import parse_jsonl, append_jsonl, write_jsonl_atomic, update_jsonl_rows, jsonl_lock
+import QuotaLedger
+
+logger = logging.getLogger(__name__)
+
+# Append-only journal of thumbnail jobs shared by all events. Each line is one event:
+#   {"op": "add",  videoId, thumbnail, "data file"}     queued when an upload finishes
+#   {"op": "retry", videoId, "attempts", "next try"}    a set failed; try again later
+#   {"op": "done" | "dead", videoId}                    set, or given up
+# The latest line per videoId is its state.
+THUMBNAIL_QUEUE_FILE = config.STATE_FOLDER / "thumbnail_queue.jsonl"
+
+THUMB_BASE_BACKOFF_SECONDS = 60
+THUMB_MAX_BACKOFF_SECONDS = 6 * 3600
+THUMB_MAX_ATTEMPTS = 8
+# Rewrite the journal with only open jobs once it grows past this many lines
+THUMB_COMPACT_LINES = 500
+# 4xx reasons worth retrying; any other 4xx (e.g. custom thumbnails not allowed) gives up at once,
+# except 401/authError, which re-authorises and keeps the job
+THUMB_RETRIABLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+# KEY_THUMBNAIL_SET value for a row whose job was given up, so startup doesn't queue it again
+THUMB_DEAD = "dead"
+
+KEY_OP = "op"
+KEY_DATA_FILE = "data file"
+KEY_ATTEMPTS = "attempts"
+KEY_NEXT_TRY = "next try"
+
+_drain_lock = threading.Lock()
+
+
+def _queue_path() -> str:
+    return str(THUMBNAIL_QUEUE_FILE)
+
+def _replay(lines: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Fold the journal into {videoId: job} for jobs that are still open."""
+    jobs: Dict[str, Dict[str, Any]] = {}
+    for line in lines:
+        vid = line.get(KEY_ID)
+        op = line.get(KEY_OP)
+        if not vid:
+            continue
+        if op == "add":
+            jobs[vid] = {KEY_ID: vid, KEY_THUMBNAIL: line.get(KEY_THUMBNAIL),
+                         KEY_DATA_FILE: line.get(KEY_DATA_FILE), KEY_ATTEMPTS: 0, KEY_NEXT_TRY: 0}
+        elif op == "retry" and vid in jobs:
+            jobs[vid][KEY_ATTEMPTS] = line.get(KEY_ATTEMPTS, 0)
+            jobs[vid][KEY_NEXT_TRY] = line.get(KEY_NEXT_TRY, 0)
+        elif op in ("done", "dead"):
+            jobs.pop(vid, None)
+    return jobs
+
+def pending_jobs() -> List[Dict[str, Any]]:
+    """Open jobs in the order they were queued."""
+    with jsonl_lock(_queue_path()):
+        return list(_replay(parse_jsonl(_queue_path())).values())
+
+def enqueue(video_id: str, thumbnail, data_file) -> None:
+    """Queue a thumbnail for an uploaded video (no-op if that video already has an open job)."""
+    if not video_id or not thumbnail:
+        return
+    path = _queue_path()
+    with jsonl_lock(path):
+        if video_id in _replay(parse_jsonl(path)):
+            return
+        append_jsonl(path, [{
+            KEY_OP: "add", KEY_ID: video_id,
+            KEY_THUMBNAIL: str(thumbnail).replace("\\", "/"),
+            KEY_DATA_FILE: str(data_file).replace("\\", "/"),
+        }])
+    logger.info("Thumbnail queued for video %s", video_id)
+
+def enqueue_unset_from(data_file) -> int:
+    """
+    Queue every uploaded row in a data file whose thumbnail hasn't been set (one-time catch-up).
+    Rows whose job the journal already gave up on are flagged THUMB_DEAD instead of re-queued.
+    """
+    with jsonl_lock(_queue_path()):
+        dead = {line.get(KEY_ID) for line in parse_jsonl(_queue_path()) if line.get(KEY_OP) == "dead"}
+    queued = 0
+    given_up: Dict[str, Dict[str, Any]] = {}
+    for row in parse_jsonl(str(data_file)):
+        if row.get(KEY_ID) and row.get(KEY_THUMBNAIL) and row.get(KEY_THUMBNAIL_SET) is False:
+            if row[KEY_ID] in dead:
+                given_up[row[KEY_ID]] = {KEY_THUMBNAIL_SET: THUMB_DEAD}
+                continue
+            enqueue(row[KEY_ID], row[KEY_THUMBNAIL], data_file)
+            queued += 1
+    update_jsonl_rows(str(data_file), given_up, key=KEY_ID)
+    return queued
+
+def _backoff_seconds(attempts: int) -> float:
+    delay = min(THUMB_MAX_BACKOFF_SECONDS, THUMB_BASE_BACKOFF_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * (0.5 + random.random() / 2)
+
+def _compact() -> None:
+    path = _queue_path()
+    with jsonl_lock(path):
+        lines = parse_jsonl(path)
+        if len(lines) <= THUMB_COMPACT_LINES:
+            return
+        rows = []
+        for job in _replay(lines).values():
+            rows.append({KEY_OP: "add", KEY_ID: job[KEY_ID], KEY_THUMBNAIL: job[KEY_THUMBNAIL],
+                         KEY_DATA_FILE: job[KEY_DATA_FILE]})
+            if job[KEY_ATTEMPTS]:
+                rows.append({KEY_OP: "retry", KEY_ID: job[KEY_ID],
+                             KEY_ATTEMPTS: job[KEY_ATTEMPTS], KEY_NEXT_TRY: job[KEY_NEXT_TRY]})
+        write_jsonl_atomic(path, rows)
+        logger.info("Thumbnail queue compacted: %d line(s) -> %d", len(lines), len(rows))
+
+def drain_thumbnail_queue(youtube=None, max_jobs: Optional[int] = None) -> int:
+    """
+    Set every due thumbnail in the queue. Failures are retried with exponential backoff up to
+    THUMB_MAX_ATTEMPTS (non-retriable 4xx errors give up at once; a 401 invalidates the credentials
+    and ends the drain with the job kept); each outcome is one appended
+    journal line. Outcomes are flagged in their data files (True, or THUMB_DEAD) with one batched
+    row update per file. Returns the number set.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        logger.info("Thumbnail queue is already being drained.")
+        return 0
+    try:
+        now = time.time()
+        due = [j for j in pending_jobs() if j[KEY_NEXT_TRY] <= now]
+        if max_jobs is not None:
+            due = due[:max_jobs]
+        if not due:
+            return 0
+
+        if youtube is None:
+            from YoutubeVideoUpload import get_authenticated_service
+            youtube = get_authenticated_service()
+
+        journal: List[Dict[str, Any]] = []
+        set_count = 0
+        done_by_file: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+
+        def _give_up(job):
+            journal.append({KEY_OP: "dead", KEY_ID: job[KEY_ID]})
+            if job.get(KEY_DATA_FILE):
+                done_by_file[job[KEY_DATA_FILE]][job[KEY_ID]] = {KEY_THUMBNAIL_SET: THUMB_DEAD}
+
+        for job in due:
+            vid, thumb = job[KEY_ID], job[KEY_THUMBNAIL]
+            if not thumb or not os.path.exists(thumb) or os.path.getsize(thumb) == 0:
+                logger.warning("Thumbnail file missing for video %s; dropping job.", vid)
+                _give_up(job)
+                continue
+            if not QuotaLedger.admit("thumbnails.set", what=f"thumbnail for {vid}"):
+                break
+
+            try:
+                QuotaLedger.record("thumbnails.set")
+                youtube.thumbnails().set(videoId=vid, media_body=thumb).execute()
+            except Exception as e:
+                reason, status = None, None
+                if isinstance(e, HttpError):
+                    from YoutubeVideoUpload import _extract_reason
+                    reason, status = _extract_reason(e), int(e.resp.status)
+                if reason == "quotaExceeded":
+                    QuotaLedger.mark_exhausted()
+                    break
+                if status == 401 or reason == "authError":
+                    # The credentials, not the job, are bad: keep the job as it is for the next drain
+                    from YoutubeVideoUpload import invalidate_credentials
+                    logger.warning("Thumbnail for video %s not authorized; re-authorising before the next drain.", vid)
+                    invalidate_credentials()
+                    break
+                attempts = job[KEY_ATTEMPTS] + 1
+                if status is not None and 400 <= status < 500 and status != 429 \
+                        and reason not in THUMB_RETRIABLE_REASONS:
+                    logger.error("Thumbnail for video %s refused (HTTP %d, %s); giving up.", vid, status, reason)
+                    _give_up(job)
+                elif attempts >= THUMB_MAX_ATTEMPTS:
+                    logger.error("Giving up on thumbnail for video %s after %d attempts: %s", vid, attempts, e)
+                    _give_up(job)
+                else:
+                    next_try = time.time() + _backoff_seconds(attempts)
+                    logger.info("Thumbnail for video %s failed (%s); retry %d in %.0fs.",
+                                vid, reason or e, attempts, next_try - time.time())
+                    journal.append({KEY_OP: "retry", KEY_ID: vid, KEY_ATTEMPTS: attempts, KEY_NEXT_TRY: next_try})
+                continue
+
+            logger.info("Thumbnail set for video %s", vid)
+            journal.append({KEY_OP: "done", KEY_ID: vid})
+            set_count += 1
+            if job.get(KEY_DATA_FILE):
+                done_by_file[job[KEY_DATA_FILE]][vid] = {KEY_THUMBNAIL_SET: True}
+
+        if journal:
+            with jsonl_lock(_queue_path()):
+                append_jsonl(_queue_path(), journal)
+        for data_file, patches in done_by_file.items():
+            update_jsonl_rows(data_file, patches, key=KEY_ID)
+
+        _compact()
+        return set_count
+    finally:
+        _drain_lock.release()
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from googleapiclient.errors import HttpError
+
+from config import KEY_FILE, KEY_TITLE, KEY_DESC, KEY_ID
+import QuotaLedger
+import ThumbnailQueue
+import UploadThrottle
+import YoutubeVideoUpload
+from YoutubeVideoUpload import initialize_upload, scheduled_upload_video, YoutubeArgs, UploadError, _extract_reason
+from FakeYoutube import start_fake_youtube, fake_youtube_client
+from FfmpegRunner import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Scenarios run against the local stand-in: (name, server settings, what is exercised)
+SCENARIOS = [
+    ("clean",           {},                                   "upload"),
+    ("latency 50ms",    {"latency_ms": 50},                   "upload"),
+    ("5xx 10%",         {"error_rate": 0.10},                 "upload"),
+    ("session expired", {"expire_sessions": 1},               "upload"),
+    ("quota exceeded",  {"quota_units": 1000},                "quota"),
+    ("thumbnails",      {},                                   "thumbnails"),
+]
+
+
+def _make_payload(folder: str, size_mb: float, sample: Optional[str]) -> str:
+    """File to upload: a copy of `sample`, or random bytes of `size_mb` (YouTube never decodes it here)."""
+    path = os.path.join(folder, "payload.mp4")
+    if sample:
+        shutil.copyfile(sample, path)
+        return path
+    with open(path, "wb") as f:
+        remaining = int(size_mb * 1024 * 1024)
+        while remaining:
+            block = os.urandom(min(remaining, 1024 * 1024))
+            f.write(block)
+            remaining -= len(block)
+    return path
+
+def _make_sample_clip(folder: str, seconds: int = 10) -> Optional[str]:
+    """A real H.264 clip (ffmpeg test pattern) so preflight passes in the scheduled_upload_video scenario."""
+    path = os.path.join(folder, "sample.mp4")
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc=size=1080x1920:rate=30:duration={seconds}",
+           "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path]
+    try:
+        run_ffmpeg(cmd, duration=seconds, label="benchmark sample clip")
+        return path
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _isolate_state(folder: str) -> None:
+    """Point the quota ledger and thumbnail queue at scratch files so a benchmark never touches real state."""
+    QuotaLedger.QUOTA_LEDGER_FILE = Path(folder) / "quota_ledger.json"
+    ThumbnailQueue.THUMBNAIL_QUEUE_FILE = Path(folder) / "thumbnail_queue.jsonl"
+
+def _upload_scenario(youtube, payload: str, uploads: int) -> Dict[str, Any]:
+    args = YoutubeArgs([])
+    args.file = payload
+    size = os.path.getsize(payload)
+    done, errors, sent = 0, [], 0
+    started = time.monotonic()
+    for _ in range(uploads):
+        try:
+            initialize_upload(youtube, args)
+            done += 1
+            sent += size
+        except (UploadError, HttpError) as e:
+            errors.append(_extract_reason(e) if isinstance(e, HttpError) else str(e))
+    seconds = time.monotonic() - started
+    return {"uploaded": done, "errors": errors, "seconds": seconds, "mb_per_sec": sent / seconds / 1e6 if seconds else 0.0}
+
+def _quota_scenario(youtube, payload: str, decodable: bool, folder: str) -> Dict[str, Any]:
+    """quotaExceeded from the server: through scheduled_upload_video when a decodable clip exists, else initialize_upload."""
+    started = time.monotonic()
+    if decodable:
+        data_path = os.path.join(folder, "videodata.jsonl")
+        posted_path = os.path.join(folder, "postedvids.txt")
+        with open(data_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({KEY_FILE: payload, KEY_TITLE: "Benchmark", KEY_DESC: "Benchmark"}) + "\n")
+        # The scratch ledger has room, so the call reaches the server and its 403 is handled
+        uploaded = scheduled_upload_video(youtube, data_path, posted_path, YoutubeArgs([]))
+        result = {"uploaded": int(bool(uploaded)), "errors": [] if uploaded else ["deferred/refused"]}
+    else:
+        result = _upload_scenario(youtube, payload, 1)
+    result["seconds"] = time.monotonic() - started
+    result["ledger exhausted"] = QuotaLedger.units_remaining() == 0
+    return result
+
+def _thumbnail_scenario(youtube, payload: str, folder: str, count: int = 5) -> Dict[str, Any]:
+    args = YoutubeArgs([])
+    args.file = payload
+    thumb = os.path.join(folder, "thumb.jpg")
+    with open(thumb, "wb") as f:
+        f.write(os.urandom(50 * 1024))
+    data_path = os.path.join(folder, "thumbdata.jsonl")
+    rows = []
+    for _ in range(count):
+        rows.append({KEY_FILE: payload, KEY_ID: initialize_upload(youtube, args)})
+    with open(data_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in rows)
+    for row in rows:
+        ThumbnailQueue.enqueue(row[KEY_ID], thumb, data_path)
+    started = time.monotonic()
+    set_count = ThumbnailQueue.drain_thumbnail_queue(youtube)
+    return {"uploaded": set_count, "errors": [], "seconds": time.monotonic() - started, "mb_per_sec": 0.0}
+
+def run_benchmark(size_mb: float = 64, uploads: int = 3, chunk_mb: Optional[int] = None,
+                  sample: Optional[str] = None, scenarios: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Run each scenario against a fresh local stand-in and return one result row per scenario:
+    uploads done, errors, wall seconds, MB/s and the server's counters (requests, injected
+    errors, expired sessions, quota refusals). Retries show up as requests beyond the clean run.
+    """
+    if chunk_mb:
+        YoutubeVideoUpload.UPLOAD_CHUNK_SIZE = chunk_mb * 1024 * 1024
+    UploadThrottle.UPLOAD_RATE_PROFILE = "normal"
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="flippi-bench-") as folder:
+        payload = _make_payload(folder, size_mb, sample)
+        clip = sample or _make_sample_clip(folder)
+        for name, settings, kind in SCENARIOS:
+            if scenarios and name not in scenarios:
+                continue
+            scratch = tempfile.mkdtemp(dir=folder)
+            _isolate_state(scratch)
+            server = start_fake_youtube(**settings)
+            try:
+                youtube = fake_youtube_client(server)
+                if kind == "quota":
+                    result = _quota_scenario(youtube, clip or payload, clip is not None, scratch)
+                elif kind == "thumbnails":
+                    result = _thumbnail_scenario(youtube, payload, scratch)
+                else:
+                    result = _upload_scenario(youtube, payload, uploads)
+            finally:
+                server.shutdown()
+                server.server_close()
+            result.update({"scenario": name, "server": dict(server.stats, quota_used=server.quota_used)})
+            results.append(result)
+            logger.info("%s: %s", name, result)
+    return results
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<18}{'done':>6}{'errors':>8}{'secs':>8}{'MB/s':>9}{'requests':>10}{'5xx':>6}{'expired':>9}{'quota 403':>11}")
+    for r in results:
+        s = r["server"]
+        print(f"{r['scenario']:<18}{r['uploaded']:>6}{len(r['errors']):>8}{r['seconds']:>8.1f}{r.get('mb_per_sec', 0.0):>9.1f}"
+              f"{s['requests']:>10}{s['injected_errors']:>6}{s['expired_sessions']:>9}{s['quota_refusals']:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark uploads and their retry paths against a local YouTube stand-in.")
+    parser.add_argument("--size-mb", type=float, default=64, help="Random payload size when no --sample is given")
+    parser.add_argument("--uploads", type=int, default=3, help="Uploads per throughput scenario")
+    parser.add_argument("--chunk-mb", type=int, default=None, help="Override UPLOAD_CHUNK_SIZE (multiple of 0.25)")
+    parser.add_argument("--sample", default=None, help="Real clip to upload (default: ffmpeg test pattern, else random bytes)")
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenario names (default: all)")
+    cli_args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    _print_table(run_benchmark(
+        size_mb=cli_args.size_mb, uploads=cli_args.uploads, chunk_mb=cli_args.chunk_mb, sample=cli_args.sample,
+        scenarios=[s for s in cli_args.scenarios.split(",") if s] or None,
+    ))
@@ -0,0 +1,252 @@
+import os
+import time
+import queue
+import bisect
+import argparse
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+import config
+from config import KEY_FILE, KEY_ID, KEY_TITLE, KEY_DESC, KEY_THUMBNAIL, KEY_THUMBNAIL_SET, KEY_PUBLISH_AT, KEY_PREFLIGHT
+from ProcessComboTextFile import parse_jsonl, update_jsonl_rows
+from UploadProxy import remove_upload_proxy
+from Preflight import preflight_status, preflight_rows, PREFLIGHT_INLINE_WAIT
+import QuotaLedger
+from ThumbnailQueue import enqueue as enqueue_thumbnail
+from YoutubeVideoUpload import (
+    get_authenticated_service, initialize_upload, YoutubeArgs, UploadError,
+    _fill_upload_args, _read_posted_list, _append_posted_atomic, _sessions_path_for, _extract_reason,
+    upcoming_slot_times, to_publish_at, scheduled_publish_times,
+)
+
+logger = logging.getLogger(__name__)
+
+# Upload workers, each with its own authorized client (httplib2 connections aren't thread-safe)
+UPLOAD_WORKERS = 3
+VIDEO_INSERT_COST = QuotaLedger.QUOTA_COSTS["videos.insert"]
+
+_CLIENT_LOCK = threading.Lock()
+
+
+class QuotaBudget:
+    """Quota units shared by all workers in one drain; a worker reserves before each upload."""
+
+    def __init__(self, units: int):
+        self._remaining = units
+        self._lock = threading.Lock()
+
+    def reserve(self, cost: int) -> bool:
+        with self._lock:
+            if self._remaining < cost:
+                return False
+            self._remaining -= cost
+            return True
+
+    def release(self, cost: int) -> None:
+        """Give back a reservation whose upload didn't happen."""
+        with self._lock:
+            self._remaining += cost
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return self._remaining
+
+
+def _all_event_data_paths() -> List[str]:
+    """videodata and compdata of every event: publish slots are shared by all events."""
+    events_dir = config.PROJECT_FOLDER / "Event"
+    if not events_dir.is_dir():
+        return []
+    paths = []
+    for folder in sorted(events_dir.iterdir()):
+        if folder.is_dir():
+            event = config.event_paths(folder.name)
+            paths += [str(event["video data"]), str(event["comp data"])]
+    return paths
+
+def _backlog(data_files: List[Tuple[str, str]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    (data path, posted path, row) for every unposted, upload-ready row, file by file in order.
+    Rows without a current preflight verdict are checked together first; failed files are left out.
+    """
+    items = []
+    for data_path, posted_path in data_files:
+        posted = set(_read_posted_list(posted_path))
+        for row in parse_jsonl(str(data_path)):
+            path = row.get(KEY_FILE)
+            if not path or path in posted or not row.get(KEY_TITLE) or not row.get(KEY_DESC):
+                continue
+            if os.path.exists(path):
+                items.append((str(data_path), str(posted_path), row))
+
+    unchecked = [(data_path, row) for data_path, _, row in items if preflight_status(row) is None]
+    if unchecked:
+        preflight_rows([row for _, row in unchecked], wait=PREFLIGHT_INLINE_WAIT)
+        patches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for data_path, row in unchecked:
+            if row.get(KEY_PREFLIGHT):
+                patches.setdefault(data_path, {})[row[KEY_FILE]] = {KEY_PREFLIGHT: row[KEY_PREFLIGHT]}
+        for data_path, file_patches in patches.items():
+            update_jsonl_rows(data_path, file_patches)
+
+    ready = []
+    for item in items:
+        if preflight_status(item[2]):
+            ready.append(item)
+        else:
+            logger.info("Skipping %s - failed preflight or still being written.", item[2][KEY_FILE])
+    return ready
+
+def drain_backlog(
+    data_files: List[Tuple[str, str]],
+    args=None,
+    *,
+    workers: int = UPLOAD_WORKERS,
+    quota_units: Optional[int] = None,
+    slots: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, Any]:
+    """
+    Upload every pending row from `data_files` ([(videodata or compdata path, posted list path)])
+    with a bounded pool of workers sharing one quota budget: today's remaining units from the
+    quota ledger (less its safety margin), capped at `quota_units` when given.
+
+    With `slots` (the main.py SHORT_SLOTS/COMP_SLOTS format) each upload is made private and given
+    the next free publishAt, like bulk_schedule_uploads; otherwise args.privacyStatus applies.
+    Each result is merged into its data file as a single-row update under the file's lock.
+    Returns totals: uploaded, failed, bytes, seconds and bytes_per_sec.
+    """
+    args = args or YoutubeArgs([])
+    pending: "queue.Queue" = queue.Queue()
+    for item in _backlog(data_files):
+        pending.put(item)
+    if pending.empty():
+        logger.info("Upload backlog is empty.")
+        return {"uploaded": 0, "failed": 0, "bytes": 0, "seconds": 0.0, "bytes_per_sec": 0.0}
+
+    available = max(0, QuotaLedger.units_remaining() - QuotaLedger.QUOTA_SAFETY_MARGIN)
+    budget = QuotaBudget(min(available, quota_units) if quota_units is not None else available)
+    publish_times: List[str] = []
+    if slots:
+        taken = scheduled_publish_times(sorted(set(_all_event_data_paths()) | {str(path) for path, _ in data_files}))
+        publish_times = [t for t in (to_publish_at(s) for s in upcoming_slot_times(slots)) if t not in taken]
+    slot_lock = threading.Lock()
+
+    totals = {"uploaded": 0, "failed": 0, "bytes": 0}
+    totals_lock = threading.Lock()
+    stop = threading.Event()
+
+    def _next_publish_at() -> Optional[str]:
+        with slot_lock:
+            return publish_times.pop(0) if publish_times else None
+
+    def _return_publish_at(publish_at: Optional[str]) -> None:
+        if publish_at:
+            with slot_lock:
+                bisect.insort(publish_times, publish_at)
+
+    def _worker(n: int):
+        with _CLIENT_LOCK:
+            youtube = get_authenticated_service()
+        while not stop.is_set():
+            try:
+                data_path, posted_path, row = pending.get_nowait()
+            except queue.Empty:
+                return
+            # The ledger is the day's real spend (other jobs upload too); the budget caps this drain
+            if not QuotaLedger.can_afford("videos.insert") or not budget.reserve(VIDEO_INSERT_COST):
+                logger.info("Worker %d: quota budget exhausted (%d units left).", n, budget.remaining)
+                stop.set()
+                return
+
+            upload_args = argparse.Namespace(**vars(args))
+            _fill_upload_args(upload_args, row)
+            try:
+                size = os.path.getsize(upload_args.file)
+            except OSError as e:
+                logger.warning("Worker %d: skipping %s: %s", n, row[KEY_FILE], e)
+                budget.release(VIDEO_INSERT_COST)
+                with totals_lock:
+                    totals["failed"] += 1
+                continue
+            publish_at = None
+            if slots:
+                publish_at = _next_publish_at()
+                if publish_at is None:
+                    logger.info("Worker %d: no free publish slots left.", n)
+                    budget.release(VIDEO_INSERT_COST)
+                    stop.set()
+                    return
+                upload_args.privacyStatus = "private"
+                upload_args.publishAt = publish_at
+
+            started = time.monotonic()
+            try:
+                video_id = initialize_upload(youtube, upload_args, sessions_path=_sessions_path_for(data_path))
+            except (UploadError, HttpError, OSError) as e:
+                reason = _extract_reason(e) if isinstance(e, HttpError) else None
+                logger.warning("Worker %d: upload of %s failed: %s", n, row[KEY_FILE], reason or e)
+                # No budget release: initialize_upload charges the insert to the ledger before sending
+                _return_publish_at(publish_at)
+                with totals_lock:
+                    totals["failed"] += 1
+                if reason == "quotaExceeded":
+                    QuotaLedger.mark_exhausted()
+                if reason in ("quotaExceeded", "rateLimitExceeded"):
+                    stop.set()
+                continue
+            elapsed = max(time.monotonic() - started, 1e-6)
+
+            patch = {KEY_ID: video_id}
+            if publish_at:
+                patch[KEY_PUBLISH_AT] = publish_at
+            if KEY_THUMBNAIL in row and os.path.exists(row[KEY_THUMBNAIL]):
+                patch[KEY_THUMBNAIL_SET] = False
+            update_jsonl_rows(data_path, {row[KEY_FILE]: patch})
+            if KEY_THUMBNAIL_SET in patch:
+                enqueue_thumbnail(video_id, row[KEY_THUMBNAIL], data_path)
+            _append_posted_atomic(posted_path, row[KEY_FILE])
+            remove_upload_proxy(row)
+
+            with totals_lock:
+                totals["uploaded"] += 1
+                totals["bytes"] += size
+            logger.info("Worker %d: uploaded %s as %s (%.1f MB at %.2f MB/s)",
+                        n, os.path.basename(row[KEY_FILE]), video_id, size / 1e6, size / elapsed / 1e6)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=_worker, args=(n + 1,), name=f"upload-{n + 1}", daemon=True)
+               for n in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.monotonic() - started
+
+    result = dict(totals)
+    result["seconds"] = round(seconds, 1)
+    result["bytes_per_sec"] = round(totals["bytes"] / seconds, 1) if seconds > 0 else 0.0
+    logger.info(
+        "Backlog drain: uploaded=%d failed=%d left=%d %.1f MB in %.0fs (%.2f MB/s, %d quota units left)",
+        result["uploaded"], result["failed"], pending.qsize(), totals["bytes"] / 1e6, seconds,
+        result["bytes_per_sec"] / 1e6, budget.remaining,
+    )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the upload backlog of one or more events.")
+    parser.add_argument("events", nargs="+", help="Event folder names")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS)
+    parser.add_argument("--quota", type=int, default=None,
+                        help="Max quota units this drain may spend (default: all that remain today)")
+    parser.add_argument("--comps", action="store_true", help="Drain compilations instead of shorts")
+    cli_args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    key = "comp data" if cli_args.comps else "video data"
+    files = [(config.event_paths(e)[key], config.event_paths(e)["posted vids"]) for e in cli_args.events]
+    drain_backlog(files, workers=cli_args.workers, quota_units=cli_args.quota)
@@ -0,0 +1,203 @@
+import os
+import logging
+import subprocess
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import (
+    KEY_FILE, KEY_TITLE, KEY_DESC, KEY_SIZE, KEY_MTIME, KEY_FPS, KEY_WIDTH, KEY_HEIGHT,
+    KEY_DURATION, KEY_PROBE, KEY_TRIM, KEY_UPLOAD_PROXY, KEY_BYTES_SAVED,
+)
+from ProcessComboTextFile import parse_jsonl, update_jsonl_rows, prep_lock
+from MediaProbe import get_probe, _file_signature
+from ClipAnalysis import get_trim
+from EncodingProfiles import get_profile, threads_per_job
+from FfmpegRunner import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Set False to always upload the original replay file
+UPLOAD_PROXY_ENABLED = True
+
+# YouTube's recommended SDR upload video bitrates: short side -> (<=30 fps, >30 fps)
+SHORTS_BITRATES = {
+    720:  (5_000_000, 7_500_000),
+    1080: (8_000_000, 12_000_000),
+    1440: (16_000_000, 24_000_000),
+    2160: (35_000_000, 53_000_000),
+}
+# Only transcode when the source is at least this much above the target bitrate
+PROXY_MIN_SOURCE_RATIO = 1.25
+# Keep the proxy only if it is at most this fraction of the source size
+PROXY_MAX_SIZE_RATIO = 0.9
+# Rows transcoded per worker pass (keeps one pass short)
+PROXY_BATCH_SIZE = 10
+
+PROXY_SUFFIX = ".upload.mp4"
+
+
+def proxy_path_for(clip_path: str) -> str:
+    """Cached proxy lives next to the clip: 'Replay X.mp4' -> 'Replay X.upload.mp4'."""
+    base, _ = os.path.splitext(clip_path)
+    return base + PROXY_SUFFIX
+
+def target_bitrate(probe: Dict[str, Any]) -> int:
+    """Recommended upload bitrate (bits/s) for the clip's resolution and frame rate."""
+    short_side = min(probe.get(KEY_WIDTH) or 1080, probe.get(KEY_HEIGHT) or 1920)
+    high_fps = (probe.get(KEY_FPS) or 60) > 30
+    for side in sorted(SHORTS_BITRATES):
+        if short_side <= side:
+            return SHORTS_BITRATES[side][1 if high_fps else 0]
+    return SHORTS_BITRATES[max(SHORTS_BITRATES)][1 if high_fps else 0]
+
+def _source_bitrate(probe: Dict[str, Any]) -> Optional[float]:
+    duration = probe.get(KEY_DURATION)
+    size = probe.get(KEY_SIZE)
+    if not duration or not size:
+        return None
+    return size * 8 / duration
+
+def _trim_list(trim: Optional[Tuple[float, float]]) -> Optional[List[float]]:
+    return [trim[0], trim[1]] if trim else None
+
+def proxy_is_fresh(row: Dict[str, Any]) -> bool:
+    """True if the row's proxy record was made from the clip (and trim) as they are now."""
+    entry = row.get(KEY_UPLOAD_PROXY)
+    sig = _file_signature(row.get(KEY_FILE) or "")
+    if not entry or sig is None:
+        return False
+    if entry.get(KEY_SIZE) != sig[0] or entry.get(KEY_MTIME) != sig[1]:
+        return False
+    if entry.get(KEY_TRIM) != _trim_list(get_trim(row)):
+        return False
+    proxy = entry.get(KEY_FILE)
+    return proxy is None or os.path.exists(proxy)
+
+def get_upload_file(row: Dict[str, Any]) -> str:
+    """The file to send for a row: its fresh proxy if one exists, else the original clip."""
+    if UPLOAD_PROXY_ENABLED and proxy_is_fresh(row):
+        proxy = row[KEY_UPLOAD_PROXY].get(KEY_FILE)
+        if proxy:
+            return proxy
+    return row[KEY_FILE]
+
+def _proxy_entry(sig: tuple, proxy: Optional[str], saved: int, trim=None) -> Dict[str, Any]:
+    return {KEY_FILE: proxy, KEY_SIZE: sig[0], KEY_MTIME: sig[1], KEY_BYTES_SAVED: saved,
+            KEY_TRIM: _trim_list(trim)}
+
+def render_upload_proxy(
+    clip_path: str,
+    probe: Dict[str, Any],
+    trim: Optional[Tuple[float, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Transcode a clip to the Shorts target bitrate (cut to its dead-air trim, if any) and
+    return its proxy record. Untrimmed clips get no proxy path when the source is already
+    small enough or the encode didn't save enough; that result is cached too so the clip
+    isn't retried.
+    """
+    sig = _file_signature(clip_path)
+    target = target_bitrate(probe)
+    source_rate = _source_bitrate(probe)
+    if not trim and source_rate is not None and source_rate < target * PROXY_MIN_SOURCE_RATIO:
+        logger.info("Proxy skipped for %s: %.1f Mbps is already near the %.1f Mbps target",
+                    os.path.basename(clip_path), source_rate / 1e6, target / 1e6)
+        return _proxy_entry(sig, None, 0)
+
+    out_path = proxy_path_for(clip_path)
+    tmp_path = os.path.join(os.path.dirname(out_path), "." + os.path.basename(out_path) + ".part")
+    profile = get_profile()
+    duration = probe.get(KEY_DURATION)
+    seek = []
+    if trim:
+        seek = ["-ss", f"{trim[0]:.3f}", "-to", f"{trim[1]:.3f}"]
+        duration = trim[1] - trim[0]
+    cmd = [
+        "ffmpeg", "-y", *seek, "-i", clip_path,
+        "-map", "0:v:0", "-map", "0:a?",
+        # Capped CRF: never above the target rate, smaller when the content allows it
+        "-c:v", "libx264", "-preset", str(profile["preset"]), "-crf", str(profile["crf"]),
+        "-maxrate", str(target), "-bufsize", str(target * 2),
+        "-pix_fmt", "yuv420p",
+        "-threads", str(threads_per_job(profile)),
+        # A cut must re-encode audio to land on the same frame boundary as the video
+        *(["-c:a", "aac", "-b:a", "192k"] if trim else ["-c:a", "copy"]),
+        "-movflags", "+faststart",
+        "-f", "mp4", tmp_path,
+    ]
+    try:
+        run_ffmpeg(cmd, duration=duration, label=os.path.basename(out_path))
+    except subprocess.CalledProcessError as e:
+        logger.warning("Proxy encode failed for %s: %s", clip_path, e.stderr)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    proxy_size = os.path.getsize(tmp_path)
+    if not trim and proxy_size > sig[0] * PROXY_MAX_SIZE_RATIO:
+        os.remove(tmp_path)
+        logger.info("Proxy discarded for %s: %d bytes vs %d original",
+                    os.path.basename(clip_path), proxy_size, sig[0])
+        return _proxy_entry(sig, None, 0)
+
+    os.replace(tmp_path, out_path)
+    saved = sig[0] - proxy_size
+    logger.info("Proxy ready for %s: saved %.1f MB (%.0f%%)",
+                os.path.basename(clip_path), saved / 1e6, 100.0 * saved / sig[0])
+    return _proxy_entry(sig, out_path, saved, trim)
+
+def prepare_upload_proxies(videodata_path, posted_vids_path=None, limit: int = PROXY_BATCH_SIZE) -> int:
+    """
+    Build proxies for unposted, upload-ready rows (oldest first, at most `limit`).
+    Only the proxy fields are merged back into videodata, so this is safe to run
+    beside the uploader; concurrent prep passes over the same file wait for each other.
+    Returns the number of rows updated.
+    """
+    with prep_lock(videodata_path):
+        return _prepare_upload_proxies_locked(videodata_path, posted_vids_path, limit)
+
+def _prepare_upload_proxies_locked(videodata_path, posted_vids_path, limit: int) -> int:
+    posted = set()
+    if posted_vids_path and os.path.exists(posted_vids_path):
+        with open(posted_vids_path, "r", encoding="utf-8") as f:
+            posted = {line.rstrip("\n") for line in f}
+
+    patches: Dict[str, Dict[str, Any]] = {}
+    total_saved = 0
+    for row in parse_jsonl(str(videodata_path)):
+        if len(patches) >= limit:
+            break
+        path = row.get(KEY_FILE)
+        if not path or path in posted or not row.get(KEY_TITLE) or not row.get(KEY_DESC):
+            continue
+        if not os.path.exists(path) or proxy_is_fresh(row):
+            continue
+
+        probe = get_probe(row)
+        if not probe:
+            continue
+        try:
+            entry = render_upload_proxy(path, probe, get_trim(row))
+        except subprocess.CalledProcessError:
+            continue
+        except OSError as e:
+            logger.warning("Upload proxy failed for %s: %s", path, e)
+            continue
+        patches[path] = {KEY_UPLOAD_PROXY: entry}
+        if row.get(KEY_PROBE):
+            patches[path][KEY_PROBE] = row[KEY_PROBE]
+        total_saved += entry[KEY_BYTES_SAVED]
+
+    updated = update_jsonl_rows(str(videodata_path), patches)
+    if updated:
+        logger.info("Upload proxies: %d row(s) updated, %.1f MB saved", updated, total_saved / 1e6)
+    return updated
+
+def remove_upload_proxy(row: Dict[str, Any]) -> None:
+    """Delete a row's proxy file once the upload no longer needs it."""
+    entry = row.get(KEY_UPLOAD_PROXY) or {}
+    proxy = entry.get(KEY_FILE)
+    if proxy and os.path.exists(proxy):
+        try:
+            os.remove(proxy)
+        except OSError as e:
+            logger.info("Could not remove upload proxy %s: %s", proxy, e)
@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+from googleapiclient.http import MediaFileUpload
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Upload rate caps in bytes/sec shared by every upload in this process (0 = unlimited).
+# "normal" applies when nothing is recording; "event live" while the recording stack is active.
+UPLOAD_RATE_PROFILES = {
+    "normal":     0,
+    "event live": 1_500_000,  # ~12 Mbit/s, leaves headroom for a stream/OBS on a typical venue uplink
+}
+# Force a profile by name, or None to detect it
+UPLOAD_RATE_PROFILE: Optional[str] = None
+# Bytes that may be sent at full speed after an idle period
+UPLOAD_BURST_BYTES = 1024 * 1024
+
+# The event counts as live if Clippi's active combodata or an OBS recording folder changed this recently
+LIVE_ACTIVITY_SECONDS = 10 * 60
+# Detection walks folders, so its answer is reused for this long
+LIVE_CHECK_INTERVAL_SECONDS = 30
+
+
+def _recent(path, now: float) -> bool:
+    try:
+        return now - os.stat(path).st_mtime <= LIVE_ACTIVITY_SECONDS
+    except OSError:
+        return False
+
+def _recording_folders():
+    """Top-level videos folder of every event (where OBS writes recordings and replay buffers)."""
+    events = config.PROJECT_FOLDER / "Event"
+    try:
+        names = [e.name for e in os.scandir(events) if e.is_dir()]
+    except OSError:
+        return []
+    return [events / name / "videos" for name in names]
+
+def event_is_live() -> bool:
+    """
+    True while the recording stack looks active: Clippi's active combodata (the
+    _ActiveClippiComboData symlink, resolved to its event) was written recently, or a file in
+    an event's OBS recording folder was.
+    """
+    now = time.time()
+    active = config.ACTIVE_CLIPPI_FILE
+    if os.path.exists(active) and _recent(os.path.realpath(active), now):
+        return True
+    for folder in _recording_folders():
+        try:
+            with os.scandir(folder) as entries:
+                if any(e.is_file() and _recent(e.path, now) for e in entries):
+                    return True
+        except OSError:
+            continue
+    return False
+
+def _describe_rate(rate: int) -> str:
+    return "unlimited" if rate <= 0 else f"{rate * 8 / 1e6:.1f} Mbit/s"
+
+
+class TokenBucket:
+    """Blocking token bucket; take(n) waits until n bytes may be sent at the current rate."""
+
+    def __init__(self, burst: int = UPLOAD_BURST_BYTES):
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self._profile = None
+        self._checked = 0.0
+
+    def profile(self) -> str:
+        """Active rate profile, re-detected at most every LIVE_CHECK_INTERVAL_SECONDS."""
+        if UPLOAD_RATE_PROFILE:
+            return UPLOAD_RATE_PROFILE
+        now = time.monotonic()
+        if self._profile is None or now - self._checked >= LIVE_CHECK_INTERVAL_SECONDS:
+            profile = "event live" if event_is_live() else "normal"
+            if profile != self._profile:
+                logger.info("Upload rate profile: %s (%s)", profile, _describe_rate(UPLOAD_RATE_PROFILES[profile]))
+            self._profile, self._checked = profile, now
+        return self._profile
+
+    def rate(self) -> int:
+        return int(UPLOAD_RATE_PROFILES.get(self.profile(), 0))
+
+    def take(self, n: int) -> None:
+        while n > 0:
+            rate = self.rate()
+            if rate <= 0:
+                return
+            # Large reads are charged in burst-sized steps so the wait is spread over the read
+            step = min(n, self.burst)
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * rate)
+                self._stamp = now
+                self._tokens -= step
+                wait = -self._tokens / rate if self._tokens < 0 else 0.0
+            if wait > 0:
+                time.sleep(wait)
+            n -= step
+
+
+# One bucket per process so concurrent uploads share the cap
+UPLOAD_BUCKET = TokenBucket()
+
+
+class _ThrottledStream:
+    """File wrapper whose reads are paced by a token bucket (httplib sends the body in small reads)."""
+
+    def __init__(self, stream, bucket: TokenBucket):
+        self._stream = stream
+        self._bucket = bucket
+
+    def read(self, n=-1):
+        data = self._stream.read(n)
+        self._bucket.take(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class ThrottledMediaFileUpload(MediaFileUpload):
+    """MediaFileUpload whose chunk bytes are rate-limited by UPLOAD_BUCKET."""
+
+    def __init__(self, filename, *args, bucket: Optional[TokenBucket] = None, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self._bucket = bucket or UPLOAD_BUCKET
+
+    def stream(self):
+        return _ThrottledStream(super().stream(), self._bucket)
+
+    def getbytes(self, begin, length):
+        data = super().getbytes(begin, length)
+        self._bucket.take(len(data))
+        return data
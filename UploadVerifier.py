@@ -0,0 +1,163 @@
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from googleapiclient.errors import HttpError
+
+from config import KEY_FILE, KEY_ID, KEY_THUMBNAIL_SET, KEY_PUBLISH_AT, KEY_PROCESSING
+from ProcessComboTextFile import parse_jsonl, update_jsonl_rows
+import QuotaLedger
+
+logger = logging.getLogger(__name__)
+
+# videos.list accepts up to 50 ids per call, and each call costs 1 unit however many ids it carries
+VERIFY_BATCH_SIZE = 50
+# A video still processing this long after its first check is logged as stuck
+VERIFY_STUCK_HOURS = 6
+# Failed uploads are re-queued at most this many times per file
+VERIFY_MAX_REQUEUES = 2
+
+# Fields of the KEY_PROCESSING record on a row
+KEY_VIDEO_ID = "video id"            # the upload this verdict belongs to
+KEY_STATE = "state"                  # pending | ok | failed | rejected | missing | stuck
+KEY_UPLOAD_STATUS = "upload status"
+KEY_PROCESSING_STATUS = "processing status"
+KEY_FAILURE_REASON = "failure reason"
+KEY_FIRST_CHECKED = "first checked"
+KEY_CHECKED_AT = "checked at"
+KEY_REQUEUES = "requeues"
+
+# States that need no further checks
+FINAL_STATES = ("ok", "failed", "rejected", "missing")
+
+_verify_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+def needs_check(row: Dict[str, Any]) -> bool:
+    """True if the row's current upload hasn't reached a final processing state yet."""
+    vid = row.get(KEY_ID)
+    if not vid:
+        return False
+    record = row.get(KEY_PROCESSING) or {}
+    return record.get(KEY_VIDEO_ID) != vid or record.get(KEY_STATE) not in FINAL_STATES
+
+def _classify(item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Processing fields and state for one videos.list item (None = not returned)."""
+    if item is None:
+        return {KEY_STATE: "missing"}
+    status = item.get("status", {})
+    details = item.get("processingDetails", {})
+    upload_status = status.get("uploadStatus")
+    processing_status = details.get("processingStatus")
+    fields = {KEY_UPLOAD_STATUS: upload_status, KEY_PROCESSING_STATUS: processing_status}
+
+    if upload_status == "processed" or processing_status == "succeeded":
+        fields[KEY_STATE] = "ok"
+    elif upload_status == "failed" or processing_status in ("failed", "terminated"):
+        fields[KEY_STATE] = "failed"
+        fields[KEY_FAILURE_REASON] = status.get("failureReason") or details.get("processingFailureReason")
+    elif upload_status in ("rejected", "deleted"):
+        # Rejections (duplicate, copyright, ...) would just be rejected again, so they're not re-queued
+        fields[KEY_STATE] = "rejected"
+        fields[KEY_FAILURE_REASON] = status.get("rejectionReason") or upload_status
+    else:
+        fields[KEY_STATE] = "pending"
+    return fields
+
+def _hours_since(stamp: Optional[str]) -> float:
+    try:
+        return (datetime.now(timezone.utc) - datetime.fromisoformat(stamp)).total_seconds() / 3600
+    except (TypeError, ValueError):
+        return 0.0
+
+def _fetch_statuses(youtube, video_ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """{id: item} for the ids, one videos.list call per VERIFY_BATCH_SIZE ids; None if quota ran out."""
+    items: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(video_ids), VERIFY_BATCH_SIZE):
+        batch = video_ids[i:i + VERIFY_BATCH_SIZE]
+        if not QuotaLedger.admit("videos.list", what="upload verification"):
+            return None
+        QuotaLedger.record("videos.list")
+        response = youtube.videos().list(id=",".join(batch), part="status,processingDetails",
+                                         maxResults=VERIFY_BATCH_SIZE).execute()
+        for item in response.get("items", []):
+            items[item["id"]] = item
+    return items
+
+def verify_uploads(data_files: List[tuple], youtube=None) -> Dict[str, int]:
+    """
+    Check the processing status of every uploaded row in `data_files` ([(data path, posted list
+    path)]) that isn't final yet, with batched videos.list calls across all files. The verdict is
+    stored on the row under KEY_PROCESSING. Failed uploads are re-queued: the video id is cleared
+    and the file is taken off the posted list so the uploader picks it up again.
+    Returns counts per state plus "requeued".
+    """
+    if not _verify_lock.acquire(blocking=False):
+        logger.info("Upload verification already running.")
+        return {}
+    try:
+        todo = []
+        for data_path, posted_path in data_files:
+            for row in parse_jsonl(str(data_path)):
+                if needs_check(row):
+                    todo.append((str(data_path), str(posted_path), row))
+        if not todo:
+            return {}
+
+        if youtube is None:
+            from YoutubeVideoUpload import get_authenticated_service
+            youtube = get_authenticated_service()
+        try:
+            items = _fetch_statuses(youtube, [row[KEY_ID] for _, _, row in todo])
+        except HttpError as e:
+            logger.warning("Upload verification failed: %s", e)
+            return {}
+        if items is None:
+            return {}
+
+        from YoutubeVideoUpload import _remove_posted_atomic
+        counts: Dict[str, int] = {"requeued": 0}
+        patches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for data_path, posted_path, row in todo:
+            vid = row[KEY_ID]
+            previous = row.get(KEY_PROCESSING) or {}
+            same_upload = previous.get(KEY_VIDEO_ID) == vid
+            record = {
+                KEY_VIDEO_ID: vid,
+                KEY_FIRST_CHECKED: previous.get(KEY_FIRST_CHECKED) if same_upload else _now(),
+                KEY_CHECKED_AT: _now(),
+                KEY_REQUEUES: previous.get(KEY_REQUEUES, 0),
+            }
+            record.update(_classify(items.get(vid)))
+            if record[KEY_STATE] == "pending" and _hours_since(record[KEY_FIRST_CHECKED]) >= VERIFY_STUCK_HOURS:
+                record[KEY_STATE] = "stuck"
+                logger.warning("Video %s (%s) is still processing after %d hours.", vid, row[KEY_FILE], VERIFY_STUCK_HOURS)
+            counts[record[KEY_STATE]] = counts.get(record[KEY_STATE], 0) + 1
+
+            patch: Dict[str, Any] = {KEY_PROCESSING: record}
+            if record[KEY_STATE] == "failed":
+                if record[KEY_REQUEUES] < VERIFY_MAX_REQUEUES:
+                    record[KEY_REQUEUES] += 1
+                    patch.update({KEY_ID: None, KEY_THUMBNAIL_SET: None, KEY_PUBLISH_AT: None})
+                    _remove_posted_atomic(posted_path, row[KEY_FILE])
+                    counts["requeued"] += 1
+                    logger.warning("Video %s failed processing (%s); re-queued %s for upload.",
+                                   vid, record.get(KEY_FAILURE_REASON), row[KEY_FILE])
+                else:
+                    logger.error("Video %s failed processing (%s); %s was already re-queued %d times.",
+                                 vid, record.get(KEY_FAILURE_REASON), row[KEY_FILE], record[KEY_REQUEUES])
+            elif record[KEY_STATE] in ("rejected", "missing"):
+                logger.warning("Video %s (%s) is %s: %s", vid, row[KEY_FILE], record[KEY_STATE],
+                               record.get(KEY_FAILURE_REASON) or "not returned by the API")
+            patches.setdefault(data_path, {})[row[KEY_FILE]] = patch
+
+        for data_path, file_patches in patches.items():
+            update_jsonl_rows(data_path, file_patches)
+        logger.info("Verified %d upload(s): %s", len(todo), counts)
+        return counts
+    finally:
+        _verify_lock.release()
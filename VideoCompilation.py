@@ -1,8 +1,10 @@
-from ProcessComboTextFile import parse_jsonl, write_jsonl_atomic, append_jsonl, _parse_dt_loose
+from ProcessComboTextFile import parse_jsonl, update_jsonl_rows, append_jsonl, _parse_dt_loose
 import os
 import subprocess
 import config
-from config import KEY_FILE, KEY_FIXED, KEY_TITLE, KEY_DESC, KEY_USED, KEY_CLIPFILES, KEY_CLIPTITLES, KEY_TIMESTAMP, KEY_THUMBNAIL
+from config import KEY_FILE, KEY_FIXED, KEY_TITLE, KEY_DESC, KEY_USED, KEY_CLIPFILES, KEY_CLIPTITLES, KEY_TIMESTAMP, KEY_THUMBNAIL, KEY_HAS_AUDIO, KEY_DURATION
+from config import KEY_CODEC, KEY_WIDTH, KEY_HEIGHT, KEY_FPS, KEY_PIX_FMT, KEY_PROFILE, KEY_AUDIO_CODEC, KEY_SAMPLE_RATE, KEY_CHANNELS, KEY_EXTRADATA
+from config import KEY_PROBE, KEY_PROBE_FAILED
 import random
 import json
 import datetime
@@ -13,25 +15,41 @@ import logging
 from typing import List, Tuple, Optional, Dict, Any
 import glob
 import re
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from MediaProbe import probe_file, probe_paths, probe_is_fresh, get_probe
+from ClipAnalysis import get_trim, trimmed_duration
+from Mp4Atoms import mp4_duration, needs_remux
+from EncodingProfiles import get_profile, x264_args, threads_per_job
+from FfmpegRunner import run_ffmpeg, FFPROBE_TIMEOUT
+from LocalThumbnail import generate_local_thumbnail, thumbnail_path_for
 
 logger = logging.getLogger(__name__)
 #shared keys
 
+# "local": thumbnail from the clips' sharpest frame, AI image as fallback
+# "ai": gpt-image-1 thumbnail, local frame as fallback
+THUMBNAIL_MODE = "local"
 
-def update_compilation_data(
+
+def build_compilation_record(
     clip_titles: List[str],
     output_path,
-    clip_file_paths: Optional[List[str]] = None
-) -> None:
+    clip_file_paths: Optional[List[str]] = None,
+    trims: Optional[Dict[str, Tuple[float, float]]] = None,
+    event_name: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    Appends a single compilation record to COMP_DATA (.jsonl).
-    Each compilation is one JSON object per line.
+    Build one compilation record (AI title/description and thumbnail) without writing it.
+    `event_name` picks the event's title history and thumbnails folder (default: the active event).
     """
+    thumbnails_folder = config.event_paths(event_name)["thumbnails folder"]
     # Normalize paths to forward slashes for portability
     output_path_str = str(output_path).replace("\\", "/")
 
     # Generate title/desc (same behavior you had)
-    Title = provide_AI_comptitle(clip_titles)
+    Title = provide_AI_comptitle(clip_titles, event_name)
     Desc  = provide_AI_desc(Title)
     Title = (Title or "").strip().strip('"')
     Desc  = (
@@ -39,10 +57,18 @@ def update_compilation_data(
         "\n\n" + (Desc or "").strip().strip('"')
     )
 
-    # Create thumbnail (keep your fallback logic)
-    thumbnail = provide_image(Title)
+    # Create thumbnail: THUMBNAIL_MODE picks which generator goes first, the other is the fallback
+    def local():
+        return generate_local_thumbnail([str(p) for p in (clip_file_paths or [])], Title, trims,
+                                        output_path=thumbnail_path_for(output_path, thumbnails_folder))
+
+    def remote():
+        return provide_image(Title, event_name)
+
+    first, second = (local, remote) if THUMBNAIL_MODE == "local" else (remote, local)
+    thumbnail = first() or second()
     if thumbnail is None:
-        fallback = config.THUMBNAILS_FOLDER / "image.png"
+        fallback = thumbnails_folder / "image.png"
         thumbnail = fallback if Path(fallback).exists() else None
 
     thumbnail_str = str(thumbnail).replace("\\", "/") if thumbnail is not None else None
@@ -60,6 +86,18 @@ def update_compilation_data(
     }
     if thumbnail_str:
         compilation_dict[KEY_THUMBNAIL] = thumbnail_str
+    return compilation_dict
+
+def update_compilation_data(
+    clip_titles: List[str],
+    output_path,
+    clip_file_paths: Optional[List[str]] = None
+) -> None:
+    """
+    Appends a single compilation record to COMP_DATA (.jsonl).
+    Each compilation is one JSON object per line.
+    """
+    compilation_dict = build_compilation_record(clip_titles, output_path, clip_file_paths)
 
     # Append one JSON object to the JSONL file
     try:
@@ -68,27 +106,73 @@ def update_compilation_data(
     except Exception as e:
         logger.error("Failed to append compilation data: %s", e)
 
+# Selection window: only the oldest unused clips are packed so compilations stay roughly chronological
+SELECTION_WINDOW_CLIPS = 40
+SELECTION_WINDOW_FACTOR = 3  # window covers at most this many max_lengths of footage
+PACK_RESOLUTION = 0.1        # seconds per knapsack cell
+
+def _pack_durations(durations: List[float], capacity: float, resolution: float = PACK_RESOLUTION) -> List[int]:
+    """
+    0/1 knapsack: pick the subset of durations with the largest total that fits capacity.
+    Durations are rounded up to `resolution` so the real total never exceeds capacity.
+    When several subsets reach the same total, earlier (older) items are preferred.
+    Returns the chosen indices in ascending order.
+    """
+    cap = int(capacity / resolution + 1e-9)
+    if cap <= 0:
+        return []
+    weights = [max(1, int(-(-d // resolution))) for d in durations]
+
+    # reach[s] = (item index, previous sum) for the first way we reached total s
+    reach: List[Optional[Tuple[int, int]]] = [None] * (cap + 1)
+    reach[0] = (-1, -1)
+    best = 0
+    for i, w in enumerate(weights):
+        if w > cap:
+            continue
+        for total in range(cap, w - 1, -1):
+            if reach[total] is None and reach[total - w] is not None:
+                reach[total] = (i, total - w)
+                best = max(best, total)
+        if best == cap:
+            break
+
+    chosen: List[int] = []
+    total = best
+    while total > 0:
+        i, prev = reach[total]
+        chosen.append(i)
+        total = prev
+    return sorted(chosen)
+
 def select_clips_for_compilation(
     video_rows: List[dict],
     min_length: int = 50,
     max_length: int = 305,
 ) -> tuple[Optional[List[Tuple[str, float]]], List[dict]]:
     """
-    Selects video clips sequentially until adding a clip would exceed max_length.
-    Stops immediately once an overflow would happen.
+    Selects clips that fill max_length as fully as possible while staying roughly chronological.
+
+    The oldest unused clip is always included (so nothing starves); the rest of the budget is filled
+    by a knapsack pass over a window of the next-oldest clips, using durations from the cached probes.
+    Clips longer than max_length on their own are skipped instead of blocking the tail.
 
     :param video_rows: List of videodata rows (each a dict) from a .jsonl file.
     :param min_length: Minimum total length required for a compilation (seconds).
     :param max_length: Maximum total length allowed for a compilation (seconds).
-    :return: (selected_clips, updated_rows) or (None, original_rows) if not enough.
-             selected_clips = [(file_path, duration_sec), ...]
+    :return: (selected_clips, updated_rows) or (None, updated_rows) if not enough, with nothing
+             marked but any refreshed probes kept (see persist_probes).
+             selected_clips = [(file_path, duration_sec), ...] in chronological order
     """
+    # Shallow copy so we can mark selections (and refresh stale probes) while leaving the original reference intact
+    updated_rows = [dict(clip) for clip in video_rows]
+
     # Filter to only unused clips
-    unused_clips = [clip for clip in video_rows if not clip.get(KEY_USED, False)]
+    unused_clips = [clip for clip in updated_rows if not clip.get(KEY_USED, False)]
 
     if not unused_clips:
         logger.info("No unused clips available.")
-        return None, video_rows
+        return None, updated_rows
 
     # Sort by timestamp (oldest first); fall back to raw string if parse fails
     try:
@@ -98,102 +182,141 @@ def select_clips_for_compilation(
     except Exception as e:
         logger.warning("Error sorting clips by timestamp: %s", e)
 
-    selected_clips: List[Tuple[str, float]] = []
-    total_duration = 0.0
-    # Shallow copy so we can mark selections while leaving the original reference intact
-    updated_rows = [dict(clip) for clip in video_rows]
-
+    # Build the chronological window of usable clips
+    window: List[Tuple[dict, float]] = []
+    window_total = 0.0
     for clip in unused_clips:
         file_path = clip.get(KEY_FILE)
         if not file_path or not os.path.exists(file_path):
             continue
 
-        # Probe duration with ffprobe
-        try:
-            cmd = [
-                "ffprobe", "-v", "error", "-select_streams", "v:0",
-                "-show_entries", "format=duration", "-of",
-                "default=noprint_wrappers=1:nokey=1", file_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            duration = float(result.stdout.strip())
-        except Exception:
+        # Duration comes from the probe cached at pairing time (after dead-air trimming, when analyzed)
+        duration = trimmed_duration(clip)
+        if duration is None:
             logger.info("Skipping %s: Could not determine duration.", file_path)
             continue
+        if duration > max_length:
+            logger.info("Skipping %s: %.2fs is longer than max_length on its own.", file_path, duration)
+            continue
 
-        # If adding this clip would exceed max_length, stop immediately
-        if total_duration + duration > max_length:
-            logger.info("Stopping: adding %s (%.2fs) would exceed max_length.", file_path, duration)
+        window.append((clip, duration))
+        window_total += duration
+        if len(window) >= SELECTION_WINDOW_CLIPS or window_total >= SELECTION_WINDOW_FACTOR * max_length:
             break
 
-        selected_clips.append((file_path, duration))
-        total_duration += duration
+    if not window:
+        logger.info("Compilation too short: 0.00s (minimum required: %ss).", min_length)
+        return None, updated_rows
 
-        # Mark as used in the corresponding row of updated_rows
-        for row in updated_rows:
-            if row.get(KEY_FILE) == file_path:
-                row[KEY_USED] = True
-                break  # efficient exit
+    # Oldest clip is always in; pack the remaining budget from the rest of the window
+    first_clip, first_duration = window[0]
+    rest = window[1:]
+    picked = _pack_durations([d for _, d in rest], max_length - first_duration)
+    chosen = [(first_clip, first_duration)] + [rest[i] for i in picked]
 
-    if total_duration >= min_length and selected_clips:
-        return selected_clips, updated_rows
-    else:
+    total_duration = sum(d for _, d in chosen)
+    if total_duration < min_length:
         logger.info("Compilation too short: %.2fs (minimum required: %ss).", total_duration, min_length)
-        return None, video_rows
+        return None, updated_rows
 
-def create_compilation(selected_clips, output_path):
-    """
-    Concatenates the selected clips and applies desired processing to produce a final compilation.
+    # Mark used through a path index instead of scanning every row per clip
+    row_by_path = {row.get(KEY_FILE): row for row in updated_rows if row.get(KEY_FILE)}
+    selected_clips: List[Tuple[str, float]] = []
+    for clip, duration in chosen:
+        file_path = clip[KEY_FILE]
+        row_by_path[file_path][KEY_USED] = True
+        selected_clips.append((file_path, duration))
 
-    :param selected_clips: List of tuples (file_path, duration).
-    :param output_path: Destination for the final video file.
-    :return: Path to the final output video, or None if failed.
+    logger.info(
+        "Selected %d clips: %.2fs of %ss budget (window=%d clips).",
+        len(selected_clips), total_duration, max_length, len(window),
+    )
+    return selected_clips, updated_rows
+
+# Vertical 1080x1920 clip (game on top, cam on bottom) -> side-by-side 1920x1080 landscape
+LANDSCAPE_FILTER = (
+    "[0:v]crop=1080:960:0:0[top];"
+    "[0:v]crop=1080:960:0:960[bottom];"
+    "[top][bottom]hstack=inputs=2[stacked];"
+    "[stacked]scale=1920:852[scaled];"
+    "[scaled]pad=1920:1080:(ow-iw)/2:(oh-ih)/2:#5c3a21[out]"
+)
+# Inputs that are already landscape (e.g. set recordings) are only fitted into 1920x1080
+FIT_LANDSCAPE_FILTER = (
+    "[0:v]scale=1920:1080:force_original_aspect_ratio=decrease[scaled];"
+    "[scaled]pad=1920:1080:(ow-iw)/2:(oh-ih)/2:#5c3a21[out]"
+)
+
+def landscape_filter_for(probe: Optional[Dict[str, Any]]) -> str:
+    """FIT_LANDSCAPE_FILTER for inputs wider than tall, LANDSCAPE_FILTER for everything else."""
+    probe = probe or {}
+    return FIT_LANDSCAPE_FILTER if (probe.get(KEY_WIDTH) or 0) > (probe.get(KEY_HEIGHT) or 0) else LANDSCAPE_FILTER
+
+# clip path -> (start, end) seconds to keep (see ClipAnalysis.py)
+Trims = Dict[str, Tuple[float, float]]
+Probes = Dict[str, Dict[str, Any]]
+
+def _write_concat_list(clip_paths: List[str], list_path: str, trims: Optional[Trims] = None) -> int:
     """
-    if not selected_clips:
-        logger.info("No valid clips selected for compilation.")
-        return None
+    Write an ffmpeg concat-demuxer list for the clips that exist, with inpoint/outpoint
+    for trimmed clips. Returns how many were written.
+    """
+    written = 0
+    with open(list_path, "w", encoding="utf-8") as f:
+        for file_path in clip_paths:
+            if not os.path.isfile(file_path):
+                logger.info("Skipping %s: File not found.", file_path)
+                continue
+            f.write(f"file '{_ffmpeg_escape_path(file_path)}'\n")
+            trim = (trims or {}).get(file_path)
+            if trim:
+                f.write(f"inpoint {trim[0]:.3f}\noutpoint {trim[1]:.3f}\n")
+            written += 1
+    return written
+
+def _render_concat_single_pass(
+    clip_paths: List[str],
+    output_path,
+    profile: Optional[Dict[str, Any]] = None,
+    duration: Optional[float] = None,
+    trims: Optional[Trims] = None,
+    filter_graph: str = LANDSCAPE_FILTER,
+) -> Optional[str]:
+    """
+    Feed the concat demuxer straight into the landscape filter graph in one ffmpeg run
+    (`filter_graph` must suit every input; see landscape_filter_for).
+    Encodes to a temp file next to output_path (+faststart) and atomically renames it into place,
+    so no intermediate concatenated copy is ever written.
+    """
+    profile = profile or get_profile()
+    output_path = str(output_path)
+    out_dir = os.path.dirname(output_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+
+    fd, list_path = tempfile.mkstemp(prefix=".concat_", suffix=".txt", dir=out_dir)
+    os.close(fd)
+    tmp_output = os.path.join(out_dir, "." + os.path.basename(output_path) + ".part")
 
-    # Create temporary directory for intermediate files
-    temp_dir = tempfile.mkdtemp()
     try:
-        # Prepare a file list for FFmpeg concat
-        list_path = os.path.join(temp_dir, "list.txt")
-        with open(list_path, "w", encoding="utf-8") as f:
-            for file_path, _ in selected_clips:
-                if not os.path.isfile(file_path):
-                    logger.info("Skipping %s: File not found.", file_path)
-                    continue
-                
-                f.write(f"file '{_ffmpeg_escape_path(file_path)}'\n")
+        if _write_concat_list(clip_paths, list_path, trims) == 0:
+            logger.info("No valid clips selected for compilation.")
+            return None
 
-        # 1) Concatenate using FFmpeg 
-        cmd_concat = [
+        cmd = [
             "ffmpeg", "-y",
             "-f", "concat", "-safe", "0", "-i", list_path,
-            "-c", "copy",
-            os.path.join(temp_dir, "temp_concatenated.mp4")
-        ]
-        subprocess.run(cmd_concat, check=True, capture_output=True, text=True)
-        temp_compilation = os.path.join(temp_dir, "temp_concatenated.mp4")
-        logger.info("Concatenated compilation saved at: %s", temp_compilation)
-
-        # 2) Post-process 
-        cmd_process = [
-            "ffmpeg", "-y",
-            "-i", temp_compilation,
-            "-filter_complex",
-            "[0:v]crop=1080:960:0:0[top];"
-            "[0:v]crop=1080:960:0:960[bottom];"
-            "[top][bottom]hstack=inputs=2[stacked];"
-            "[stacked]scale=1920:852[scaled];"
-            "[scaled]pad=1920:1080:(ow-iw)/2:(oh-ih)/2:#5c3a21[out]",
+            "-filter_complex", filter_graph,
             "-map", "[out]",
             "-map", "0:a?",
-            "-c:v", "libx264", "-preset", "fast", "-crf", "18",
+            *x264_args(profile),
             "-c:a", "copy",
-            str(output_path)
+            "-movflags", "+faststart",
+            "-f", "mp4", tmp_output,
         ]
-        subprocess.run(cmd_process, check=True, capture_output=True, text=True)
+        if duration is None:
+            duration = sum(_media_duration(p) or 0.0 for p in clip_paths) or None
+        run_ffmpeg(cmd, duration=duration, label=os.path.basename(output_path))
+        os.replace(tmp_output, output_path)
         logger.info("Final processed compilation saved at: %s", output_path)
         return output_path
 
@@ -201,17 +324,276 @@ def create_compilation(selected_clips, output_path):
         logger.error("Error during processing: %s", e.stderr)
         return None
     finally:
-        # Clean up temporary directory
-        try:
-            if os.path.exists(temp_dir):
-                for root, dirs, files in os.walk(temp_dir, topdown=False):
-                    for name in files:
-                        os.remove(os.path.join(root, name))
-                    for name in dirs:
-                        os.rmdir(os.path.join(root, name))
-                os.rmdir(temp_dir)
-        except Exception:
-            pass
+        for p in (list_path, tmp_output):
+            try:
+                if os.path.exists(p):
+                    os.remove(p)
+            except OSError:
+                pass
+
+# ---- Per-clip segment rendering ----
+# Every segment is encoded with identical stream parameters so cached segments can be stream-copy
+# concatenated; preset/crf come from the active encoding profile (see EncodingProfiles.py).
+# Bump SEGMENT_VERSION whenever the filter or stream parameters change to invalidate old segments.
+SEGMENT_VERSION = 1
+SEGMENT_FPS = 60
+# Segments are deleted once their clip's compilation is recorded; any left over (failed bins,
+# clips whose trim changed) are removed after this many days
+SEGMENT_MAX_AGE_DAYS = 14
+SEGMENT_VIDEO_ARGS = [
+    "-pix_fmt", "yuv420p", "-profile:v", "high",
+    "-r", str(SEGMENT_FPS), "-video_track_timescale", "15360",
+]
+SEGMENT_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "192k", "-ar", "48000", "-ac", "2"]
+# Probe fields a file must match to be stream-copied alongside rendered segments
+SEGMENT_STREAM_PARAMS = {
+    KEY_CODEC: "h264", KEY_PROFILE: "High", KEY_PIX_FMT: "yuv420p",
+    KEY_WIDTH: 1920, KEY_HEIGHT: 1080, KEY_FPS: float(SEGMENT_FPS),
+    KEY_AUDIO_CODEC: "aac", KEY_SAMPLE_RATE: 48000, KEY_CHANNELS: 2,
+}
+
+# "segments": render each clip once into the segment cache, then stream-copy concat (default)
+# "single_pass": concat demuxer straight into the filter graph in one ffmpeg run
+COMPILATION_MODE = "segments"
+
+def segment_path_for(
+    clip_path: str,
+    segments_folder=None,
+    trim: Optional[Tuple[float, float]] = None,
+    profile: Optional[Dict[str, Any]] = None,
+) -> Optional[str]:
+    """
+    Cache location for a clip's normalized landscape segment, keyed by path, size, mtime, trim and
+    the encoding profile's preset/CRF (default: the selected profile), so a profile change re-renders.
+    Returns None if the clip can't be stat'ed.
+    """
+    try:
+        st = os.stat(clip_path)
+    except OSError:
+        return None
+    profile = profile or get_profile()
+    norm = os.path.abspath(clip_path).replace("\\", "/")
+    key = (f"{norm}|{st.st_size}|{round(st.st_mtime, 3)}|v{SEGMENT_VERSION}"
+           f"|{profile['preset']}|crf{profile['crf']}")
+    if trim:
+        key += f"|{trim[0]:.3f}-{trim[1]:.3f}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    folder = str(segments_folder or config.SEGMENTS_FOLDER)
+    return os.path.join(folder, f"{digest}.mp4").replace("\\", "/")
+
+def render_segment(
+    clip_path: str,
+    segment_path: str,
+    *,
+    threads: int = 0,
+    profile: Optional[Dict[str, Any]] = None,
+    trim: Optional[Tuple[float, float]] = None,
+    probe: Optional[Dict[str, Any]] = None,
+) -> Optional[str]:
+    """
+    Render one vertical clip into a normalized 1920x1080 landscape segment (fixed stream parameters,
+    always with a stereo AAC track so segments concat cleanly), cut to `trim` when given.
+    `probe` is the row's cached probe; the clip is only re-probed when it is missing or stale.
+    Writes to a temp file and renames.
+    """
+    profile = profile or get_profile()
+    if not probe_is_fresh(probe, clip_path):
+        probe = probe_file(clip_path)
+    if probe is None:
+        logger.info("Skipping %s: Could not probe clip for segment render.", clip_path)
+        return None
+
+    os.makedirs(os.path.dirname(segment_path) or ".", exist_ok=True)
+    tmp_output = segment_path + ".part"
+
+    cmd = ["ffmpeg", "-y"]
+    duration = probe.get(KEY_DURATION)
+    if trim:
+        # Input-side seek: only the kept span is decoded
+        cmd += ["-ss", f"{trim[0]:.3f}", "-to", f"{trim[1]:.3f}"]
+        duration = trim[1] - trim[0]
+    cmd += ["-i", clip_path]
+    if probe.get(KEY_HAS_AUDIO):
+        audio_map = "0:a:0"
+    else:
+        # Silent track so this segment has the same stream layout as the others
+        cmd += ["-f", "lavfi", "-i", "anullsrc=r=48000:cl=stereo"]
+        audio_map = "1:a:0"
+    cmd += [
+        "-filter_complex", landscape_filter_for(probe),
+        "-map", "[out]", "-map", audio_map,
+        *x264_args(profile), *SEGMENT_VIDEO_ARGS, *SEGMENT_AUDIO_ARGS,
+        "-threads", str(threads),
+        "-shortest",
+        "-movflags", "+faststart",
+        "-f", "mp4", tmp_output,
+    ]
+    try:
+        run_ffmpeg(cmd, duration=duration, label=os.path.basename(clip_path))
+        os.replace(tmp_output, segment_path)
+        logger.info("Rendered segment %s -> %s", clip_path, segment_path)
+        return segment_path
+    except subprocess.CalledProcessError as e:
+        logger.error("Error rendering segment for %s: %s", clip_path, e.stderr)
+        return None
+    finally:
+        if os.path.exists(tmp_output):
+            try:
+                os.remove(tmp_output)
+            except OSError:
+                pass
+
+def render_segments(
+    clip_paths: List[str],
+    *,
+    jobs: Optional[int] = None,
+    segments_folder=None,
+    profile: Optional[Dict[str, Any]] = None,
+    trims: Optional[Trims] = None,
+    probes: Optional[Probes] = None,
+) -> List[Optional[str]]:
+    """
+    Make sure every clip has a cached segment, rendering misses in parallel.
+    Each job is its own ffmpeg process, so `jobs` ffmpeg encoders run across cores at once;
+    job count and threads per job come from the encoding profile unless `jobs` is given.
+    Returns segment paths in the same order as clip_paths (None where rendering failed).
+    """
+    profile = dict(profile or get_profile())
+    if jobs:
+        profile["jobs"] = jobs
+    jobs = max(1, int(profile.get("jobs", 1)))
+    threads = threads_per_job(profile)
+
+    results: List[Optional[str]] = [None] * len(clip_paths)
+    trims = trims or {}
+    probes = probes or {}
+    pending: List[Tuple[int, str, str]] = []
+    for i, clip in enumerate(clip_paths):
+        seg = segment_path_for(clip, segments_folder, trims.get(clip), profile)
+        if seg is None:
+            logger.info("Skipping %s: File not found.", clip)
+            continue
+        if os.path.isfile(seg) and os.path.getsize(seg) > 0:
+            results[i] = seg
+        else:
+            pending.append((i, clip, seg))
+
+    logger.info("Segment cache: hits=%d to_render=%d jobs=%d", len(clip_paths) - len(pending), len(pending), jobs)
+    if not pending:
+        return results
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(render_segment, clip, seg, threads=threads, profile=profile,
+                        trim=trims.get(clip), probe=probes.get(clip)): i
+            for i, clip, seg in pending
+        }
+        for fut, i in futures.items():
+            results[i] = fut.result()
+    return results
+
+def _concat_copy(paths: List[str], output_path) -> Optional[str]:
+    """Stream-copy concat of uniformly encoded files into output_path (temp file + atomic rename)."""
+    output_path = str(output_path)
+    out_dir = os.path.dirname(output_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+
+    fd, list_path = tempfile.mkstemp(prefix=".concat_", suffix=".txt", dir=out_dir)
+    os.close(fd)
+    tmp_output = os.path.join(out_dir, "." + os.path.basename(output_path) + ".part")
+
+    try:
+        if _write_concat_list(paths, list_path) == 0:
+            return None
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-map", "0:v", "-map", "0:a?",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-f", "mp4", tmp_output,
+        ]
+        duration = sum(mp4_duration(p) or 0.0 for p in paths) or None
+        run_ffmpeg(cmd, duration=duration, label=os.path.basename(output_path))
+        os.replace(tmp_output, output_path)
+        logger.info("Final compilation (stream copy) saved at: %s", output_path)
+        return output_path
+    except subprocess.CalledProcessError as e:
+        logger.error("Error during concat: %s", e.stderr)
+        return None
+    finally:
+        for p in (list_path, tmp_output):
+            try:
+                if os.path.exists(p):
+                    os.remove(p)
+            except OSError:
+                pass
+
+def create_compilation(
+    selected_clips,
+    output_path,
+    *,
+    mode: Optional[str] = None,
+    trims: Optional[Trims] = None,
+    probes: Optional[Probes] = None,
+    segments_folder=None,
+):
+    """
+    Concatenates the selected clips and applies desired processing to produce a final compilation.
+
+    mode "segments" (default): each clip is rendered once into a cached landscape segment (in parallel),
+    then the segments are stream-copy concatenated. mode "single_pass": concat demuxer straight into
+    the filter graph in one ffmpeg run. Both write a temp file in the output folder and rename it.
+
+    :param selected_clips: List of tuples (file_path, duration).
+    :param output_path: Destination for the final video file.
+    :param mode: "segments" or "single_pass"; defaults to COMPILATION_MODE.
+    :param trims: Optional {file_path: (start, end)} dead-air trims to cut each clip to.
+    :param probes: Optional {file_path: probe} cached on the rows (see clip_probes).
+    :param segments_folder: Segment cache folder; defaults to the active event's SEGMENTS_FOLDER.
+    :return: Path to the final output video, or None if failed.
+    """
+    if not selected_clips:
+        logger.info("No valid clips selected for compilation.")
+        return None
+
+    clip_paths = [fp for fp, _ in selected_clips]
+    mode = mode or COMPILATION_MODE
+    profile = get_profile()
+    logger.info("Compiling %d clips (mode=%s, profile=%s)", len(clip_paths), mode, profile["name"])
+
+    if mode == "single_pass":
+        total = sum(d for _, d in selected_clips) or None
+        result = _render_concat_single_pass(clip_paths, output_path, profile, duration=total, trims=trims)
+        return output_path if result else None
+
+    missing = [fp for fp in clip_paths if not os.path.isfile(fp)]
+    for fp in missing:
+        logger.info("Skipping %s: File not found.", fp)
+    segments = render_segments([fp for fp in clip_paths if fp not in missing], profile=profile,
+                               segments_folder=segments_folder, trims=trims, probes=probes)
+    if not segments:
+        logger.info("No valid clips selected for compilation.")
+        return None
+    if any(seg is None for seg in segments):
+        logger.error("One or more segments failed to render; compilation aborted.")
+        return None
+    result = _concat_copy(segments, output_path)
+    return output_path if result else None
+
+def conforms_to_segments(probe: Optional[Dict[str, Any]]) -> bool:
+    """True if a probed file already has the segment stream parameters."""
+    if not probe:
+        return False
+    return all(probe.get(k) == v for k, v in SEGMENT_STREAM_PARAMS.items())
+
+def can_stream_copy(probes: List[Optional[Dict[str, Any]]]) -> bool:
+    """
+    True if files can be joined without a re-encode: all have the segment stream parameters and
+    the same codec header, i.e. came from the same encoder with the same settings.
+    """
+    headers = {(probe or {}).get(KEY_EXTRADATA) for probe in probes}
+    return all(conforms_to_segments(probe) for probe in probes) and len(headers) == 1 and None not in headers
 
 def create_compilation_from_folder(
     folder_path: str,
@@ -222,16 +604,19 @@ def create_compilation_from_folder(
     """
     Build a compilation from *all* clips in `folder_path` and save the output in the same folder.
 
+    Files are probed once (cached in the folder's .probes.json). A folder whose files all match the
+    segment stream parameters (1920x1080 H.264 High 60fps + stereo AAC) and come from the same
+    encoder is stream-copy joined without any re-encode. Anything else is re-encoded in full, each
+    file with landscape_filter_for its orientation: in a single pass when all files share one
+    orientation (no intermediate copy is written), otherwise through per-file segments in the
+    folder's .segments, which are deleted once the join succeeds.
+
     :param folder_path: Directory containing the clips to concatenate.
     :param extensions: Video file extensions to include.
     :param sort_by: Sorting for clip order: "name" (natural sort) or "mtime".
     :return: Path to the final output video, or None if failed.
     """
     # --- helpers ---
-    def _ffmpeg_escape_path(p: str) -> str:
-        # Escape single quotes for FFmpeg concat file list lines
-        return p.replace("'", r"'\''")
-
     def _natural_key(s: str):
         # Natural sort so "clip2" < "clip10"
         return [int(t) if t.isdigit() else t.lower() for t in re.split(r'(\d+)', s)]
@@ -245,6 +630,9 @@ def create_compilation_from_folder(
         candidates = []
         for name in os.listdir(folder_path):
             full = os.path.join(folder_path, name)
+            # Skip temp files and earlier outputs of this function
+            if name.startswith(".") or name.startswith("compilation_"):
+                continue
             if os.path.isfile(full) and name.lower().endswith(tuple(ext.lower() for ext in extensions)):
                 candidates.append(full)
 
@@ -263,65 +651,32 @@ def create_compilation_from_folder(
         stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = os.path.join(folder_path, f"compilation_{stamp}.mp4")
 
-        # Create temporary working dir
-        temp_dir = tempfile.mkdtemp()
-        list_path = os.path.join(temp_dir, "list.txt")
-
-        try:
-            # Write concat list
-            with open(list_path, "w", encoding="utf-8") as f:
-                for file_path in candidates:
-                    if not os.path.isfile(file_path):
-                        logger.info("Skipping %s: File not found.", file_path)
-                        continue
-                    f.write(f"file '{_ffmpeg_escape_path(file_path)}'\n")
-
-            # 1) Concatenate using FFmpeg (copy streams)
-            temp_compilation = os.path.join(temp_dir, "temp_concatenated.mp4")
-            cmd_concat = [
-                "ffmpeg", "-y",
-                "-f", "concat", "-safe", "0", "-i", list_path,
-                "-c", "copy",
-                temp_compilation
-            ]
-            subprocess.run(cmd_concat, check=True, capture_output=True, text=True)
-            logger.info("Concatenated compilation saved at: %s", temp_compilation)
-
-            # 2) Post-process (same filter chain as your original)
-            cmd_process = [
-                "ffmpeg", "-y",
-                "-i", temp_compilation,
-                "-filter_complex",
-                "[0:v]crop=1080:960:0:0[top];"
-                "[0:v]crop=1080:960:0:960[bottom];"
-                "[top][bottom]hstack=inputs=2[stacked];"
-                "[stacked]scale=1920:852[scaled];"
-                "[scaled]pad=1920:1080:(ow-iw)/2:(oh-ih)/2:#5c3a21[out]",
-                "-map", "[out]",
-                "-map", "0:a?",
-                "-c:v", "libx264", "-preset", "fast", "-crf", "18",
-                "-c:a", "copy",
-                output_path
-            ]
-            subprocess.run(cmd_process, check=True, capture_output=True, text=True)
-            logger.info("Final processed compilation saved at: %s", output_path)
-            return output_path
-
-        except subprocess.CalledProcessError as e:
-            logger.error("Error during processing: %s", e.stderr)
+        probes = probe_paths(candidates, os.path.join(folder_path, ".probes.json"))
+        if can_stream_copy([probes.get(p) for p in candidates]):
+            logger.info("Folder compilation: stream-copying %d file(s)", len(candidates))
+            return _concat_copy(candidates, output_path)
+
+        filters = {landscape_filter_for(probes.get(p)) for p in candidates}
+        if len(filters) == 1:
+            logger.info("Folder compilation: re-encoding %d file(s) in a single pass", len(candidates))
+            total = sum((probes.get(p) or {}).get(KEY_DURATION) or 0.0 for p in candidates) or None
+            return _render_concat_single_pass(candidates, output_path, duration=total, filter_graph=filters.pop())
+
+        logger.info("Folder compilation: re-encoding %d file(s) of mixed orientation as segments", len(candidates))
+        segments = render_segments(candidates, segments_folder=os.path.join(folder_path, ".segments"), probes=probes)
+        if any(seg is None for seg in segments):
+            logger.error("One or more files failed to render; compilation aborted.")
             return None
 
-        finally:
-            # Clean up temp dir
-            try:
-                for root, dirs, files in os.walk(temp_dir, topdown=False):
-                    for name in files:
-                        os.remove(os.path.join(root, name))
-                    for name in dirs:
-                        os.rmdir(os.path.join(root, name))
-                os.rmdir(temp_dir)
-            except Exception:
-                pass
+        result = _concat_copy(segments, output_path)
+        if result:
+            # Full-length copies of the recordings; kept only when the join failed, for the retry
+            for seg in segments:
+                try:
+                    os.remove(seg)
+                except OSError:
+                    pass
+        return result
 
     except Exception as e:
         logger.exception("Unexpected error: %s", e)
@@ -355,18 +710,25 @@ def get_clip_titles(video_data):
     return [clip["Title"] for clip in video_data]
 
 def get_clip_titles_from_selected(selected_clips, full_video_data):
-    titles = []
-    for file_path, _ in selected_clips:
-        for clip in full_video_data:
-            if clip.get(KEY_FILE) == file_path:
-                titles.append(clip.get(KEY_TITLE, ""))
-                break
-    return titles
+    title_by_path = {}
+    for clip in full_video_data:
+        title_by_path.setdefault(clip.get(KEY_FILE), clip.get(KEY_TITLE, ""))
+    return [title_by_path[fp] for fp, _ in selected_clips if fp in title_by_path]
 
 def _ffmpeg_escape_path(p: str) -> str:
     # ffmpeg concat file format: single quotes around a POSIX-style path; escape internal quotes
     p = str(p).replace("\\", "/")
-    return p.replace("'", "''")
+    return p.replace("'", r"'\''")
+
+def _media_duration(path: str) -> Optional[float]:
+    """
+    Get duration in seconds. MP4/MOV files are read natively from their boxes (no subprocess);
+    ffprobe is only used for other containers or files without a usable mvhd/mdhd.
+    """
+    duration = mp4_duration(path)
+    if duration:
+        return duration
+    return _ffprobe_duration(path)
 
 def _ffprobe_duration(path: str) -> Optional[float]:
     """
@@ -378,7 +740,7 @@ def _ffprobe_duration(path: str) -> Optional[float]:
                 "-show_entries", "format=duration", "-of",
                 "default=noprint_wrappers=1:nokey=1", path
             ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=FFPROBE_TIMEOUT)
         val = result.stdout.strip()
         if not val:
             return None
@@ -400,19 +762,185 @@ def generate_compilation_from_videodata(video_data):
     output_path = config.COMPS_FOLDER / filename
     video_rows = parse_jsonl(video_data)  # Use the provided function
     selected_clips, updated_video_data = select_clips_for_compilation(video_rows)
+    persist_probes(video_data, video_rows, updated_video_data)
 
     if selected_clips:
-        compilation_path = create_compilation(selected_clips, output_path)
+        trims = clip_trims(updated_video_data)
+        compilation_path = create_compilation(selected_clips, output_path, trims=trims,
+                                              probes=clip_probes(updated_video_data))
         if compilation_path:
-            write_jsonl_atomic(video_data, updated_video_data)
+            update_jsonl_rows(video_data, {fp: {KEY_USED: True} for fp, _ in selected_clips})
             logger.info("Updated videodata.txt to mark used clips.")
             clip_titles = get_clip_titles_from_selected(selected_clips, updated_video_data)
             update_compilation_data(clip_titles, compilation_path, [fp for fp, _ in selected_clips])  # Update the COMP_DATA with compilation info
+            prune_segments([fp for fp, _ in selected_clips], trims)
         return compilation_path
     else:
         logger.info("Not enough valid unused clips to create a compilation.")
         return None
 
+def persist_probes(video_data, before: List[dict], after: List[dict]) -> int:
+    """Merge probes refreshed during clip selection (and probe failures) back into videodata."""
+    old = {row.get(KEY_FILE): row for row in before if row.get(KEY_FILE)}
+    patches = {}
+    for row in after:
+        prev = old.get(row.get(KEY_FILE))
+        if prev is None:
+            continue
+        patch = {k: row.get(k) for k in (KEY_PROBE, KEY_PROBE_FAILED) if row.get(k) != prev.get(k)}
+        if patch:
+            patches[row[KEY_FILE]] = patch
+    return update_jsonl_rows(video_data, patches) if patches else 0
+
+def clip_trims(video_rows: List[dict]) -> Trims:
+    """{file_path: (start, end)} for every row with a fresh dead-air trim."""
+    trims: Trims = {}
+    for row in video_rows:
+        trim = get_trim(row)
+        if trim:
+            trims[row[KEY_FILE]] = trim
+    return trims
+
+def clip_probes(video_rows: List[dict]) -> Probes:
+    """{file_path: probe} for every row whose cached probe still matches its file."""
+    probes: Probes = {}
+    for row in video_rows:
+        probe = get_probe(row, refresh=False)
+        if probe:
+            probes[row[KEY_FILE]] = probe
+    return probes
+
+def prune_segments(clip_paths: List[str], trims: Optional[Trims] = None, segments_folder=None) -> int:
+    """
+    Delete the cached segments of `clip_paths` (clips now recorded as used in a compilation) and any
+    segment older than SEGMENT_MAX_AGE_DAYS. Returns the number of files removed.
+    """
+    folder = str(segments_folder or config.SEGMENTS_FOLDER)
+    trims = trims or {}
+    profile = get_profile()
+    doomed = {segment_path_for(clip, folder, trims.get(clip), profile) for clip in clip_paths}
+    cutoff = time.time() - SEGMENT_MAX_AGE_DAYS * 86400
+    removed = 0
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(folder, name).replace("\\", "/")
+        try:
+            if path in doomed or os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info("Pruned %d cached segment(s) from %s", removed, folder)
+    return removed
+
+def plan_compilations(
+    video_rows: List[dict],
+    min_length: int = 50,
+    max_length: int = 305,
+    max_bins: Optional[int] = None,
+) -> tuple[List[List[Tuple[str, float]]], List[dict]]:
+    """
+    Split all unused clips into compilation bins at once by running the selection repeatedly.
+
+    :return: (bins, updated_rows) where every clip in a bin is marked KEY_USED in updated_rows.
+    """
+    bins: List[List[Tuple[str, float]]] = []
+    rows = video_rows
+    while max_bins is None or len(bins) < max_bins:
+        selected, rows = select_clips_for_compilation(rows, min_length, max_length)
+        if not selected:
+            break
+        bins.append(selected)
+    logger.info("Planned %d compilation(s) totalling %d clips.", len(bins), sum(len(b) for b in bins))
+    return bins, [dict(r) for r in rows]
+
+def generate_all_compilations_from_videodata(
+    video_data,
+    max_bins: Optional[int] = None,
+    event_name: Optional[str] = None,
+) -> List[str]:
+    """
+    Plan every compilation the event's unused clips can fill and render them all in one run.
+
+    Rendering runs one compilation at a time (each render is itself parallel across cores); once a
+    bin renders, its AI title/description/thumbnail are generated on a small thread pool, so
+    network-bound metadata work overlaps with the next render and failed bins cost no AI calls. At the end only KEY_USED is merged into
+    videodata (background jobs may have patched other fields meanwhile) and COMP_DATA is appended
+    once; the upload slots then just pull queued compilations from COMP_DATA.
+    Outputs go to `event_name`'s folders (default: the active event), so a background render never
+    has to switch the active event.
+
+    :return: Paths of the compilations that rendered successfully.
+    """
+    video_rows = parse_jsonl(video_data)
+    bins, updated_rows = plan_compilations(video_rows, max_bins=max_bins)
+    persist_probes(video_data, video_rows, updated_rows)
+    if not bins:
+        logger.info("Not enough valid unused clips to create a compilation.")
+        return []
+
+    paths = config.event_paths(event_name)
+    stamp = str(datetime.datetime.now().replace(microsecond=0)).replace(":", "-")
+    output_paths = [
+        paths["comps folder"] / (f"{stamp}.mp4" if len(bins) == 1 else f"{stamp}_{n + 1:02d}.mp4")
+        for n in range(len(bins))
+    ]
+
+    rendered: List[str] = []
+    records: List[Dict[str, Any]] = []
+    used_clips: set = set()
+    trims = clip_trims(updated_rows)
+    probes = clip_probes(updated_rows)
+
+    with ThreadPoolExecutor(max_workers=2) as metadata_pool:
+        # A bin's metadata starts once its render succeeds and overlaps with the next bin's render
+        metadata_futures = []
+        for selected, output_path in zip(bins, output_paths):
+            compilation_path = create_compilation(selected, output_path, trims=trims, probes=probes,
+                                                  segments_folder=paths["segments folder"])
+            if not compilation_path:
+                logger.error("Compilation render failed: %s", output_path)
+                continue
+            fut = metadata_pool.submit(
+                build_compilation_record,
+                get_clip_titles_from_selected(selected, updated_rows),
+                output_path,
+                [fp for fp, _ in selected],
+                trims,
+                event_name,
+            )
+            metadata_futures.append((selected, compilation_path, fut))
+
+        for selected, compilation_path, fut in metadata_futures:
+            try:
+                records.append(fut.result())
+                rendered.append(str(compilation_path))
+                used_clips.update(fp for fp, _ in selected)
+            except Exception as e:
+                logger.error("Failed to build compilation metadata for %s: %s", compilation_path, e)
+                # Its clips stay unused, so the render would only be orphaned
+                try:
+                    os.remove(compilation_path)
+                except OSError:
+                    pass
+
+    # Only clips of rendered bins are marked; clips from failed bins stay in the pool for the next run
+    if rendered:
+        update_jsonl_rows(video_data, {fp: {KEY_USED: True} for fp in used_clips})
+        logger.info("Updated videodata to mark used clips for %d compilation(s).", len(rendered))
+        try:
+            append_jsonl(paths["comp data"], records)
+            logger.info("Appended %d compilation record(s) to %s", len(records), paths["comp data"])
+            prune_segments(sorted(used_clips), trims, paths["segments folder"])
+        except Exception as e:
+            logger.error("Failed to append compilation data: %s", e)
+
+    return rendered
+
 def update_video_data(file_path, updated_data):
     """
     Saves the updated video data back to the videodata.txt file.
@@ -447,7 +975,7 @@ def fix_mp4_metadata(input_path, output_path=None):
             output_path,
             "-y"
         ]
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        run_ffmpeg(cmd, duration=_media_duration(input_path), label=os.path.basename(input_path))
 
         # Replace the original with the fixed version
         if output_path != input_path:
@@ -457,15 +985,18 @@ def fix_mp4_metadata(input_path, output_path=None):
         return input_path
 
     except subprocess.CalledProcessError as e:
-        print("Error processing file:", e.stderr.decode())
+        print("Error processing file:", e.stderr)
         return None
 
         
 def fix_mp4_metadata_in_folder(folder_path, videodata_path: Optional[str] = None):
     """
-    Fix metadata for all MP4 files in a folder using fix_mp4_metadata().
-    If videodata_path is provided (JSONL), skip files already marked KEY_FIXED == True,
-    and mark entries as fixed immediately after successful processing (no probing).
+    Fix metadata for MP4 files in a folder using fix_mp4_metadata().
+    Files are inspected natively first (see Mp4Atoms) and only remuxed when moov sits after mdat,
+    the file is fragmented, or it has no duration; files that are already faststart are left alone.
+    If videodata_path is provided (JSONL), only files referenced by videodata are considered,
+    files already marked KEY_FIXED == True are skipped, and entries are marked fixed once they
+    are known to be faststart (remuxed or not).
     """
     folder_path = str(folder_path)
 
@@ -495,10 +1026,21 @@ def fix_mp4_metadata_in_folder(folder_path, videodata_path: Optional[str] = None
             logger.warning("Unable to read videodata from %s: %s", videodata_path, e)
             videodata_rows = None
 
+    # With videodata, files it doesn't reference (e.g. stray or in-progress recordings) are left alone
+    if videodata_rows is not None:
+        mp4_files = [p for p in mp4_files if p in path_to_idx]
+
     checked = 0
     fixed_count = 0
     skipped_already_fixed = 0
-    wrote_videodata = False
+    skipped_faststart = 0
+    fixed_files: set = set()
+
+    def _mark_fixed(mp4_file: str) -> None:
+        if videodata_rows is not None and mp4_file in path_to_idx:
+            fixed_files.add(mp4_file)
+        else:
+            logger.debug("File fixed but not found in videodata: %s", mp4_file)
 
     for mp4_file in mp4_files:
         checked += 1
@@ -513,31 +1055,30 @@ def fix_mp4_metadata_in_folder(folder_path, videodata_path: Optional[str] = None
                     logger.info("Skipping (already marked fixed): %s", mp4_file)
                     continue
 
+        # Cheap native box inspection: no remux needed if moov is already up front with a duration
+        if not needs_remux(mp4_file):
+            skipped_faststart += 1
+            _mark_fixed(mp4_file)
+            continue
+
         # Run the fixer (your existing ffmpeg-based function)
         result = fix_mp4_metadata(mp4_file)
 
         if result:
             fixed_count += 1
-            # Immediately mark videodata as fixed (no probing)
-            if videodata_rows is not None and path_to_idx:
-                idx = path_to_idx.get(mp4_file)
-                if idx is not None and isinstance(videodata_rows[idx], dict):
-                    videodata_rows[idx][KEY_FIXED] = True
-                    wrote_videodata = True
-                else:
-                    logger.debug("File fixed but not found in videodata: %s", mp4_file)
+            _mark_fixed(mp4_file)
         else:
             logger.warning("Failed to fix metadata for: %s", mp4_file)
 
     logger.info(
-        "Metadata pass complete: checked=%d, fixed=%d, skipped_already_fixed=%d",
-        checked, fixed_count, skipped_already_fixed
+        "Metadata pass complete: checked=%d, fixed=%d, skipped_already_fixed=%d, skipped_faststart=%d",
+        checked, fixed_count, skipped_already_fixed, skipped_faststart
     )
 
-    # Persist videodata updates once at the end (rewrite JSONL atomically)
-    if videodata_path and videodata_rows is not None and wrote_videodata:
+    # Merge only the fixed flags; remuxing takes a while and other jobs patch the file meanwhile
+    if videodata_path and fixed_files:
         try:
-            write_jsonl_atomic(videodata_path, videodata_rows)
+            update_jsonl_rows(videodata_path, {p: {KEY_FIXED: True} for p in fixed_files})
             logger.info("Videodata updated with '%s': true flags.", KEY_FIXED)
         except Exception as e:
             logger.error("Failed to write updated videodata to %s: %s", videodata_path, e)
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import build_http
+
+import config
+
+logger = logging.getLogger(__name__)
+
+API_SERVICE_NAME = "youtube"
+API_VERSION = "v3"
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+# Local copy of the discovery document; clients are built from it without a network round trip
+DISCOVERY_CACHE_FILE = config.STATE_FOLDER / "youtube_v3_discovery.json"
+# Re-download the document after this long (a stale copy is still used if the download fails)
+DISCOVERY_MAX_AGE_DAYS = 7
+# After a failed download, don't try again for this long (the stale copy is served meanwhile)
+DISCOVERY_RETRY_MINUTES = 60
+
+_LOCK = threading.Lock()
+_document: Optional[Dict[str, Any]] = None
+_failed_at: Optional[float] = None  # time.monotonic() of the last failed download
+
+
+def _read_cached() -> Optional[Dict[str, Any]]:
+    try:
+        with open(DISCOVERY_CACHE_FILE, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        return doc if doc.get("resources") else None
+    except (OSError, ValueError):
+        return None
+
+def _cache_age_days() -> float:
+    try:
+        return (time.time() - os.path.getmtime(DISCOVERY_CACHE_FILE)) / 86400
+    except OSError:
+        return float("inf")
+
+def _download() -> Optional[Dict[str, Any]]:
+    try:
+        resp, content = httplib2.Http(timeout=30).request(DISCOVERY_URL, "GET")
+        if int(resp.status) != 200:
+            logger.warning("Discovery download returned HTTP %s", resp.status)
+            return None
+        doc = json.loads(content.decode("utf-8"))
+    except Exception as e:
+        logger.warning("Discovery download failed: %s", e)
+        return None
+    if not doc.get("resources"):
+        return None
+    path = str(DISCOVERY_CACHE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+    os.replace(tmp, path)
+    logger.info("YouTube discovery document cached at %s", path)
+    return doc
+
+def _retry_due() -> bool:
+    return _failed_at is None or time.monotonic() - _failed_at >= DISCOVERY_RETRY_MINUTES * 60
+
+def discovery_document() -> Optional[Dict[str, Any]]:
+    """
+    The YouTube v3 discovery document: from memory, then the local cache, downloading it when
+    missing or old. A failed download isn't retried for DISCOVERY_RETRY_MINUTES, so offline client
+    builds serve the stale copy instead of each waiting on the download timeout.
+    """
+    global _document, _failed_at
+    with _LOCK:
+        fresh = _cache_age_days() <= DISCOVERY_MAX_AGE_DAYS
+        if _document is not None and (fresh or not _retry_due()):
+            return _document
+        doc = _read_cached()
+        if (doc is None or not fresh) and _retry_due():
+            downloaded = _download()
+            _failed_at = None if downloaded else time.monotonic()
+            doc = downloaded or doc
+        _document = doc
+        return doc
+
+def api_http(credentials=None):
+    """
+    httplib2 transport for API clients. 308 is the resumable upload's "chunk received, keep going"
+    reply, not a redirect; httplib2 >= 0.16 follows it (and fails) unless it is removed from
+    redirect_codes, which googleapiclient 1.7.2 doesn't do itself.
+    """
+    http = build_http()
+    http.redirect_codes = set(http.redirect_codes) - {308}
+    if credentials is not None:
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=http)
+    return http
+
+def build_youtube(credentials=None, developerKey=None, http=None):
+    """A YouTube client built from the cached discovery document, authorized by credentials or an API key."""
+    http = http or api_http(credentials)
+    doc = discovery_document()
+    if doc is None:
+        logger.warning("No discovery document available; building the client from the network.")
+        return build(API_SERVICE_NAME, API_VERSION, http=http, developerKey=developerKey, cache_discovery=False)
+    return build_from_document(doc, http=http, developerKey=developerKey)
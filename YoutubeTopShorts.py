@@ -2,7 +2,9 @@
 import os
 import datetime
 import isodate
-from googleapiclient.discovery import build
+from YoutubeDiscovery import build_youtube
+
+import QuotaLedger
 
 import yt_dlp
 
@@ -21,9 +23,12 @@ def get_time_range(days=15):
 
 def get_channel_videos(channel_id, published_after, published_before):
     video_ids = []
-    youtube = build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=YOUTUBE_API_KEY)
+    youtube = build_youtube(developerKey=YOUTUBE_API_KEY)
     nextPageToken = None
     while True:
+        if not QuotaLedger.admit("search.list", what="top shorts search"):
+            break
+        QuotaLedger.record("search.list")
         search_response = youtube.search().list(
             channelId=channel_id,
             part="id",
@@ -42,9 +47,12 @@ def get_channel_videos(channel_id, published_after, published_before):
     return video_ids
 
 def get_video_details(video_ids):
-    youtube = build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=YOUTUBE_API_KEY)
+    youtube = build_youtube(developerKey=YOUTUBE_API_KEY)
     details = []
     for i in range(0, len(video_ids), 50):
+        if not QuotaLedger.admit("videos.list", what="top shorts details"):
+            break
+        QuotaLedger.record("videos.list")
         response = youtube.videos().list(
             id=",".join(video_ids[i:i+50]),
             part="snippet,contentDetails,statistics"
@@ -7,19 +7,24 @@ import os
 import random
 import time
 import config
-from config import KEY_FILE, KEY_ID, KEY_THUMBNAIL, KEY_DESC, KEY_TITLE, KEY_THUMBNAIL_SET
+from config import KEY_FILE, KEY_ID, KEY_THUMBNAIL, KEY_DESC, KEY_TITLE, KEY_THUMBNAIL_SET, KEY_PUBLISH_AT, KEY_PREFLIGHT, KEY_PREFLIGHT_REASON
 import schedule
 import google.oauth2.credentials
 import google_auth_oauthlib.flow
 import json
 import logging
+import threading
 
-from googleapiclient.discovery import build
+from YoutubeDiscovery import build_youtube
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
 from google_auth_oauthlib.flow import InstalledAppFlow
 from glob import glob
-from ProcessComboTextFile import parse_jsonl, append_jsonl, write_jsonl_atomic
+from ProcessComboTextFile import parse_jsonl, append_jsonl, write_jsonl_atomic, update_jsonl_rows, jsonl_lock
+from UploadProxy import get_upload_file, remove_upload_proxy
+import QuotaLedger
+from ThumbnailQueue import enqueue as enqueue_thumbnail
+from Preflight import ensure_preflight
+from UploadThrottle import ThrottledMediaFileUpload
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 
@@ -27,7 +32,7 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from urllib.parse import urlencode
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 
 
@@ -39,6 +44,16 @@ httplib2.RETRIES = 1
 # Maximum number of times to retry before giving up.
 MAX_RETRIES = 10
 
+# Bytes sent per upload request. Must be a multiple of 256 KiB; progress is persisted after each
+# chunk, so smaller chunks lose less on a crash and larger ones have less per-request overhead.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+_CHUNK_GRANULARITY = 256 * 1024
+
+# Resumable session URI + confirmed offset per file, kept next to videodata in the event's data folder
+UPLOAD_SESSIONS_FILENAME = "uploadsessions.jsonl"
+KEY_SESSION_URI = "session uri"
+KEY_SESSION_OFFSET = "offset"
+
 # Always retry when these exceptions are raised.
 RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, IOError, http.client.NotConnected,
   http.client.IncompleteRead, http.client.ImproperConnectionState,
@@ -67,13 +82,18 @@ CREDENTIALS_FILE = config.CREDENTIALS_FILE
 
 # This OAuth 2.0 access scope allows an application to upload files to the
 # authenticated user's YouTube channel, but doesn't allow other types of access.
-SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+# readonly is needed for videos.list on our own uploads (processing status, see UploadVerifier.py)
+SCOPES = ['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube.readonly']
 API_SERVICE_NAME = 'youtube'
 API_VERSION = 'v3'
 
 VALID_PRIVACY_STATUSES = ('public', 'private', 'unlisted')
 
-def YoutubeArgs():
+
+class UploadError(Exception):
+  """An upload gave up (retries exhausted or an unexpected response); its session is kept for resuming."""
+
+def YoutubeArgs(argv=None):
   parser = argparse.ArgumentParser(add_help=True)
   parser.add_argument("--file", help='Video file to upload')
   parser.add_argument("--title", help='Video title', default='Test Title')
@@ -86,20 +106,44 @@ def YoutubeArgs():
     default='')
   parser.add_argument("--privacyStatus", choices=VALID_PRIVACY_STATUSES,
     default='public', help='Video privacy status.')
-  args = parser.parse_args()
+  parser.add_argument("--publishAt", default=None,
+    help='RFC 3339 UTC time to publish a private upload, e.g. 2025-01-07T16:00:00Z')
+  args = parser.parse_args(argv)
   return args
 
 
-# Authorize the request and store authorization credentials.
-def get_authenticated_service():
+# Refresh the access token this long before it expires, so no slot ever starts with a stale token
+TOKEN_REFRESH_MARGIN_SECONDS = 10 * 60
+TOKEN_CHECK_INTERVAL_SECONDS = 60
+
+# One set of credentials per process, shared by every client (workers, background jobs) and kept
+# fresh by the token refresher
+_CREDS = None
+_CREDS_LOCK = threading.RLock()
+# Set when the refresh token was rejected: the stored credentials are skipped and OAuth runs again
+_REAUTH_NEEDED = False
+
+def _save_credentials(creds):
+    # Save to disk atomically
+    tmp = str(CREDENTIALS_FILE) + ".tmp"
+    with open(tmp, "w") as fh:
+        fh.write(creds.to_json())
+    os.replace(tmp, CREDENTIALS_FILE)
+
+def _load_credentials(reauth=False):
     creds = None
 
     # Gracefully handle missing/empty/invalid credentials
-    if os.path.exists(CREDENTIALS_FILE):
+    if not reauth and os.path.exists(CREDENTIALS_FILE):
         if os.stat(CREDENTIALS_FILE).st_size > 0:
             try:
                 with open(CREDENTIALS_FILE, "r") as fh:
-                    creds = Credentials.from_authorized_user_info(json.load(fh), SCOPES)
+                    info = json.load(fh)
+                missing = set(SCOPES) - set(info.get("scopes") or SCOPES)
+                if missing:
+                    logging.info("Stored credentials lack %s; will reauth.", ", ".join(sorted(missing)))
+                else:
+                    creds = Credentials.from_authorized_user_info(info, SCOPES)
             except Exception as e:
                 logging.warning("Failed to read credentials; will reauth: %s", e)
 
@@ -107,6 +151,7 @@ def get_authenticated_service():
     if creds and creds.expired and creds.refresh_token:
         try:
             creds.refresh(Request())
+            _save_credentials(creds)
         except Exception as e:
             logging.warning("Token refresh failed; falling back to OAuth: %s", e)
             creds = None  # force flow
@@ -115,19 +160,79 @@ def get_authenticated_service():
         flow = InstalledAppFlow.from_client_secrets_file(str(CLIENT_SECRETS_FILE), SCOPES)
         # Ensure a refresh_token is issued:
         creds = flow.run_local_server(port=0, access_type='offline', prompt='consent')
+        _save_credentials(creds)
+    return creds
+
+def get_credentials():
+    """The shared credentials, loaded (or re-authorized) if there are none or they can no longer be used."""
+    global _CREDS, _REAUTH_NEEDED
+    with _CREDS_LOCK:
+        if _CREDS is None or not (_CREDS.valid or _CREDS.refresh_token):
+            _CREDS = _load_credentials(reauth=_REAUTH_NEEDED)
+            _REAUTH_NEEDED = False
+        return _CREDS
+
+def invalidate_credentials():
+    """Drop the shared credentials after an invalid_grant; the next get_credentials() re-authorizes."""
+    global _CREDS, _REAUTH_NEEDED
+    with _CREDS_LOCK:
+        _CREDS = None
+        _REAUTH_NEEDED = True
+
+def _seconds_until_expiry(creds):
+    if creds.expiry is None:
+        return float("inf")
+    return (creds.expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+
+def refresh_credentials_if_due():
+    """
+    Renew the shared access token if it expires within TOKEN_REFRESH_MARGIN_SECONDS and save it.
+    Returns False if the refresh token itself was rejected (the next get_credentials() re-authorizes).
+    """
+    with _CREDS_LOCK:
+        creds = _CREDS
+        if creds is None or not creds.refresh_token:
+            return True
+        if _seconds_until_expiry(creds) > TOKEN_REFRESH_MARGIN_SECONDS:
+            return True
+        try:
+            creds.refresh(Request())
+        except Exception as e:
+            if "invalid_grant" in str(e):
+                logging.error("Refresh token rejected (%s); re-authorization needed.", e)
+                invalidate_credentials()
+                return False
+            logging.warning("Background token refresh failed; will retry: %s", e)
+            return True
+        _save_credentials(creds)
+        logging.info("Access token refreshed; valid until %s UTC", creds.expiry)
+        return True
+
+_REFRESHER = None
+
+def start_token_refresher():
+    """Start (once) a daemon thread that keeps the shared access token renewed ahead of expiry."""
+    global _REFRESHER
+    if _REFRESHER is not None and _REFRESHER.is_alive():
+        return _REFRESHER
+
+    def _loop():
+        while True:
+            refresh_credentials_if_due()
+            time.sleep(TOKEN_CHECK_INTERVAL_SECONDS)
+
+    _REFRESHER = threading.Thread(target=_loop, name="token-refresher", daemon=True)
+    _REFRESHER.start()
+    return _REFRESHER
 
-        # Save to disk atomically
-        tmp = str(CREDENTIALS_FILE) + ".tmp"
-        with open(tmp, "w") as fh:
-            fh.write(creds.to_json())
-        os.replace(tmp, CREDENTIALS_FILE)
-
-    # Build YouTube client (disable discovery cache to avoid file writes)
-    return build("youtube", "v3", credentials=creds, cache_discovery=False)
+# Authorize the request and store authorization credentials.
+def get_authenticated_service():
+    # Built from the locally cached discovery document (no discovery round trip per client)
+    return build_youtube(credentials=get_credentials())
 
 
 
-def initialize_upload(youtube, options):
+def initialize_upload(youtube, options, sessions_path=None):
   tags = None
   if options.keywords:
     tags = options.keywords.split(',')
@@ -143,47 +248,71 @@ def initialize_upload(youtube, options):
       privacyStatus=options.privacyStatus
     )
   )
+  # Scheduled publishing: YouTube only accepts publishAt on private videos
+  publish_at = getattr(options, "publishAt", None)
+  if publish_at:
+    body["status"]["privacyStatus"] = "private"
+    body["status"]["publishAt"] = publish_at
 
   # Call the API's videos.insert method to create and upload the video.
   insert_request = youtube.videos().insert(
     part=','.join(body.keys()),
     body=body,
-    # The chunksize parameter specifies the size of each chunk of data, in
-    # bytes, that will be uploaded at a time. Set a higher value for
-    # reliable connections as fewer chunks lead to faster uploads. Set a lower
-    # value for better recovery on less reliable connections.
-    #
-    # Setting 'chunksize' equal to -1 in the code below means that the entire
-    # file will be uploaded in a single HTTP request. (If the upload fails,
-    # it will still be retried where it left off.) This is usually a best
-    # practice, but if you're using Python older than 2.6 or if you're
-    # running on App Engine, you should set the chunksize to something like
-    # 1024 * 1024 (1 megabyte).
-    media_body=MediaFileUpload(options.file, chunksize=-1, resumable=True)
+    # The file is sent in UPLOAD_CHUNK_SIZE pieces so the confirmed offset can be
+    # persisted after each one; a restarted process resumes from there. Bytes are paced by the
+    # shared upload rate limit so a live event's recording/stream keeps its uplink.
+    media_body=ThrottledMediaFileUpload(options.file, chunksize=_chunk_size(), resumable=True)
   )
 
-  return resumable_upload(insert_request)
+  if sessions_path:
+    video_id = _resume_saved_session(insert_request, sessions_path, options.file)
+    if video_id:
+      return video_id
+
+  if insert_request.resumable_uri is None:
+    # A new session is a new videos.insert call (resuming an existing one isn't charged again)
+    QuotaLedger.record("videos.insert")
+  return resumable_upload(insert_request, sessions_path=sessions_path, upload_file=options.file)
+
+def _chunk_size():
+  """UPLOAD_CHUNK_SIZE rounded up to the 256 KiB granularity the upload protocol requires."""
+  chunks = max(1, -(-int(UPLOAD_CHUNK_SIZE) // _CHUNK_GRANULARITY))
+  return chunks * _CHUNK_GRANULARITY
 
 # This method implements an exponential backoff strategy to resume a
 # failed upload.
-def resumable_upload(request):
+def resumable_upload(request, sessions_path=None, upload_file=None):
   response = None
   error = None
   retry = 0
   while response is None:
+    error = None
     try:
       logging.info('Uploading file...')
       status, response = request.next_chunk()
+      if sessions_path and request.resumable_uri:
+        _save_upload_session(sessions_path, upload_file, request.resumable_uri, request.resumable_progress)
+      if status is not None:
+        logging.info('Uploaded %d%%', int(status.progress() * 100))
       if response is not None:
+        if sessions_path:
+          _clear_upload_session(sessions_path, upload_file)
         if 'id' in response:
           logging.info('Video id "%s" was successfully uploaded.' % response['id'])
           return response['id']
         else:
-          exit('The upload failed with an unexpected response: %s' % response)
+          raise UploadError('The upload failed with an unexpected response: %s' % response)
     except(HttpError) as e:
       if e.resp.status in RETRIABLE_STATUS_CODES:
         error = 'A retriable HTTP error %d occurred:\n%s' % (e.resp.status,
                                                              e.content)
+      elif e.resp.status in SESSION_EXPIRED_STATUS_CODES and request.resumable_uri:
+        # The session is gone; start a new one from byte 0
+        error = 'Upload session expired (HTTP %d); starting a new session.' % e.resp.status
+        _restart_session(request)
+        QuotaLedger.record("videos.insert")
+        if sessions_path:
+          _clear_upload_session(sessions_path, upload_file)
       else:
         raise
     except(RETRIABLE_EXCEPTIONS) as e:
@@ -193,13 +322,139 @@ def resumable_upload(request):
       logging.info(error)
       retry += 1
       if retry > MAX_RETRIES:
-        exit('No longer attempting to retry.')
+        raise UploadError('No longer attempting to retry.')
 
       max_sleep = 2 ** retry
       sleep_seconds = random.random() * max_sleep
       logging.info ('Sleeping %f seconds and then retrying...' % sleep_seconds)
       time.sleep(sleep_seconds)
 
+# Responses meaning a resumable session no longer exists
+SESSION_EXPIRED_STATUS_CODES = (404, 410)
+
+def _restart_session(request):
+  request.resumable_uri = None
+  request.resumable_progress = 0
+
+def _file_signature(path):
+  st = os.stat(path)
+  return st.st_size, round(st.st_mtime, 3)
+
+def _load_upload_session(sessions_path, upload_file):
+  for row in parse_jsonl(str(sessions_path)):
+    if row.get(KEY_FILE) == upload_file:
+      return row
+  return None
+
+def _save_upload_session(sessions_path, upload_file, uri, offset):
+  """Record the session URI and confirmed byte offset for a file (one row per file)."""
+  size, mtime = _file_signature(upload_file)
+  entry = {
+    KEY_FILE: upload_file,
+    KEY_SESSION_URI: uri,
+    KEY_SESSION_OFFSET: offset,
+    "size": size,
+    "mtime": mtime,
+    "updated at": datetime.now().replace(microsecond=0).isoformat(),
+  }
+  with jsonl_lock(sessions_path):
+    rows = [r for r in parse_jsonl(str(sessions_path)) if r.get(KEY_FILE) != upload_file]
+    rows.append(entry)
+    write_jsonl_atomic(str(sessions_path), rows)
+
+def _clear_upload_session(sessions_path, upload_file):
+  with jsonl_lock(sessions_path):
+    rows = parse_jsonl(str(sessions_path))
+    kept = [r for r in rows if r.get(KEY_FILE) != upload_file]
+    if len(kept) != len(rows):
+      write_jsonl_atomic(str(sessions_path), kept)
+
+def _query_upload_session(http, uri, total_size):
+  """
+  Ask the upload server how much of a session it has (PUT with 'Content-Range: bytes */size').
+  Returns ('incomplete', offset, None), ('complete', size, response) or ('expired', 0, None).
+  """
+  resp, content = http.request(uri, method="PUT", body=b"",
+                               headers={"Content-Range": "bytes */%d" % total_size, "Content-Length": "0"})
+  status = int(resp.status)
+  if status == 308:
+    byte_range = resp.get("range")
+    offset = int(byte_range.rsplit("-", 1)[1]) + 1 if byte_range else 0
+    return "incomplete", offset, None
+  if status in (200, 201):
+    return "complete", total_size, json.loads(content.decode("utf-8") if isinstance(content, bytes) else content)
+  if status in SESSION_EXPIRED_STATUS_CODES:
+    return "expired", 0, None
+  raise HttpError(resp, content, uri=uri)
+
+def _resume_saved_session(request, sessions_path, upload_file):
+  """
+  Point `request` at a session saved by an earlier (crashed or interrupted) run, resuming from
+  the server's last committed byte. Returns the video id if that session had already finished.
+  """
+  saved = _load_upload_session(sessions_path, upload_file)
+  if not saved or not saved.get(KEY_SESSION_URI):
+    return None
+  size, mtime = _file_signature(upload_file)
+  if saved.get("size") != size or saved.get("mtime") != mtime:
+    logging.info("Saved upload session for %s is for an older file; starting over.", upload_file)
+    _clear_upload_session(sessions_path, upload_file)
+    return None
+
+  try:
+    state, offset, response = _query_upload_session(request.http, saved[KEY_SESSION_URI], size)
+  except HttpError as e:
+    if int(e.resp.status) < 500:
+      # 400/401/403... won't change on a retry; drop the session rather than block this file forever
+      logging.warning("Saved upload session for %s was refused (HTTP %s); starting over.", upload_file, e.resp.status)
+      _clear_upload_session(sessions_path, upload_file)
+      return None
+    logging.info("Could not query saved upload session (%s); will retry it next time.", e)
+    raise UploadError("Upload session query failed: %s" % e)
+  except RETRIABLE_EXCEPTIONS as e:
+    logging.info("Could not query saved upload session (%s); will retry it next time.", e)
+    raise UploadError("Upload session query failed: %s" % e)
+
+  if state == "complete" and response and "id" in response:
+    logging.info('Saved session for %s had already completed: video id "%s".', upload_file, response["id"])
+    _clear_upload_session(sessions_path, upload_file)
+    return response["id"]
+  if state == "incomplete":
+    logging.info("Resuming upload of %s at byte %d of %d.", upload_file, offset, size)
+    request.resumable_uri = saved[KEY_SESSION_URI]
+    request.resumable_progress = offset
+    _save_upload_session(sessions_path, upload_file, request.resumable_uri, offset)
+    return None
+
+  logging.info("Saved upload session for %s expired; starting over.", upload_file)
+  _clear_upload_session(sessions_path, upload_file)
+  return None
+
+def _sessions_path_for(videodata_file_path):
+  return os.path.join(os.path.dirname(str(videodata_file_path)), UPLOAD_SESSIONS_FILENAME)
+
+def _fill_upload_args(args, vid):
+  # Smaller pre-encoded proxy when the background worker has made one
+  args.file = get_upload_file(vid)
+  if args.file != vid[KEY_FILE]:
+    logging.info("Uploading proxy %s", args.file)
+  args.title = vid[KEY_TITLE]
+  args.description = vid[KEY_DESC] + '\n' + config.YOUTUBE_HASHTAGS
+  args.keywords = (config.YOUTUBE_TAGS)
+
+def _passes_preflight(videodata_file_path, vid) -> bool:
+  """
+  Validate the row's file before spending quota on it (see Preflight.py). A row the background
+  pass hasn't reached is checked now and its verdict saved; failed files are skipped until they change.
+  """
+  had_verdict = vid.get(KEY_PREFLIGHT)
+  ok = ensure_preflight(vid)
+  if vid.get(KEY_PREFLIGHT) and vid[KEY_PREFLIGHT] is not had_verdict:
+    update_jsonl_rows(videodata_file_path, {vid[KEY_FILE]: {KEY_PREFLIGHT: vid[KEY_PREFLIGHT]}})
+  if not ok:
+    logging.info("Skipping %s - failed preflight: %s", vid[KEY_FILE], (vid.get(KEY_PREFLIGHT) or {}).get(KEY_PREFLIGHT_REASON))
+  return ok
+
 def scheduled_upload_video(youtube, videodata_file_path, posted_vid_list, args):
   posted_vids = _read_posted_list(posted_vid_list)
 
@@ -219,33 +474,39 @@ def scheduled_upload_video(youtube, videodata_file_path, posted_vid_list, args):
         logging.info(f"Skipping {vid[KEY_FILE]} - file does not exist.")
         continue
 
-      logging.info("Unposted video found, proceeding to post")
+      if not _passes_preflight(videodata_file_path, vid):
+        continue
 
-      
-      
-      args.file = vid[KEY_FILE]
-      args.title = vid[KEY_TITLE]
-      args.description = vid[KEY_DESC] + '\n' + config.YOUTUBE_HASHTAGS 
-      args.keywords = (config.YOUTUBE_TAGS)
+      logging.info("Unposted video found, proceeding to post")
 
+      _fill_upload_args(args, vid)
       logging.info("Arguements for upload retrieved")
 
+      # Defer (instead of failing mid-upload) when today's quota can't cover the insert
+      if not QuotaLedger.admit("videos.insert", what=vid[KEY_FILE]):
+        return False
+
       try:
         # Upload and retrieve video ID
-        video_id = initialize_upload(youtube, args)
+        video_id = initialize_upload(youtube, args, sessions_path=_sessions_path_for(videodata_file_path))
         vid[KEY_ID] = video_id
-            
+        patch = {KEY_ID: video_id}
 
         # Set ThumbnailSet to False if a valid thumbnail exists
         if KEY_THUMBNAIL in vid and os.path.exists(vid[KEY_THUMBNAIL]):
           vid[KEY_THUMBNAIL_SET] = False
+          patch[KEY_THUMBNAIL_SET] = False
 
-        
-        # Save updated video metadata to file
+        # Merge into the file as it is now; background workers may have written other rows meanwhile
         logging.info(f"Updating video metadata")
-        write_jsonl_atomic(videodata_file_path, videodata_list)
+        update_jsonl_rows(videodata_file_path, {vid[KEY_FILE]: patch})
+        if patch.get(KEY_THUMBNAIL_SET) is False:
+          enqueue_thumbnail(video_id, vid[KEY_THUMBNAIL], videodata_file_path)
 
 
+      except UploadError as e:
+        logging.warning("Upload interrupted (%s); it will resume from the saved session next slot.", e)
+        return False
       except (HttpError) as e:
         reason = _extract_reason(e)
         status = getattr(e.resp, "status", None)
@@ -253,6 +514,8 @@ def scheduled_upload_video(youtube, videodata_file_path, posted_vid_list, args):
             logging.warning("Transient error (%s/%s). Will retry via scheduler.", status, reason)
             return False
         if status == 403 and reason in FATAL_403_REASONS:
+            if reason == "quotaExceeded":
+                QuotaLedger.mark_exhausted()
             logging.error("Quota/Rate limit hit (%s). Skipping this cycle.", reason)
             return False
         logging.exception("Non-retriable HTTP error")
@@ -265,6 +528,7 @@ def scheduled_upload_video(youtube, videodata_file_path, posted_vid_list, args):
         print(vid[KEY_FILE])
         _append_posted_atomic(posted_vid_list, vid[KEY_FILE])
         logging.info(vid[KEY_FILE] + ' successfully uploaded')
+        remove_upload_proxy(vid)
       
       video_uploaded = True
       break
@@ -280,37 +544,6 @@ def scheduled_upload_video(youtube, videodata_file_path, posted_vid_list, args):
       raise
     logging.info (str(e))
 
-def set_thumbnails(youtube, videodata_path):
-    
-    data = parse_jsonl(videodata_path)
-
-    updated = False
-
-    for vid in data:
-        if not _file_exists(vid.get(KEY_THUMBNAIL)):
-            logging.warning("Thumbnail missing for %s; skipping.", vid.get("File Path"))
-            continue
-        if vid.get(KEY_THUMBNAIL_SET) == True:
-            continue
-        if KEY_ID not in vid:
-            logging.info(f"Skipping {vid[KEY_FILE]}: No video ID found.")
-            continue
-
-        try:
-            request = youtube.thumbnails().set(
-                videoId=vid[KEY_ID],
-                media_body=vid[KEY_THUMBNAIL]
-            )
-            response = request.execute()
-            logging.info(f"Thumbnail set for video {vid[KEY_ID]}")
-            vid[KEY_THUMBNAIL_SET] = True
-            updated = True
-        except Exception as e:
-            logging.info(f"Failed to set thumbnail for {vid[KEY_FILE]}: {e}")
-
-    if updated:
-        write_jsonl_atomic(videodata_path, data)
-
 def _read_posted_list(path):
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -319,16 +552,29 @@ def _read_posted_list(path):
         return []
 
 def _append_posted_atomic(path, line):
-    # atomic append (simple on POSIX): write+replace
+    # atomic append (simple on POSIX): write+replace; locked so concurrent uploaders don't drop lines
     tmp = str(path) + ".tmp"
-    existing = _read_posted_list(path)
-    if line in existing:
-        return
-    existing.append(line)
-    with open(tmp, "w", encoding="utf-8") as f:
-        f.write("\n".join(existing) + "\n")
-    os.replace(tmp, path)
- 
+    with jsonl_lock(path):
+        existing = _read_posted_list(path)
+        if line in existing:
+            return
+        existing.append(line)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(existing) + "\n")
+        os.replace(tmp, path)
+
+def _remove_posted_atomic(path, line):
+    # inverse of _append_posted_atomic, used when a failed upload is re-queued
+    tmp = str(path) + ".tmp"
+    with jsonl_lock(path):
+        existing = _read_posted_list(path)
+        if line not in existing:
+            return
+        kept = [l for l in existing if l != line]
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(kept) + ("\n" if kept else ""))
+        os.replace(tmp, path)
+
 def _extract_reason(http_error):
     try:
         err = json.loads(http_error.content.decode("utf-8"))
@@ -346,4 +592,110 @@ def _json_dump_atomic(obj, path):
     tmp = str(path) + ".tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(obj, f, indent=4)
-    os.replace(tmp, path)
\ No newline at end of file
+    os.replace(tmp, path)
+
+
+# ---- Bulk pre-upload with scheduled publishing ----
+
+# How far ahead slots are filled, and the minimum lead YouTube needs before publishAt
+BULK_HORIZON_DAYS = 14
+MIN_PUBLISH_LEAD_MINUTES = 30
+PUBLISH_AT_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
+def to_publish_at(local_dt):
+  """Local wall-clock datetime -> RFC 3339 UTC string for status.publishAt."""
+  return local_dt.astimezone(timezone.utc).strftime(PUBLISH_AT_FMT)
+
+def parse_publish_at(value):
+  """RFC 3339 UTC string -> aware datetime, or None."""
+  try:
+    return datetime.strptime(value, PUBLISH_AT_FMT).replace(tzinfo=timezone.utc)
+  except (TypeError, ValueError):
+    return None
+
+def upcoming_slot_times(slots, start=None, days=BULK_HORIZON_DAYS):
+  """
+  Local datetimes of every slot in `slots` ({"monday": ["11:00"], ...}, the main.py format)
+  from `start` (default: now + MIN_PUBLISH_LEAD_MINUTES) through `days` days ahead, in order.
+  """
+  start = start or (datetime.now() + timedelta(minutes=MIN_PUBLISH_LEAD_MINUTES))
+  times = []
+  for offset in range(days + 1):
+    day = (start + timedelta(days=offset)).date()
+    for t in slots.get(day.strftime("%A").lower(), []):
+      slot = datetime.combine(day, datetime.strptime(t, "%H:%M").time())
+      if slot > start:
+        times.append(slot)
+  return sorted(times)
+
+def scheduled_publish_times(data_paths):
+  """Every publishAt already recorded across the given videodata/compdata files."""
+  taken = set()
+  for path in data_paths:
+    for row in parse_jsonl(str(path)):
+      if row.get(KEY_PUBLISH_AT):
+        taken.add(row[KEY_PUBLISH_AT])
+  return taken
+
+def bulk_schedule_uploads(youtube, videodata_file_path, posted_vid_list, args, slots, taken, max_uploads=None):
+  """
+  Upload the backlog now as private videos that publish themselves at the next free slots.
+
+  `taken` is the set of publishAt values already claimed (across all events, see
+  scheduled_publish_times); slots claimed here are added to it. The publish time and video id
+  are recorded on each row and the file is added to the posted list, so the slot-time uploader
+  never sends it again. Stops at the first failed upload. Returns the number of videos scheduled.
+  """
+  posted_vids = set(_read_posted_list(posted_vid_list))
+  free_slots = [to_publish_at(t) for t in upcoming_slot_times(slots)]
+  free_slots = [t for t in free_slots if t not in taken]
+  sessions_path = _sessions_path_for(videodata_file_path)
+
+  scheduled = 0
+  for vid in parse_jsonl(videodata_file_path):
+    if max_uploads is not None and scheduled >= max_uploads:
+      break
+    if not free_slots:
+      logging.info("No free publish slots left in the next %d days.", BULK_HORIZON_DAYS)
+      break
+    if vid.get(KEY_FILE) in posted_vids or not vid.get(KEY_FILE) or not vid.get(KEY_TITLE) or not vid.get(KEY_DESC):
+      continue
+    if not os.path.exists(vid[KEY_FILE]):
+      continue
+    if not _passes_preflight(videodata_file_path, vid):
+      continue
+
+    if not QuotaLedger.admit("videos.insert", what="bulk pre-upload"):
+      break
+
+    publish_at = free_slots.pop(0)
+    upload_args = argparse.Namespace(**vars(args))
+    _fill_upload_args(upload_args, vid)
+    upload_args.privacyStatus = "private"
+    upload_args.publishAt = publish_at
+
+    try:
+      video_id = initialize_upload(youtube, upload_args, sessions_path=sessions_path)
+    except UploadError as e:
+      logging.warning("Bulk upload interrupted (%s); the session will resume next run.", e)
+      break
+    except HttpError as e:
+      reason = _extract_reason(e)
+      if reason == "quotaExceeded":
+        QuotaLedger.mark_exhausted()
+      logging.error("Bulk upload stopped by HTTP error %s (%s).", getattr(e.resp, "status", None), reason)
+      break
+
+    patch = {KEY_ID: video_id, KEY_PUBLISH_AT: publish_at}
+    if KEY_THUMBNAIL in vid and os.path.exists(vid[KEY_THUMBNAIL]):
+      patch[KEY_THUMBNAIL_SET] = False
+    update_jsonl_rows(videodata_file_path, {vid[KEY_FILE]: patch})
+    if KEY_THUMBNAIL_SET in patch:
+      enqueue_thumbnail(video_id, vid[KEY_THUMBNAIL], videodata_file_path)
+    _append_posted_atomic(posted_vid_list, vid[KEY_FILE])
+    remove_upload_proxy(vid)
+    taken.add(publish_at)
+    scheduled += 1
+    logging.info('Scheduled %s as video "%s" to publish at %s', vid[KEY_FILE], video_id, publish_at)
+
+  return scheduled
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Optional
 # import sys  # was unused
 
 KEY_TIMESTAMP = "timestamp"
@@ -33,6 +34,42 @@ KEY_CLIPTITLES = "clip titles"
 KEY_CLIPFILES = "clip files"
 KEY_THUMBNAIL = "thumbnail"
 KEY_THUMBNAIL_SET = "thumbnail set"
+KEY_PUBLISH_AT = "publish at"  # RFC 3339 UTC time a pre-uploaded private video goes public
+KEY_PROCESSING = "processing"  # YouTube processing verdict for the uploaded video (see UploadVerifier.py)
+
+# Cached media probe stored on each videodata row (see MediaProbe.py)
+KEY_PROBE     = "probe"
+KEY_DURATION  = "duration"
+KEY_WIDTH     = "width"
+KEY_HEIGHT    = "height"
+KEY_CODEC     = "codec"
+KEY_FPS       = "fps"
+KEY_HAS_AUDIO = "has audio"
+KEY_SIZE      = "size"
+KEY_MTIME     = "mtime"
+KEY_PIX_FMT   = "pix fmt"
+KEY_PROFILE   = "profile"
+KEY_AUDIO_CODEC = "audio codec"
+KEY_SAMPLE_RATE = "sample rate"
+KEY_CHANNELS    = "channels"
+KEY_EXTRADATA   = "extradata hash"  # codec header hash: equal only for the same encoder and settings
+KEY_PROBE_VERSION = "probe version"
+KEY_PROBE_FAILED  = "probe failed"  # {size, mtime} of a file ffprobe couldn't read; retried once it changes
+
+# Dead-air trim points from clip analysis (see ClipAnalysis.py)
+KEY_TRIM       = "trim"
+KEY_TRIM_START = "start"
+KEY_TRIM_END   = "end"
+
+# Pre-upload file validation (see Preflight.py)
+KEY_PREFLIGHT = "preflight"
+KEY_PREFLIGHT_OK = "ok"
+KEY_PREFLIGHT_REASON = "reason"
+KEY_SHA256 = "sha256"
+
+# Pre-upload proxy encode of a short (see UploadProxy.py)
+KEY_UPLOAD_PROXY = "upload proxy"
+KEY_BYTES_SAVED  = "bytes saved"
 
 # ---- Static roots ----
 HOME_DIR = Path.home()
@@ -59,6 +96,7 @@ VIDEO_DATA = EVENT_FOLDER / "data/videodata.jsonl"
 COMP_DATA = EVENT_FOLDER / "data/compdata.jsonl"
 VIDEO_FOLDER = EVENT_FOLDER / "videos/clips"
 COMPS_FOLDER = EVENT_FOLDER / "videos/compilations"
+SEGMENTS_FOLDER = EVENT_FOLDER / "videos/segments"
 THUMBNAILS_FOLDER = EVENT_FOLDER / "thumbnails"
 POSTED_VIDS_FILE = EVENT_FOLDER / "data/postedvids.txt"
 TITLE_HISTORY_FILE = EVENT_FOLDER / "data/titlehistory.txt"
@@ -68,8 +106,13 @@ SHORTS_IMAGES_PATH = EVENT_FOLDER / "images"
 YOUTUBE_TAGS = ("Super Smash Bros, Super Smash Melee, gaming, Nintendo, eSports, viral, viral shorts, for you")
 YOUTUBE_HASHTAGS = (" #gaming #supersmashbros #melee")
 OPEN_AI_API_KEY = PROJECT_FOLDER / "_keys" / 'open_AI_key.json'
+# Machine-wide scheduler state (not tied to an event)
+STATE_FOLDER = PROJECT_FOLDER / "_state"
+ENCODING_PROFILE_FILE = STATE_FOLDER / "encoding_profile.json"
 CLIENT_SECRETS_FILE = PROJECT_FOLDER / "_keys" / 'client_secret.json'
 CREDENTIALS_FILE = PROJECT_FOLDER / "_keys" / 'credentials.json'
+# Symlink Project Clippi writes through to the recording event's combodata (set-clippi-path.ps1)
+ACTIVE_CLIPPI_FILE = PROJECT_FOLDER / "_ActiveClippiComboData" / "combodata.jsonl"
 
 def set_event_name(event_name: str) -> None:
     """
@@ -78,7 +121,7 @@ def set_event_name(event_name: str) -> None:
     """
     global EVENT_NAME, EVENT_FOLDER
     global EVENT_TITLE, VENUE_DESC, COMBO_DATA, DATA_FOLDER
-    global VIDEO_DATA, COMP_DATA, VIDEO_FOLDER, COMPS_FOLDER, THUMBNAILS_FOLDER
+    global VIDEO_DATA, COMP_DATA, VIDEO_FOLDER, COMPS_FOLDER, SEGMENTS_FOLDER, THUMBNAILS_FOLDER
     global POSTED_VIDS_FILE, TITLE_HISTORY_FILE, SHORTS_IMAGES_PATH, SHORTS_IMAGES_GEN_PATH
 
     EVENT_NAME = event_name
@@ -91,17 +134,42 @@ def set_event_name(event_name: str) -> None:
     VIDEO_DATA = EVENT_FOLDER / "data/videodata.jsonl"
     COMP_DATA = EVENT_FOLDER / "data/compdata.jsonl"
     VIDEO_FOLDER = EVENT_FOLDER / "videos/clips"
-    COMPS_FOLDER = EVENT_FOLDER / "vidoes/compilations"
+    COMPS_FOLDER = EVENT_FOLDER / "videos/compilations"
+    SEGMENTS_FOLDER = EVENT_FOLDER / "videos/segments"
     THUMBNAILS_FOLDER = EVENT_FOLDER / "thumbnails"
     POSTED_VIDS_FILE = EVENT_FOLDER / "data/postedvids.txt"
     TITLE_HISTORY_FILE = EVENT_FOLDER / "data/titlehistory.txt"
     SHORTS_IMAGES_PATH = EVENT_FOLDER / "images"
     SHORTS_IMAGES_GEN_PATH = EVENT_FOLDER / "images_gen"
 
+def event_paths(event_name: Optional[str] = None) -> dict:
+    """
+    Data paths for any event (default: the active one) without switching the active one.
+    Background workers use this so they never touch the module-level event state.
+    """
+    event_name = event_name or EVENT_NAME
+    folder = _build_event_folder(event_name)
+    return {
+        "event name":        event_name,
+        "event folder":      folder,
+        "event title":       folder / "data/event_title.txt",
+        "venue desc":        folder / "data/venue_desc.txt",
+        "combo data":        folder / "data/combodata.jsonl",
+        "video data":        folder / "data/videodata.jsonl",
+        "comp data":         folder / "data/compdata.jsonl",
+        "posted vids":       folder / "data/postedvids.txt",
+        "title history":     folder / "data/titlehistory.txt",
+        "video folder":      folder / "videos/clips",
+        "comps folder":      folder / "videos/compilations",
+        "segments folder":   folder / "videos/segments",
+        "thumbnails folder": folder / "thumbnails",
+        "data folder":       folder / "data",
+    }
+
 def ensure_dirs() -> None:
     """Create expected directories if they don't exist (safe to call anytime)."""
     for p in [
-        PROJECT_FOLDER, EVENT_FOLDER, DATA_FOLDER, VIDEO_FOLDER, COMPS_FOLDER,
+        PROJECT_FOLDER, EVENT_FOLDER, DATA_FOLDER, VIDEO_FOLDER, COMPS_FOLDER, SEGMENTS_FOLDER,
         THUMBNAILS_FOLDER, SHORTS_IMAGES_PATH, SHORTS_IMAGES_GEN_PATH,
     ]:
         p.mkdir(parents=True, exist_ok=True)
@@ -1,14 +1,26 @@
-from ProcessComboTextFile import write_video_titles, write_video_descriptions, pair_videodata_with_videofiles
-from VideoCompilation import generate_compilation_from_videodata, fix_mp4_metadata_in_folder
-from YoutubeVideoUpload import get_authenticated_service, scheduled_upload_video, YoutubeArgs, set_thumbnails
+from ProcessComboTextFile import write_video_titles, write_video_descriptions, pair_videodata_with_videofiles, parse_jsonl
+from VideoCompilation import generate_all_compilations_from_videodata, fix_mp4_metadata_in_folder
+from YoutubeVideoUpload import get_authenticated_service, scheduled_upload_video, YoutubeArgs, _read_posted_list
+from YoutubeVideoUpload import start_token_refresher, invalidate_credentials
+from YoutubeVideoUpload import bulk_schedule_uploads, scheduled_publish_times, parse_publish_at
+from UploadProxy import prepare_upload_proxies, UPLOAD_PROXY_ENABLED
+from ClipAnalysis import analyze_clips
+from Preflight import preflight_backlog, preflight_status
+from UploadVerifier import verify_uploads
+from ThumbnailQueue import drain_thumbnail_queue, enqueue_unset_from
+from AsyncScheduler import AsyncScheduler, daily_at, weekly_at, every_minutes, minutes_before, on_trigger
+from config import KEY_FILE, KEY_TITLE, KEY_DESC
 import config
-import time
-import schedule
+import QuotaLedger
+import EventRotation
+import asyncio
 from pathlib import Path
 import os
 import importlib
 import logging
 import sys
+import threading
+from datetime import datetime, timezone
 
 EVENTS_BASE_DIR = Path.home() / "project-flippi" / "Event"
 
@@ -25,6 +37,29 @@ SHORT_SLOTS = {
 COMP_SLOTS = {
     "tuesday": ["11:00"],
 }
+# Off-peak batch render of every compilation the events' unused clips can fill
+COMP_PLAN_TIMES = ["03:00"]
+# Bulk pre-upload: upload the backlog off-peak as private videos with publishAt set to future slots
+BULK_PREUPLOAD_ENABLED = False
+BULK_UPLOAD_TIMES = ["02:00"]
+BULK_MAX_UPLOADS_PER_RUN = 5  # videos.insert is expensive in quota
+# A slot counts as already covered if a pre-uploaded video publishes within this many minutes of it
+SLOT_MATCH_MINUTES = 30
+# How often queued thumbnails are retried in the background (new ones are set right after upload)
+THUMBNAIL_QUEUE_INTERVAL_MINUTES = 10
+# How often the background worker trims and pre-encodes upload proxies for pending shorts
+CLIP_PREP_INTERVAL_MINUTES = 30
+# How often recent uploads are checked for failed YouTube processing (one quota unit per 50 videos)
+VERIFY_INTERVAL_MINUTES = 60
+# How slots pick an event: "weighted" (deficit round-robin by backlog and clip age, see EventRotation.py)
+# or "round robin" (name order from the daily rotation's event)
+ROTATION_POLICY = "weighted"
+# Titles, descriptions, pairing, trims, proxies and comp renders for the next slot are done this many
+# minutes ahead, so the slot itself only uploads (None = only prepare when a slot finds nothing ready)
+SLOT_PREP_LEAD_MINUTES = 30
+# New recordings / combo data start clip prep this many seconds after they appear (lets OBS finish the file)
+FILE_WATCH_SETTLE_SECONDS = 120
+RECORDING_EXTENSIONS = (".mp4", ".mkv", ".mov", ".flv")
 
 def get_event_list():
     """Get a sorted list of subfolder names inside the event directory."""
@@ -45,7 +80,7 @@ def set_active_event(event_name: str):
     logging.info("Switched event to: %s", event_name)
 
 def switch_to_next_event():
-    """Rotate to the next event based on subfolder names."""
+    """Rotate to the next event: by name, or under the weighted policy to the event next in line for a short."""
     global CURRENT_EVENT_INDEX, EVENT_LIST
 
     EVENT_LIST = get_event_list()
@@ -57,40 +92,256 @@ def switch_to_next_event():
     if CURRENT_EVENT_INDEX >= len(EVENT_LIST):
         CURRENT_EVENT_INDEX = 0
 
-    CURRENT_EVENT_INDEX = (CURRENT_EVENT_INDEX + 1) % len(EVENT_LIST)
+    if ROTATION_POLICY == "weighted":
+        CURRENT_EVENT_INDEX = EVENT_LIST.index(EventRotation.rotation_order(EVENT_LIST, "shorts")[0])
+    else:
+        CURRENT_EVENT_INDEX = (CURRENT_EVENT_INDEX + 1) % len(EVENT_LIST)
     set_active_event(EVENT_LIST[CURRENT_EVENT_INDEX])
 
-def _prep_videos_for_event():
+def _slot_order(kind: str):
+    """Events in the order a `kind` ("shorts"/"comps") slot tries them under ROTATION_POLICY."""
+    global CURRENT_EVENT_INDEX, EVENT_LIST
+    EVENT_LIST = get_event_list()
+    if not EVENT_LIST:
+        return []
+    if ROTATION_POLICY == "weighted":
+        return EventRotation.rotation_order(EVENT_LIST, kind)
+    if CURRENT_EVENT_INDEX >= len(EVENT_LIST):
+        CURRENT_EVENT_INDEX = 0
+    return EVENT_LIST[CURRENT_EVENT_INDEX:] + EVENT_LIST[:CURRENT_EVENT_INDEX]
+
+def _record_slot(kind: str, event_name: str):
+    """Account a successful `kind` upload from `event_name` in the rotation."""
+    global CURRENT_EVENT_INDEX
+    if ROTATION_POLICY == "weighted":
+        EventRotation.charge(EVENT_LIST, kind, event_name)
+    # Round robin stays on the event that just posted, as before
+    CURRENT_EVENT_INDEX = EVENT_LIST.index(event_name)
+
+def _prep_videos_for_event(event_name: str):
     """Shared pre-upload prep for both short and comp."""
-    write_video_titles(config.COMBO_DATA, config.VIDEO_DATA)
-    write_video_descriptions(config.VIDEO_DATA)
-    pair_videodata_with_videofiles(config.VIDEO_DATA, config.VIDEO_FOLDER)
+    paths = config.event_paths(event_name)
+    write_video_titles(paths["combo data"], paths["video data"], event_name)
+    write_video_descriptions(paths["video data"])
+    pair_videodata_with_videofiles(paths["video data"], paths["video folder"])
+
+def _queued_compilations(event_name: str) -> int:
+    """Number of rendered compilations for the event that haven't been posted yet."""
+    paths = config.event_paths(event_name)
+    posted = set(_read_posted_list(paths["posted vids"]))
+    return sum(
+        1 for row in parse_jsonl(paths["comp data"])
+        if row.get(KEY_FILE) and row[KEY_FILE] not in posted and os.path.exists(row[KEY_FILE])
+    )
+
+def _plan_compilations(event_name: str):
+    paths = config.event_paths(event_name)
+    _prep_videos_for_event(event_name)
+    fix_mp4_metadata_in_folder(paths["video folder"], paths["video data"])
+    # Every unused clip needs its trim before the knapsack packs trimmed durations
+    analyze_clips(paths["video data"], limit=None, unused_only=True, executor=_cpu_pool())
+    return generate_all_compilations_from_videodata(paths["video data"], event_name=event_name)
+
+def plan_all_compilations():
+    """Batch-render all ready compilations for every event so comp slots only upload."""
+    for event_name in get_event_list():
+        try:
+            rendered = _plan_compilations(event_name)
+            logging.info("Comp planner: %d compilation(s) rendered for %s", len(rendered), event_name)
+        except Exception:
+            logging.exception("Comp planner failed for %s; continuing with next event.", event_name)
+
+# Background jobs by name; a job is never started twice while still running
+_BACKGROUND_JOBS = {}
+# The running scheduler (set by main); background jobs it knows are started through it
+_SCHEDULER = None
+
+def _cpu_pool():
+    return _SCHEDULER.process_pool if _SCHEDULER is not None else None
+
+def run_in_background(name: str, func, *args):
+    """Run a long job on a daemon thread so it doesn't block the slot handlers."""
+    if _SCHEDULER is not None and name in _SCHEDULER.jobs and _SCHEDULER.trigger_threadsafe(name):
+        return
+    running = _BACKGROUND_JOBS.get(name)
+    if running and running.is_alive():
+        logging.info("Background job '%s' is still running; skipping this cycle.", name)
+        return
+
+    def _target():
+        try:
+            func(*args)
+        except Exception:
+            logging.exception("Background job '%s' failed.", name)
+
+    thread = threading.Thread(target=_target, name=name, daemon=True)
+    _BACKGROUND_JOBS[name] = thread
+    thread.start()
+
+def prepare_all_clips():
+    """
+    Validate pending shorts and compilations, analyze dead-air trims and pre-encode upload
+    proxies for every event (never switches the active event).
+    """
+    for event_name in get_event_list():
+        paths = config.event_paths(event_name)
+        try:
+            preflight_backlog(paths["video data"], paths["posted vids"])
+            preflight_backlog(paths["comp data"], paths["posted vids"])
+            analyze_clips(paths["video data"], paths["posted vids"], executor=_cpu_pool())
+            if UPLOAD_PROXY_ENABLED:
+                prepare_upload_proxies(paths["video data"], paths["posted vids"])
+        except Exception:
+            logging.exception("Clip prep failed for %s; continuing with next event.", event_name)
+
+def verify_all_uploads():
+    """Check processing status of every event's recent uploads in one batched pass."""
+    data_files = []
+    for event_name in get_event_list():
+        paths = config.event_paths(event_name)
+        data_files.append((paths["video data"], paths["posted vids"]))
+        data_files.append((paths["comp data"], paths["posted vids"]))
+    verify_uploads(data_files)
+
+def _all_event_paths(key: str):
+    return [config.event_paths(event_name)[key] for event_name in get_event_list()]
+
+def _slot_prescheduled(data_key: str) -> bool:
+    """True if a pre-uploaded video (any event) is already set to publish at this slot."""
+    now = datetime.now(timezone.utc)
+    for value in scheduled_publish_times(_all_event_paths(data_key)):
+        publish_at = parse_publish_at(value)
+        if publish_at and abs((publish_at - now).total_seconds()) <= SLOT_MATCH_MINUTES * 60:
+            return True
+    return False
+
+def bulk_preupload():
+    """Pre-upload shorts and compilations as private videos scheduled into the free future slots."""
+    global youtube
+    taken = scheduled_publish_times(_all_event_paths("video data") + _all_event_paths("comp data"))
+    affordable = (QuotaLedger.units_remaining() - QuotaLedger.QUOTA_SAFETY_MARGIN) // QuotaLedger.cost_of("videos.insert")
+    budget = min(BULK_MAX_UPLOADS_PER_RUN, max(0, affordable))
+    if budget == 0:
+        QuotaLedger.admit("videos.insert", what="bulk pre-upload")
+        return
+
+    for event_name in get_event_list():
+        if budget <= 0:
+            break
+        paths = config.event_paths(event_name)
+        try:
+            shorts = bulk_schedule_uploads(youtube, paths["video data"], paths["posted vids"], video_args,
+                                           SHORT_SLOTS, taken, max_uploads=budget)
+            budget -= shorts
+            comps = 0
+            if budget > 0:
+                comps = bulk_schedule_uploads(youtube, paths["comp data"], paths["posted vids"], video_args,
+                                              COMP_SLOTS, taken, max_uploads=budget)
+                budget -= comps
+            if comps:
+                run_in_background("thumbnails", drain_thumbnail_queue)
+            logging.info("Bulk pre-upload: %s scheduled %d short(s), %d compilation(s)", event_name, shorts, comps)
+        except Exception as e:
+            if "invalid_grant" in str(e):
+                logging.warning("Token expired. Re-authorising...")
+                invalidate_credentials()
+                youtube = get_authenticated_service()
+                return
+            logging.exception("Bulk pre-upload failed for %s; continuing with next event.", event_name)
+
+def _ready_short_exists(data_path, posted_path) -> bool:
+    """True if an unposted row has its metadata, an existing file and no failed preflight."""
+    posted = set(_read_posted_list(posted_path))
+    for row in parse_jsonl(str(data_path)):
+        path = row.get(KEY_FILE)
+        if not path or path in posted or not row.get(KEY_TITLE) or not row.get(KEY_DESC):
+            continue
+        if os.path.exists(path) and preflight_status(row) is not False:
+            return True
+    return False
+
+def prepare_next_short():
+    """
+    Get the next short slot's upload ready: metadata and pairing for the event(s) the slot will
+    try, then preflight, trims and the upload proxy. Stops at the first event with a ready short.
+    """
+    for event_name in _slot_order("shorts"):
+        paths = config.event_paths(event_name)
+        try:
+            _prep_videos_for_event(event_name)
+            preflight_backlog(paths["video data"], paths["posted vids"])
+            analyze_clips(paths["video data"], paths["posted vids"], executor=_cpu_pool())
+            if UPLOAD_PROXY_ENABLED:
+                prepare_upload_proxies(paths["video data"], paths["posted vids"])
+        except Exception:
+            logging.exception("Short prep failed for %s; trying next event.", event_name)
+            continue
+        if _ready_short_exists(paths["video data"], paths["posted vids"]):
+            logging.info("Short prep: next short ready in %s", event_name)
+            break
+
+def prepare_next_comp():
+    """Render (with thumbnail) and preflight a compilation for the next comp slot if none is queued."""
+    for event_name in _slot_order("comps"):
+        paths = config.event_paths(event_name)
+        try:
+            if _queued_compilations(event_name) == 0:
+                _plan_compilations(event_name)
+            preflight_backlog(paths["comp data"], paths["posted vids"])
+        except Exception:
+            logging.exception("Compilation prep failed for %s; trying next event.", event_name)
+            continue
+        if _queued_compilations(event_name) > 0:
+            logging.info("Comp prep: next compilation ready in %s", event_name)
+            break
+
+def _any_ready_short() -> bool:
+    return any(_ready_short_exists(data, posted)
+               for data, posted in zip(_all_event_paths("video data"), _all_event_paths("posted vids")))
+
+def _any_queued_compilation() -> bool:
+    return any(_queued_compilations(e) > 0 for e in get_event_list())
+
+def catch_up_short():
+    """Prepare a short for a slot that found none ready, then retry the slot."""
+    prepare_next_short()
+    if _any_ready_short():
+        run_in_background("short retry", process_and_upload_short)
+
+def catch_up_comp():
+    """Render a compilation for a slot that found none queued, then retry the slot."""
+    prepare_next_comp()
+    if _any_queued_compilation():
+        run_in_background("comp retry", process_and_upload_comp)
 
 def process_and_upload_short():
-    global youtube, CURRENT_EVENT_INDEX, EVENT_LIST
-    EVENT_LIST = get_event_list()
-    if not EVENT_LIST:
+    global youtube
+    if _slot_prescheduled("video data"):
+        logging.info("A pre-uploaded short already publishes at this slot; nothing to upload.")
+        return
+    # Check quota before spending time on prep; the slot is retried at its next occurrence
+    if not QuotaLedger.admit("videos.insert", what="short slot"):
+        return
+    order = _slot_order("shorts")
+    if not order:
         logging.info("No events to process for shorts.")
         return
 
-    if CURRENT_EVENT_INDEX >= len(EVENT_LIST):
-        CURRENT_EVENT_INDEX = 0
-
     events_tried = 0
-    total_events = len(EVENT_LIST)
+    total_events = len(order)
 
     while events_tried < total_events:
-        event_name = EVENT_LIST[CURRENT_EVENT_INDEX]
+        event_name = order[events_tried]
         set_active_event(event_name)
         logging.info("Shorts: processing event %s", config.get_event_name())
 
         try:
-            _prep_videos_for_event()
             video_uploaded = scheduled_upload_video(youtube, config.VIDEO_DATA, config.POSTED_VIDS_FILE, video_args)
         except Exception as e:
             msg = str(e)
             if "invalid_grant" in msg:
                 logging.warning("Token expired. Re-authorising...")
+                invalidate_credentials()
                 youtube = get_authenticated_service()
                 # retry same event on next loop iteration
                 continue
@@ -98,74 +349,129 @@ def process_and_upload_short():
             return
 
         if video_uploaded:
+            _record_slot("shorts", event_name)
             logging.info("Short uploaded successfully for %s", config.get_event_name())
             return
         else:
             logging.info("No unposted videos for %s. Switching to next event...", event_name)
-            CURRENT_EVENT_INDEX = (CURRENT_EVENT_INDEX + 1) % len(EVENT_LIST)
             events_tried += 1
 
     logging.info("No videos uploaded across all events. Will try again next scheduled cycle.")
+    # Normally prepared ahead of the slot; prepare off the slot lock and retry if nothing was ready
+    if not _any_ready_short():
+        logging.info("No prepared short in any event; preparing one now.")
+        run_in_background("short catch-up", catch_up_short)
 
 def process_and_upload_comp():
-    global youtube, CURRENT_EVENT_INDEX, EVENT_LIST
-    EVENT_LIST = get_event_list()
-    if not EVENT_LIST:
+    global youtube
+    if _slot_prescheduled("comp data"):
+        logging.info("A pre-uploaded compilation already publishes at this slot; nothing to upload.")
+        return
+    if not QuotaLedger.admit("videos.insert", what="compilation slot"):
+        return
+    order = _slot_order("comps")
+    if not order:
         logging.info("No events to process for compilations.")
         return
 
-    if CURRENT_EVENT_INDEX >= len(EVENT_LIST):
-        CURRENT_EVENT_INDEX = 0
-
     events_tried = 0
-    total_events = len(EVENT_LIST)
+    total_events = len(order)
 
     while events_tried < total_events:
-        event_name = EVENT_LIST[CURRENT_EVENT_INDEX]
+        event_name = order[events_tried]
         set_active_event(event_name)
         logging.info("Comps: processing event %s", config.get_event_name())
 
         try:
-            _prep_videos_for_event()
-            fix_mp4_metadata_in_folder(config.VIDEO_FOLDER, config.VIDEO_DATA)
-            generate_compilation_from_videodata(config.VIDEO_DATA)
             video_uploaded = scheduled_upload_video(youtube, config.COMP_DATA, config.POSTED_VIDS_FILE, video_args)
         except Exception as e:
             msg = str(e)
             if "invalid_grant" in msg:
                 logging.warning("Token expired. Re-authorising...")
+                invalidate_credentials()
                 youtube = get_authenticated_service()
                 continue
             logging.exception("Unexpected error during compilation upload; skipping this cycle.")
             return
 
         if video_uploaded:
-            set_thumbnails(youtube, config.COMP_DATA)
+            _record_slot("comps", event_name)
+            run_in_background("thumbnails", drain_thumbnail_queue)
             logging.info("Compilation uploaded successfully for %s", config.get_event_name())
             return
         else:
             logging.info("No unposted compilations for %s. Switching to next event...", event_name)
-            CURRENT_EVENT_INDEX = (CURRENT_EVENT_INDEX + 1) % len(EVENT_LIST)
             events_tried += 1
 
     logging.info("No compilations uploaded across all events. Will try again next scheduled cycle.")
-
-def run_schedule():
+    # Normally the off-peak planner has already queued compilations; render off the slot lock and retry
+    if not _any_queued_compilation():
+        logging.info("No queued compilation in any event; rendering one now.")
+        run_in_background("comp catch-up", catch_up_comp)
+
+def _is_new_recording(event_type: str, path: str) -> bool:
+    """File events that mean new material: a finished/renamed recording or new combo data."""
+    name = os.path.basename(path)
+    if name == "combodata.jsonl":
+        return event_type in ("created", "modified", "moved")
+    parts = Path(path).parts
+    if event_type not in ("created", "moved") or "videos" not in parts:
+        return False
+    if "segments" in parts or "compilations" in parts or name.startswith(".") or name.endswith(".upload.mp4"):
+        return False
+    return name.lower().endswith(RECORDING_EXTENSIONS)
+
+def build_scheduler() -> AsyncScheduler:
+    """
+    Every job of the upload schedule. Jobs that upload or switch the active event (rotation, slots,
+    bulk pre-upload) run one at a time in group "slots"; renders and slot prep run one at a time in
+    group "prep" on explicit event paths, so they never hold up an upload; background jobs run
+    beside both.
+    """
+    scheduler = AsyncScheduler()
     for t in ROTATE_TIMES:
-        schedule.every().day.at(t).do(switch_to_next_event)
+        scheduler.add(f"rotate {t}", switch_to_next_event, daily_at(t), group="slots")
 
     # shorts
     for day, times in SHORT_SLOTS.items():
         for t in times:
-            getattr(schedule.every(), day).at(t).do(process_and_upload_short)
+            scheduler.add(f"short {day} {t}", process_and_upload_short, weekly_at(day, t), group="slots")
+            if SLOT_PREP_LEAD_MINUTES:
+                scheduler.add(f"short prep {day} {t}", prepare_next_short,
+                              minutes_before(weekly_at(day, t), SLOT_PREP_LEAD_MINUTES), group="prep")
 
     # compilations
     for day, times in COMP_SLOTS.items():
         for t in times:
-            getattr(schedule.every(), day).at(t).do(process_and_upload_comp)
+            scheduler.add(f"comp {day} {t}", process_and_upload_comp, weekly_at(day, t), group="slots")
+            if SLOT_PREP_LEAD_MINUTES:
+                scheduler.add(f"comp prep {day} {t}", prepare_next_comp,
+                              minutes_before(weekly_at(day, t), SLOT_PREP_LEAD_MINUTES), group="prep")
+
+    # A slot that finds nothing ready triggers its catch-up, which retries the slot once prepared
+    scheduler.add("short catch-up", catch_up_short, on_trigger(), group="prep")
+    scheduler.add("short retry", process_and_upload_short, on_trigger(), group="slots")
+    scheduler.add("comp catch-up", catch_up_comp, on_trigger(), group="prep")
+    scheduler.add("comp retry", process_and_upload_comp, on_trigger(), group="slots")
+
+    for t in COMP_PLAN_TIMES:
+        scheduler.add(f"comp plan {t}", plan_all_compilations, daily_at(t), group="prep")
+
+    if BULK_PREUPLOAD_ENABLED:
+        for t in BULK_UPLOAD_TIMES:
+            scheduler.add(f"bulk {t}", bulk_preupload, daily_at(t), group="slots")
+
+    scheduler.add("thumbnails", drain_thumbnail_queue, every_minutes(THUMBNAIL_QUEUE_INTERVAL_MINUTES))
+    # Same group as slot prep: both analyze and encode the same events' clips
+    scheduler.add("clip prep", prepare_all_clips, every_minutes(CLIP_PREP_INTERVAL_MINUTES), group="prep")
+    scheduler.add("verify uploads", verify_all_uploads, every_minutes(VERIFY_INTERVAL_MINUTES))
+
+    if EVENTS_BASE_DIR.exists():
+        scheduler.watch(EVENTS_BASE_DIR, "clip prep", _is_new_recording, FILE_WATCH_SETTLE_SECONDS)
+    return scheduler
 
 def main():
-    global youtube, video_args, EVENT_LIST, CURRENT_EVENT_INDEX
+    global youtube, video_args, EVENT_LIST, CURRENT_EVENT_INDEX, _SCHEDULER
 
     logging.basicConfig(
         level=logging.INFO,
@@ -185,16 +491,24 @@ def main():
         logging.info("No events found at start; scheduler will retry later.")
 
     youtube = get_authenticated_service()
+    # Renew the access token in the background so slots never start on an expired one
+    start_token_refresher()
     video_args = YoutubeArgs()
+
+    # Catch up on thumbnails that were never set before the queue existed
+    for event_name in EVENT_LIST:
+        paths = config.event_paths(event_name)
+        enqueue_unset_from(paths["comp data"])
+        enqueue_unset_from(paths["video data"])
     
-    run_schedule()
+    _SCHEDULER = build_scheduler()
 
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        asyncio.run(_SCHEDULER.run())
     except KeyboardInterrupt:
         logging.info("Shutting down.")
+    finally:
+        _SCHEDULER = None
 
 if __name__ == "__main__":
     main()
\ No newline at end of file